@@ -0,0 +1,75 @@
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7b8c9d0e1f2"
+down_revision: Union[str, None] = "f1a2b3c4d5e6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("settlements", sa.Column("currency", sa.String(), nullable=True))
+    op.execute(
+        """
+        UPDATE settlements SET currency = (
+            SELECT COALESCE(t.base_currency, 'VND') FROM trips t WHERE t.id = settlements.trip_id
+        )
+        """
+    )
+
+    # Sổ cái được giữ theo từng loại tiền: xây lại toàn bộ từ dữ liệu gốc
+    op.drop_constraint("uq_trip_balances_trip_user", "trip_balances", type_="unique")
+    op.add_column("trip_balances", sa.Column("currency", sa.String(), nullable=False, server_default="VND"))
+    op.create_unique_constraint(
+        "uq_trip_balances_trip_user_currency", "trip_balances", ["trip_id", "user_id", "currency"]
+    )
+    op.execute("DELETE FROM trip_balances")
+    op.execute(
+        """
+        INSERT INTO trip_balances (trip_id, user_id, currency, balance)
+        SELECT trip_id, user_id, currency, SUM(delta) FROM (
+            SELECT e.trip_id AS trip_id, e.payer_id AS user_id,
+                   COALESCE(e.currency, t.base_currency, 'VND') AS currency, e.amount AS delta
+            FROM expenses e JOIN trips t ON t.id = e.trip_id
+            UNION ALL
+            SELECT e.trip_id, s.user_id, COALESCE(e.currency, t.base_currency, 'VND'), -s.amount_owed
+            FROM expense_splits s
+            JOIN expenses e ON e.id = s.expense_id
+            JOIN trips t ON t.id = e.trip_id
+            UNION ALL
+            SELECT st.trip_id, st.payer_id, st.currency, st.amount FROM settlements st
+            UNION ALL
+            SELECT st.trip_id, st.receiver_id, st.currency, -st.amount FROM settlements st
+        ) AS deltas
+        GROUP BY trip_id, user_id, currency
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_trip_balances_trip_user_currency", "trip_balances", type_="unique")
+    op.drop_column("trip_balances", "currency")
+    op.execute("DELETE FROM trip_balances")
+    op.execute(
+        """
+        INSERT INTO trip_balances (trip_id, user_id, balance)
+        SELECT trip_id, user_id, SUM(delta) FROM (
+            SELECT e.trip_id AS trip_id, e.payer_id AS user_id, e.amount AS delta
+            FROM expenses e
+            UNION ALL
+            SELECT e.trip_id, s.user_id, -s.amount_owed
+            FROM expense_splits s JOIN expenses e ON e.id = s.expense_id
+            UNION ALL
+            SELECT st.trip_id, st.payer_id, st.amount FROM settlements st
+            UNION ALL
+            SELECT st.trip_id, st.receiver_id, -st.amount FROM settlements st
+        ) AS deltas
+        GROUP BY trip_id, user_id
+        """
+    )
+    op.create_unique_constraint("uq_trip_balances_trip_user", "trip_balances", ["trip_id", "user_id"])
+    op.drop_column("settlements", "currency")
@@ -0,0 +1,50 @@
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c4d5e6f7a8b9"
+down_revision: Union[str, None] = "b2c3d4e5f6a7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("expenses", sa.Column("participant_ids", sa.JSON(), nullable=True))
+
+    # Chỉ chuyển các expense mà mọi split bằng nhau và tổng khớp amount; còn lại giữ dòng expense_splits
+    op.execute(
+        """
+        UPDATE expenses SET participant_ids = equal_splits.ids
+        FROM (
+            SELECT s.expense_id, json_agg(s.user_id ORDER BY s.id) AS ids
+            FROM expense_splits s JOIN expenses e ON e.id = s.expense_id
+            WHERE COALESCE(e.split_method, 'equal') = 'equal'
+            GROUP BY s.expense_id, e.amount
+            HAVING MIN(s.amount_owed) = MAX(s.amount_owed) AND ABS(SUM(s.amount_owed) - e.amount) < 0.01
+        ) AS equal_splits
+        WHERE expenses.id = equal_splits.expense_id
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM expense_splits
+        WHERE expense_id IN (SELECT id FROM expenses WHERE participant_ids IS NOT NULL)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        INSERT INTO expense_splits (expense_id, user_id, amount_owed)
+        SELECT e.id, p.user_id::integer, e.amount / json_array_length(e.participant_ids)
+        FROM expenses e
+        CROSS JOIN LATERAL json_array_elements_text(e.participant_ids) WITH ORDINALITY AS p(user_id, position)
+        WHERE e.participant_ids IS NOT NULL AND json_array_length(e.participant_ids) > 0
+        ORDER BY e.id, p.position
+        """
+    )
+    op.drop_column("expenses", "participant_ids")
@@ -0,0 +1,114 @@
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d5e6f7a8b9c0"
+down_revision: Union[str, None] = "c4d5e6f7a8b9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Bản sao của app.services.money_service.CURRENCY_EXPONENTS tại thời điểm migration
+ZERO_DECIMAL_CURRENCIES = ("VND", "JPY", "KRW", "CLP", "ISK", "PYG", "UGX", "XAF", "XOF")
+THREE_DECIMAL_CURRENCIES = ("BHD", "IQD", "JOD", "KWD", "LYD", "OMR", "TND")
+
+
+def _scale(currency_sql: str) -> str:
+    """Biểu thức SQL: số đơn vị nhỏ nhất trong một đơn vị tiền."""
+    zero = ", ".join(f"'{c}'" for c in ZERO_DECIMAL_CURRENCIES)
+    three = ", ".join(f"'{c}'" for c in THREE_DECIMAL_CURRENCIES)
+    return f"(CASE WHEN {currency_sql} IN ({zero}) THEN 1 WHEN {currency_sql} IN ({three}) THEN 1000 ELSE 100 END)"
+
+
+def _to_minor(amount_sql: str, currency_sql: str) -> str:
+    return f"CAST(ROUND(CAST({amount_sql} AS NUMERIC) * {_scale(currency_sql)}) AS BIGINT)"
+
+
+EXPENSE_CURRENCY = "COALESCE(e.currency, t.base_currency, 'VND')"
+
+
+def upgrade() -> None:
+    op.add_column("expenses", sa.Column("amount_minor", sa.BigInteger(), nullable=True))
+    op.add_column("expense_splits", sa.Column("amount_owed_minor", sa.BigInteger(), nullable=True))
+    op.add_column("settlements", sa.Column("amount_minor", sa.BigInteger(), nullable=True))
+
+    op.execute(
+        f"""
+        UPDATE expenses SET amount_minor = (
+            SELECT {_to_minor("e.amount", EXPENSE_CURRENCY)}
+            FROM expenses e JOIN trips t ON t.id = e.trip_id
+            WHERE e.id = expenses.id
+        )
+        """
+    )
+    op.execute(
+        f"""
+        UPDATE expense_splits SET amount_owed_minor = (
+            SELECT {_to_minor("expense_splits.amount_owed", EXPENSE_CURRENCY)}
+            FROM expenses e JOIN trips t ON t.id = e.trip_id
+            WHERE e.id = expense_splits.expense_id
+        )
+        """
+    )
+    op.execute(
+        f"""
+        UPDATE settlements SET amount_minor = (
+            SELECT {_to_minor("settlements.amount", "COALESCE(settlements.currency, t.base_currency, 'VND')")}
+            FROM trips t WHERE t.id = settlements.trip_id
+        )
+        """
+    )
+    op.alter_column("expenses", "amount_minor", nullable=False)
+    op.alter_column("expense_splits", "amount_owed_minor", nullable=False)
+    op.alter_column("settlements", "amount_minor", nullable=False)
+
+    # Sổ cái lưu số nguyên đơn vị nhỏ nhất: xây lại từ các cột *_minor.
+    # Expense chia đều gọn: mỗi người amount_minor / n, phần dư +1 cho những người đầu danh sách
+    # (giống money_service.allocate_largest_remainder với trọng số bằng nhau).
+    op.alter_column(
+        "trip_balances", "balance", type_=sa.BigInteger(), postgresql_using="0", server_default="0"
+    )
+    op.execute("DELETE FROM trip_balances")
+    op.execute(
+        f"""
+        INSERT INTO trip_balances (trip_id, user_id, currency, balance)
+        SELECT trip_id, user_id, currency, SUM(delta) FROM (
+            SELECT e.trip_id AS trip_id, e.payer_id AS user_id, {EXPENSE_CURRENCY} AS currency,
+                   e.amount_minor AS delta
+            FROM expenses e JOIN trips t ON t.id = e.trip_id
+            UNION ALL
+            SELECT e.trip_id, s.user_id, {EXPENSE_CURRENCY}, -s.amount_owed_minor
+            FROM expense_splits s
+            JOIN expenses e ON e.id = s.expense_id
+            JOIN trips t ON t.id = e.trip_id
+            UNION ALL
+            SELECT e.trip_id, CAST(p.user_id AS INTEGER), {EXPENSE_CURRENCY},
+                   -(e.amount_minor / json_array_length(e.participant_ids)
+                     + CASE WHEN p.position <= e.amount_minor % json_array_length(e.participant_ids) THEN 1 ELSE 0 END)
+            FROM expenses e
+            JOIN trips t ON t.id = e.trip_id
+            CROSS JOIN LATERAL json_array_elements_text(e.participant_ids) WITH ORDINALITY AS p(user_id, position)
+            WHERE e.participant_ids IS NOT NULL AND json_array_length(e.participant_ids) > 0
+            UNION ALL
+            SELECT st.trip_id, st.payer_id, st.currency, st.amount_minor FROM settlements st
+            UNION ALL
+            SELECT st.trip_id, st.receiver_id, st.currency, -st.amount_minor FROM settlements st
+        ) AS deltas
+        GROUP BY trip_id, user_id, currency
+        """
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        "trip_balances",
+        "balance",
+        type_=sa.Float(),
+        postgresql_using=f"CAST(balance AS DOUBLE PRECISION) / {_scale('currency')}",
+        server_default="0",
+    )
+    op.drop_column("settlements", "amount_minor")
+    op.drop_column("expense_splits", "amount_owed_minor")
+    op.drop_column("expenses", "amount_minor")
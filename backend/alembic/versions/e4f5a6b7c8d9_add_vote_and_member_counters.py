@@ -0,0 +1,61 @@
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e4f5a6b7c8d9"
+down_revision: Union[str, None] = "d7e8f9a0b1c2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+
+def _backfill_in_batches(bind, table: str, statement: str) -> None:
+    max_id = bind.execute(sa.text(f"SELECT MAX(id) FROM {table}")).scalar() or 0
+    for lo in range(1, max_id + 1, BATCH_SIZE):
+        bind.execute(sa.text(statement), {"lo": lo, "hi": lo + BATCH_SIZE - 1})
+
+
+def upgrade() -> None:
+    op.add_column("activities", sa.Column("upvote_count", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("activities", sa.Column("downvote_count", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("trips", sa.Column("member_count", sa.Integer(), nullable=False, server_default="0"))
+
+    bind = op.get_bind()
+    _backfill_in_batches(
+        bind,
+        "activities",
+        """
+        UPDATE activities SET
+            upvote_count = (
+                SELECT COUNT(*) FROM activity_votes v
+                WHERE v.activity_id = activities.id AND v.vote = 'upvote'
+            ),
+            downvote_count = (
+                SELECT COUNT(*) FROM activity_votes v
+                WHERE v.activity_id = activities.id AND v.vote = 'downvote'
+            )
+        WHERE id BETWEEN :lo AND :hi
+        """,
+    )
+    _backfill_in_batches(
+        bind,
+        "trips",
+        """
+        UPDATE trips SET
+            member_count = (
+                SELECT COUNT(*) FROM trip_members m
+                WHERE m.trip_id = trips.id AND m.status = 'joined'
+            )
+        WHERE id BETWEEN :lo AND :hi
+        """,
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("trips", "member_count")
+    op.drop_column("activities", "downvote_count")
+    op.drop_column("activities", "upvote_count")
@@ -0,0 +1,47 @@
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f1a2b3c4d5e6"
+down_revision: Union[str, None] = "e4f5a6b7c8d9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "trip_balances",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("trip_id", sa.Integer(), sa.ForeignKey("trips.id"), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("balance", sa.Float(), nullable=False, server_default="0"),
+        sa.UniqueConstraint("trip_id", "user_id", name="uq_trip_balances_trip_user"),
+    )
+    op.create_index("ix_trip_balances_id", "trip_balances", ["id"])
+
+    # Backfill từ dữ liệu hiện có: payer +amount, split -amount_owed, settlement payer +/receiver -
+    op.execute(
+        """
+        INSERT INTO trip_balances (trip_id, user_id, balance)
+        SELECT trip_id, user_id, SUM(delta) FROM (
+            SELECT e.trip_id AS trip_id, e.payer_id AS user_id, e.amount AS delta
+            FROM expenses e
+            UNION ALL
+            SELECT e.trip_id, s.user_id, -s.amount_owed
+            FROM expense_splits s JOIN expenses e ON e.id = s.expense_id
+            UNION ALL
+            SELECT st.trip_id, st.payer_id, st.amount FROM settlements st
+            UNION ALL
+            SELECT st.trip_id, st.receiver_id, -st.amount FROM settlements st
+        ) AS deltas
+        GROUP BY trip_id, user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_trip_balances_id", table_name="trip_balances")
+    op.drop_table("trip_balances")
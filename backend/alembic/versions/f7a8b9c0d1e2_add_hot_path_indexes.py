@@ -0,0 +1,100 @@
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f7a8b9c0d1e2"
+down_revision: Union[str, None] = "e6f7a8b9c0d1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (tên, bảng, cột). expenses.trip_id đã được phủ bởi ix_expenses_trip_date_id (cột đầu là trip_id).
+INDEXES = [
+    ("ix_trip_members_user_id", "trip_members", ["user_id"]),
+    ("ix_activity_votes_activity_vote", "activity_votes", ["activity_id", "vote"]),
+    ("ix_activities_day_id", "activities", ["day_id"]),
+    ("ix_expense_splits_expense_id", "expense_splits", ["expense_id"]),
+    ("ix_documents_trip_id", "documents", ["trip_id"]),
+    ("ix_checklist_items_trip_id", "checklist_items", ["trip_id"]),
+]
+UNIQUE_CONSTRAINTS = [
+    ("uq_trip_members_trip_user", "trip_members", ["trip_id", "user_id"]),
+    ("uq_activity_votes_activity_user", "activity_votes", ["activity_id", "user_id"]),
+    ("uq_itinerary_days_trip_day", "itinerary_days", ["trip_id", "day_number"]),
+]
+
+
+def _remove_duplicates() -> None:
+    # Thành viên trùng: giữ dòng đầu tiên, đếm lại member_count
+    op.execute(
+        """
+        DELETE FROM trip_members a USING trip_members b
+        WHERE a.trip_id = b.trip_id AND a.user_id = b.user_id AND a.id > b.id
+        """
+    )
+    op.execute(
+        """
+        UPDATE trips SET member_count = (
+            SELECT COUNT(*) FROM trip_members m WHERE m.trip_id = trips.id AND m.status = 'joined'
+        )
+        """
+    )
+
+    # Vote trùng (double tap): giữ vote mới nhất, đếm lại bộ đếm vote
+    op.execute(
+        """
+        DELETE FROM activity_votes a USING activity_votes b
+        WHERE a.activity_id = b.activity_id AND a.user_id = b.user_id AND a.id < b.id
+        """
+    )
+    op.execute(
+        """
+        UPDATE activities SET
+            upvote_count = (SELECT COUNT(*) FROM activity_votes v WHERE v.activity_id = activities.id AND v.vote = 'upvote'),
+            downvote_count = (SELECT COUNT(*) FROM activity_votes v WHERE v.activity_id = activities.id AND v.vote = 'downvote')
+        """
+    )
+
+    # Ngày trùng: chuyển activity sang ngày giữ lại rồi xóa ngày thừa
+    op.execute(
+        """
+        UPDATE activities SET day_id = d.keep_id
+        FROM (
+            SELECT id, MIN(id) OVER (PARTITION BY trip_id, day_number) AS keep_id FROM itinerary_days
+        ) AS d
+        WHERE activities.day_id = d.id AND d.id <> d.keep_id
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM itinerary_days a USING itinerary_days b
+        WHERE a.trip_id = b.trip_id AND a.day_number = b.day_number AND a.id > b.id
+        """
+    )
+
+
+# Chỉ hỗ trợ PostgreSQL (DELETE ... USING, CREATE INDEX CONCURRENTLY, ADD CONSTRAINT ... USING INDEX),
+# giống các migration khác dùng SQL thuần của PostgreSQL.
+
+
+def upgrade() -> None:
+    _remove_duplicates()
+
+    # CREATE INDEX CONCURRENTLY không chạy được trong transaction và không khóa ghi vào bảng
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+        for name, table, columns in UNIQUE_CONSTRAINTS:
+            op.create_index(name, table, columns, unique=True, postgresql_concurrently=True)
+            op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}")
+
+
+def downgrade() -> None:
+    for name, table, _ in UNIQUE_CONSTRAINTS:
+        op.drop_constraint(name, table, type_="unique")
+
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -42,6 +42,31 @@ def _parse_cors_origins(raw: str) -> list[str]:
 
 CORS_ORIGINS = _parse_cors_origins(os.getenv("CORS_ORIGINS", "*"))
 
+# Debug: thêm header X-DB-Query-Count / X-DB-Time-Ms vào mọi response
+DEBUG = os.getenv("DEBUG", "false").strip().lower() in ("1", "true", "yes")
+# Ghi log cảnh báo khi một request chạy nhiều câu SQL hơn ngưỡng này
+SQL_QUERY_WARN_THRESHOLD = int(os.getenv("SQL_QUERY_WARN_THRESHOLD", "20"))
+
+# Cache user đã xác thực trong get_current_user (0 = tắt)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+# Cache danh sách trip mà user là thành viên, dùng để kiểm tra quyền truy cập trip
+TRIP_MEMBERSHIP_CACHE_SIZE = int(os.getenv("TRIP_MEMBERSHIP_CACHE_SIZE", "1024"))
+TRIP_MEMBERSHIP_CACHE_TTL_SECONDS = float(os.getenv("TRIP_MEMBERSHIP_CACHE_TTL_SECONDS", "60"))
+# Cache đồ thị tỷ giá theo (trip, finance_version)
+RATE_GRAPH_CACHE_SIZE = int(os.getenv("RATE_GRAPH_CACHE_SIZE", "512"))
+RATE_GRAPH_CACHE_TTL_SECONDS = float(os.getenv("RATE_GRAPH_CACHE_TTL_SECONDS", "600"))
+# Cache thống kê chi tiêu theo (trip, finance_version)
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "256"))
+ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "600"))
+# Cache bảng cân đối theo (trip, solver, finance_version)
+BALANCE_SNAPSHOT_CACHE_SIZE = int(os.getenv("BALANCE_SNAPSHOT_CACHE_SIZE", "512"))
+BALANCE_SNAPSHOT_CACHE_TTL_SECONDS = float(os.getenv("BALANCE_SNAPSHOT_CACHE_TTL_SECONDS", "600"))
+# Nhúng danh sách trip + vai trò vào access token để kiểm tra quyền không cần DB.
+# User có nhiều trip hơn TOKEN_TRIP_CLAIMS_MAX thì token không mang claim (kiểm tra qua cache/DB như thường).
+TOKEN_TRIP_CLAIMS = os.getenv("TOKEN_TRIP_CLAIMS", "false").strip().lower() in ("1", "true", "yes")
+TOKEN_TRIP_CLAIMS_MAX = int(os.getenv("TOKEN_TRIP_CLAIMS_MAX", "50"))
+
 # SendGrid Email Configuration
 SENDGRID_API_KEY = _require_env("SENDGRID_API_KEY")
 SENDGRID_FROM_EMAIL = _require_env("SENDGRID_FROM_EMAIL")
@@ -0,0 +1,17 @@
+from app.config import TRIP_MEMBERSHIP_CACHE_SIZE, TRIP_MEMBERSHIP_CACHE_TTL_SECONDS
+from app.core.ttl_cache import TTLCache
+from app.core.user_cache import user_cache
+
+# user_id -> frozenset trip_id mà user là thành viên (dependencies.check_trip_member).
+
+membership_cache = TTLCache(TRIP_MEMBERSHIP_CACHE_SIZE, TRIP_MEMBERSHIP_CACHE_TTL_SECONDS)
+
+
+def invalidate_user_memberships(*user_ids: int):
+    """
+    Gọi sau khi commit thay đổi trip_members (tạo/tham gia/xóa trip, thêm thành viên).
+    Bỏ luôn User đã cache vì membership_version của user vừa tăng.
+    """
+    for user_id in user_ids:
+        membership_cache.invalidate(user_id)
+        user_cache.invalidate(user_id)
@@ -0,0 +1,65 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+
+# Đếm số câu SQL và thời gian DB cho từng request (middleware trong main.py bật bằng track_queries)
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0 # giây
+
+    @property
+    def duration_ms(self) -> float:
+        return round(self.duration * 1000, 2)
+
+
+# Các bộ đếm đang bật (lồng nhau được, ví dụ assert_max_queries bao ngoài middleware)
+_active_stats: ContextVar[tuple[QueryStats, ...]] = ContextVar("query_stats", default=())
+
+
+def install_query_counter(engine):
+    """Gắn listener vào engine; chỉ ghi nhận khi đang trong track_queries()."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        for stats in _active_stats.get():
+            stats.count += 1
+            stats.duration += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        # Câu lỗi không qua after_cursor_execute: bỏ mốc thời gian của nó để không lệch các câu sau
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start_time"):
+            conn.info["query_start_time"].pop()
+
+
+@contextmanager
+def track_queries():
+    """
+    Đếm câu SQL chạy trong khối with. Endpoint sync chạy trong threadpool với bản sao context
+    nên vẫn cộng vào cùng đối tượng QueryStats.
+    """
+    stats = QueryStats()
+    token = _active_stats.set(_active_stats.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active_stats.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """Dùng khi kiểm thử: báo lỗi nếu khối with chạy quá `limit` câu SQL."""
+    with track_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        raise AssertionError(f"Chạy {stats.count} câu SQL, vượt giới hạn {limit}")
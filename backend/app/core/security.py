@@ -19,13 +19,25 @@ def get_password_hash(password: str) -> str:
 def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+def create_access_token(
+    data: dict,
+    expires_delta: Optional[timedelta] = None,
+    memberships: Optional[list[tuple[int, str]]] = None,
+    membership_version: Optional[int] = None,
+) -> str:
+    """
+    memberships: danh sách (trip_id, role) để nhúng vào claim "trips", kèm "trips_v" = membership_version
+    của user lúc phát token. Claim lệch version hiện tại thì bị coi là cũ (xem dependencies.check_trip_member).
+    """
     to_encode = data.copy()
 
     expire = datetime.now(timezone.utc) + (
         expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     to_encode.update({"exp": expire})
+    if memberships is not None:
+        to_encode["trips"] = [[trip_id, role] for trip_id, role in memberships]
+        to_encode["trips_v"] = membership_version or 0
 
     return encode(to_encode, SECRET_KEY, algorithm="HS256")
 
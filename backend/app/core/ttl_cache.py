@@ -0,0 +1,50 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Hashable
+
+# Cache trong tiến trình dùng chung (user, membership, đồ thị tỷ giá, thống kê, bảng cân đối); max_size hoặc ttl <= 0 thì không lưu gì.
+
+
+class TTLCache:
+    """LRU có TTL: quá max_size thì bỏ mục dùng lâu nhất, quá ttl giây thì đọc lại từ DB."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict[Hashable, tuple[float, object]] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._items[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._items), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,12 @@
+from app.config import USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS
+from app.core.ttl_cache import TTLCache
+
+# Cache user đã xác thực theo user_id (dependencies.get_current_user), tránh SELECT users ở mọi request.
+# Giá trị là đối tượng User đã tách khỏi session: chỉ dùng để đọc, không add/merge lại vào session khác.
+
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
+
+
+def invalidate_cached_user(user_id: int):
+    """Gọi sau khi commit thay đổi thông tin user (profile, avatar, mật khẩu, OTP)."""
+    user_cache.invalidate(user_id)
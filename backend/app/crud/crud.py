@@ -1,65 +1,58 @@
-from sqlalchemy import or_
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import or_, and_, insert, delete, select, update, func
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from app import models
+from app.database import dialect_insert
 from app.schemas import user as user_schema
 from app.schemas import trip as trip_schema
 from app.schemas import itinerary as itinerary_schema
 from app.schemas import expense as expense_schema
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash, verify_password, create_access_token
+from app.config import TOKEN_TRIP_CLAIMS, TOKEN_TRIP_CLAIMS_MAX
+from app.core.user_cache import invalidate_cached_user
+from app.core.membership_cache import invalidate_user_memberships
+from app.services.finance_service import (
+    apply_balance_deltas,
+    bump_finance_version,
+    equal_split_rows,
+    expense_balance_deltas,
+    expense_split_rows,
+    get_trip_base_currency,
+    get_trip_finance_state,
+)
+from app.services.currency_service import convert_amount, ensure_convertible, get_rate_graph
+from app.services.money_service import allocate_largest_remainder, from_minor, to_minor
 from typing import Optional
-from datetime import date
+from datetime import date, datetime, timedelta
+import base64
 from sqlalchemy.exc import SQLAlchemyError
 
 
-def _get_joined_trip_member_count(db: Session, trip_id: int) -> int:
-    return (
-        db.query(models.trip.TripMember)
-        .filter(models.trip.TripMember.trip_id == trip_id)
-        .filter(models.trip.TripMember.status == "joined")
-        .count()
-    )
-
-
-def _maybe_auto_confirm_activity(db: Session, activity_id: int) -> bool:
-    activity = (
-        db.query(models.itinerary.Activity)
-        .join(
-            models.itinerary.ItineraryDay,
-            models.itinerary.Activity.day_id == models.itinerary.ItineraryDay.id,
+def _update_vote_tallies(db: Session, activity_id: int, upvotes: int = 0, downvotes: int = 0, auto_confirm: bool = False):
+    """
+    Cộng dồn bộ đếm vote tại chỗ (col = col + delta): UPDATE khóa dòng activity và đọc lại giá trị mới nhất,
+    nên các request vote đồng thời không làm lệch bộ đếm.
+    auto_confirm: xác nhận activity khi số upvote (sau khi cộng) đạt quá nửa số thành viên trip.
+    """
+    Activity = models.itinerary.Activity
+    values = {}
+    if upvotes:
+        values[Activity.upvote_count] = Activity.upvote_count + upvotes
+    if downvotes:
+        values[Activity.downvote_count] = Activity.downvote_count + downvotes
+    if auto_confirm:
+        member_count = (
+            select(models.trip.Trip.member_count)
+            .join(models.itinerary.ItineraryDay, models.itinerary.ItineraryDay.trip_id == models.trip.Trip.id)
+            .where(models.itinerary.ItineraryDay.id == Activity.day_id)
+            .scalar_subquery()
         )
-        .filter(models.itinerary.Activity.id == activity_id)
-        .first()
-    )
-    if not activity or activity.is_confirmed:
-        return False
-
-    day = (
-        db.query(models.itinerary.ItineraryDay)
-        .filter(models.itinerary.ItineraryDay.id == activity.day_id)
-        .first()
-    )
-    if not day:
-        return False
-
-    member_count = _get_joined_trip_member_count(db, day.trip_id)
-    if member_count <= 0:
-        return False
-
-    required_upvotes = (member_count // 2) + 1
-    upvotes = (
-        db.query(models.itinerary.ActivityVote)
-        .filter(models.itinerary.ActivityVote.activity_id == activity_id)
-        .filter(models.itinerary.ActivityVote.vote == "upvote")
-        .count()
-    )
-
-    if upvotes < required_upvotes:
-        return False
-
-    activity.is_confirmed = True
-    db.commit()
-    db.refresh(activity)
-    return True
+        values[Activity.is_confirmed] = or_(
+            Activity.is_confirmed.is_(True),
+            and_(member_count > 0, Activity.upvote_count + upvotes >= member_count // 2 + 1),
+        )
+    if values:
+        db.execute(update(Activity).where(Activity.id == activity_id).values(values))
 
 # --- USERS ---
 def get_user_by_email(db: Session, email: str):
@@ -85,6 +78,32 @@ def authenticate_user(db: Session, email: str, password: str):
         return None
     return user
 
+def create_user_access_token(db: Session, user, expires_delta: Optional[timedelta] = None) -> str:
+    """
+    Access token cho user; khi bật TOKEN_TRIP_CLAIMS thì nhúng thêm (trip_id, role) và membership_version.
+    Version được đọc từ user trước khi đọc trip_members nên không bao giờ mới hơn danh sách trip trong token.
+    """
+    data = {"sub": str(user.id)}
+    if not TOKEN_TRIP_CLAIMS:
+        return create_access_token(data, expires_delta=expires_delta)
+
+    version = user.membership_version
+    memberships = (
+        db.query(models.trip.TripMember.trip_id, models.trip.TripMember.role)
+        .filter(models.trip.TripMember.user_id == user.id)
+        .order_by(models.trip.TripMember.trip_id)
+        .limit(TOKEN_TRIP_CLAIMS_MAX + 1)
+        .all()
+    )
+    if len(memberships) > TOKEN_TRIP_CLAIMS_MAX:
+        return create_access_token(data, expires_delta=expires_delta)
+    return create_access_token(
+        data,
+        expires_delta=expires_delta,
+        memberships=[(trip_id, role or "member") for trip_id, role in memberships],
+        membership_version=version,
+    )
+
 def update_user_otp(db: Session, email: str, otp_code: str, otp_expires_at):
     """Update user's OTP code and expiration time"""
     user = get_user_by_email(db, email)
@@ -93,6 +112,7 @@ def update_user_otp(db: Session, email: str, otp_code: str, otp_expires_at):
         user.otp_expires_at = otp_expires_at
         db.commit()
         db.refresh(user)
+        invalidate_cached_user(user.id)
     return user
 
 def verify_user_otp(db: Session, email: str, otp_code: str):
@@ -117,10 +137,15 @@ def reset_user_password(db: Session, email: str, new_password: str):
         user.otp_expires_at = None
         db.commit()
         db.refresh(user)
+        invalidate_cached_user(user.id)
     return user
 
 # --- TRIPS ---
 def _sync_itinerary_days_for_range(db: Session, trip_id: int, start_date: Optional[date], end_date: Optional[date]):
+    """
+    Đồng bộ ItineraryDay theo khoảng ngày bằng câu lệnh INSERT/DELETE hàng loạt.
+    Không commit: caller commit cùng transaction với thay đổi của trip.
+    """
     if not start_date or not end_date:
         return
 
@@ -128,20 +153,37 @@ def _sync_itinerary_days_for_range(db: Session, trip_id: int, start_date: Option
     if total_days <= 0:
         return
 
-    existing_days = db.query(models.itinerary.ItineraryDay).filter(
-        models.itinerary.ItineraryDay.trip_id == trip_id
-    ).all()
-    existing_numbers = {d.day_number for d in existing_days}
-
-    for i in range(1, total_days + 1):
-        if i not in existing_numbers:
-            db.add(models.itinerary.ItineraryDay(trip_id=trip_id, day_number=i))
+    ItineraryDay = models.itinerary.ItineraryDay
+    Activity = models.itinerary.Activity
+    ActivityVote = models.itinerary.ActivityVote
 
-    for d in existing_days:
-        if d.day_number > total_days:
-            db.delete(d)
+    existing_numbers = {
+        n for (n,) in db.query(ItineraryDay.day_number).filter(ItineraryDay.trip_id == trip_id).all()
+    }
 
-    db.commit()
+    missing = [
+        {"trip_id": trip_id, "day_number": i}
+        for i in range(1, total_days + 1)
+        if i not in existing_numbers
+    ]
+    if missing:
+        db.execute(insert(ItineraryDay), missing)
+
+    if any(n > total_days for n in existing_numbers):
+        # Xóa hàng loạt bỏ qua cascade của ORM nên phải xóa vote và hoạt động của các ngày bị cắt trước
+        removed_day_ids = (
+            select(ItineraryDay.id)
+            .where(ItineraryDay.trip_id == trip_id)
+            .where(ItineraryDay.day_number > total_days)
+        )
+        removed_activity_ids = select(Activity.id).where(Activity.day_id.in_(removed_day_ids))
+        db.execute(delete(ActivityVote).where(ActivityVote.activity_id.in_(removed_activity_ids)))
+        db.execute(delete(Activity).where(Activity.day_id.in_(removed_day_ids)))
+        db.execute(
+            delete(ItineraryDay)
+            .where(ItineraryDay.trip_id == trip_id)
+            .where(ItineraryDay.day_number > total_days)
+        )
 
 
 def create_trip(db: Session, trip: trip_schema.TripCreate, user_id: int):
@@ -154,22 +196,32 @@ def create_trip(db: Session, trip: trip_schema.TripCreate, user_id: int):
         "destination": trip.destination,
         "description": trip.description,
         "cover_image_url": getattr(trip, "cover_image_url", None),
+        "member_count": 1,
     }
     if trip.invite_code is not None:
         trip_kwargs["invite_code"] = trip.invite_code
 
-    db_trip = models.trip.Trip(**trip_kwargs)
-    db.add(db_trip)
-    db.commit()
-    db.refresh(db_trip)
+    try:
+        db_trip = models.trip.Trip(**trip_kwargs)
+        db.add(db_trip)
+        # Flush để lấy trip.id, toàn bộ trip + chủ nhóm + các ngày được commit một lần
+        db.flush()
+
+        # Tự động thêm chủ nhóm vào làm thành viên (Role: Owner)
+        db.execute(
+            insert(models.trip.TripMember),
+            [{"trip_id": db_trip.id, "user_id": user_id, "role": "owner", "status": "joined"}],
+        )
+        _sync_itinerary_days_for_range(db, trip_id=db_trip.id, start_date=db_trip.start_date, end_date=db_trip.end_date)
+        _bump_membership_versions(db, [user_id])
 
-    _sync_itinerary_days_for_range(db, trip_id=db_trip.id, start_date=db_trip.start_date, end_date=db_trip.end_date)
-    
-    # Tự động thêm chủ nhóm vào làm thành viên (Role: Owner)
-    member = models.trip.TripMember(trip_id=db_trip.id, user_id=user_id, role="owner")
-    db.add(member)
-    db.commit()
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        raise
 
+    invalidate_user_memberships(user_id)
+    db.refresh(db_trip)
     return db_trip
 
 def get_trip(db: Session, trip_id: int):
@@ -181,6 +233,19 @@ def update_trip(db: Session, trip_id: int, trip_update: trip_schema.TripUpdate):
         return None
 
     update_data = trip_update.dict(exclude_unset=True)
+    new_base_currency = update_data.get("base_currency")
+    if new_base_currency and new_base_currency != db_trip.base_currency:
+        # Mọi loại tiền đã có trong sổ cái phải quy đổi được về base_currency mới (kiểm tra trước khi sửa trip)
+        ledger_currencies = [
+            currency for (currency,) in db.query(models.expense.TripBalance.currency)
+            .filter(models.expense.TripBalance.trip_id == trip_id)
+            .distinct()
+            .all()
+        ]
+        graph = get_rate_graph(db, trip_id, db_trip.finance_version)
+        for currency in ledger_currencies:
+            ensure_convertible(graph, currency, new_base_currency)
+
     if "name" in update_data and update_data["name"] is not None:
         db_trip.name = update_data["name"]
     if "destination" in update_data:
@@ -193,18 +258,40 @@ def update_trip(db: Session, trip_id: int, trip_update: trip_schema.TripUpdate):
         db_trip.start_date = update_data["start_date"]
     if "end_date" in update_data:
         db_trip.end_date = update_data["end_date"]
+    base_currency_changed = False
     if "base_currency" in update_data and update_data["base_currency"]:
+        base_currency_changed = update_data["base_currency"] != db_trip.base_currency
         db_trip.base_currency = update_data["base_currency"]
     if "invite_code" in update_data and update_data["invite_code"]:
         db_trip.invite_code = update_data["invite_code"]
 
-    db.commit()
+    try:
+        _sync_itinerary_days_for_range(db, trip_id=trip_id, start_date=db_trip.start_date, end_date=db_trip.end_date)
+        if base_currency_changed:
+            # Bảng cân đối / thống kê đều quy đổi về base_currency
+            bump_finance_version(db, trip_id)
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        raise
+
     db.refresh(db_trip)
+    return db_trip    
 
-    _sync_itinerary_days_for_range(db, trip_id=trip_id, start_date=db_trip.start_date, end_date=db_trip.end_date)
 
-    return db_trip    
+def _bump_membership_versions(db: Session, user_ids):
+    """Tăng users.membership_version (không commit) để claim trip trong token cũ bị phát hiện là lỗi thời."""
+    if user_ids:
+        db.query(models.user.User).filter(models.user.User.id.in_(user_ids)).update(
+            {models.user.User.membership_version: models.user.User.membership_version + 1},
+            synchronize_session=False,
+        )
 
+def _increment_trip_member_count(db: Session, trip_id: int, delta: int = 1):
+    db.query(models.trip.Trip).filter(models.trip.Trip.id == trip_id).update(
+        {models.trip.Trip.member_count: models.trip.Trip.member_count + delta},
+        synchronize_session=False,
+    )
 
 def list_trips_for_user(db: Session, user_id: int):
     return db.query(models.trip.Trip).join(
@@ -227,7 +314,10 @@ def join_trip_by_code(db: Session, invite_code: str, user_id: int):
         
     new_member = models.trip.TripMember(trip_id=trip.id, user_id=user_id, role="member")
     db.add(new_member)
+    _increment_trip_member_count(db, trip.id)
+    _bump_membership_versions(db, [user_id])
     db.commit()
+    invalidate_user_memberships(user_id)
     
     return trip
 
@@ -246,7 +336,10 @@ def add_member_to_trip(db: Session, trip_id: int, user_email: str):
         
     new_member = models.trip.TripMember(trip_id=trip_id, user_id=user.id, role="member")
     db.add(new_member)
+    _increment_trip_member_count(db, trip_id)
+    _bump_membership_versions(db, [user.id])
     db.commit()
+    invalidate_user_memberships(user.id)
     
     return {"user": user, "already_member": False}
 
@@ -290,48 +383,81 @@ def create_activity(db: Session, activity: itinerary_schema.ActivityCreate, user
     return db_activity
 
 def vote_activity(db: Session, activity_id: int, user_id: int, vote: str = "upvote"):
+    """
+    Bấm lại cùng loại vote thì hủy, khác loại thì đổi, chưa có thì thêm.
+    Mỗi nhánh là một câu lệnh nguyên tử (DELETE / UPDATE có điều kiện, INSERT ... ON CONFLICT) dựa trên
+    uq_activity_votes_activity_user nên double tap không tạo vote trùng; bộ đếm chỉ đổi ±1 theo nhánh
+    thực sự ghi. Trả về dòng (id, vote) hoặc None khi đã hủy.
+    """
     if vote not in ("upvote", "downvote"):
         raise ValueError("vote_type phải là upvote hoặc downvote")
 
-    existing = db.query(models.itinerary.ActivityVote).filter(
-        models.itinerary.ActivityVote.activity_id == activity_id,
-        models.itinerary.ActivityVote.user_id == user_id
+    ActivityVote = models.itinerary.ActivityVote
+    delta = {"upvote": 0, "downvote": 0}
+    # Bấm lại cùng loại: hủy vote
+    cancelled = db.execute(
+        delete(ActivityVote)
+        .where(
+            ActivityVote.activity_id == activity_id,
+            ActivityVote.user_id == user_id,
+            ActivityVote.vote == vote,
+        )
+        .returning(ActivityVote.id)
     ).first()
-    
-    if existing:
-        # Toggle off when tapping the same vote again.
-        if existing.vote == vote:
-            db.delete(existing)
-            db.commit()
-            return None
-
-        existing.vote = vote
-        db.commit()
-        db.refresh(existing)
-        if vote == "upvote":
-            _maybe_auto_confirm_activity(db, activity_id)
-        return existing
-        
-    v = models.itinerary.ActivityVote(activity_id=activity_id, user_id=user_id, vote=vote)
-    db.add(v)
+
+    v = None
+    if cancelled is not None:
+        delta[vote] -= 1
+    else:
+        # Đang có vote khác loại: đổi (UPDATE khóa dòng vote nên hai lần đổi đồng thời chỉ một lần khớp)
+        v = db.execute(
+            update(ActivityVote)
+            .where(
+                ActivityVote.activity_id == activity_id,
+                ActivityVote.user_id == user_id,
+                ActivityVote.vote != vote,
+            )
+            .values(vote=vote)
+            .returning(ActivityVote.id, ActivityVote.vote)
+        ).first()
+        if v is not None:
+            delta[vote] += 1
+            delta["downvote" if vote == "upvote" else "upvote"] -= 1
+        else:
+            # Chưa có vote: thêm mới; double tap đụng uq_activity_votes_activity_user thì không đếm lần hai
+            stmt = dialect_insert(db, ActivityVote).values(activity_id=activity_id, user_id=user_id, vote=vote)
+            v = db.execute(
+                stmt.on_conflict_do_nothing(
+                    index_elements=[ActivityVote.activity_id, ActivityVote.user_id],
+                ).returning(ActivityVote.id, ActivityVote.vote)
+            ).first()
+            if v is not None:
+                delta[vote] += 1
+            else:
+                v = db.execute(
+                    select(ActivityVote.id, ActivityVote.vote).where(
+                        ActivityVote.activity_id == activity_id, ActivityVote.user_id == user_id
+                    )
+                ).first()
+
+    _update_vote_tallies(
+        db,
+        activity_id,
+        upvotes=delta["upvote"],
+        downvotes=delta["downvote"],
+        auto_confirm=delta["upvote"] > 0,
+    )
+
+    # Vote + bộ đếm + auto-confirm được commit trong cùng một transaction
     db.commit()
-    db.refresh(v)
-    if vote == "upvote":
-        _maybe_auto_confirm_activity(db, activity_id)
     return v
 
 def get_activities_for_day(db: Session, day_id: int):
     activities = db.query(models.itinerary.Activity).filter(models.itinerary.Activity.day_id == day_id).all()
     result = []
     for activity in activities:
-        upvotes = db.query(models.itinerary.ActivityVote).filter(
-            models.itinerary.ActivityVote.activity_id == activity.id,
-            models.itinerary.ActivityVote.vote == "upvote"
-        ).count()
-        downvotes = db.query(models.itinerary.ActivityVote).filter(
-            models.itinerary.ActivityVote.activity_id == activity.id,
-            models.itinerary.ActivityVote.vote == "downvote"
-        ).count()
+        upvotes = activity.upvote_count or 0
+        downvotes = activity.downvote_count or 0
         result.append({
             "activity": activity,
             "upvotes": upvotes,
@@ -348,17 +474,74 @@ def confirm_activity(db: Session, activity_id: int):
         db.refresh(activity)
     return activity
 
-def get_itinerary_for_trip(db: Session, trip_id: int):
+def get_itinerary_for_trip(db: Session, trip_id: int, current_user_id: Optional[int] = None):
+    """
+    Tải toàn bộ lịch trình với số query cố định (ngày, hoạt động, tên người tạo, vote của mình),
+    không phụ thuộc số ngày hay số hoạt động.
+    """
     days = db.query(models.itinerary.ItineraryDay).filter(
         models.itinerary.ItineraryDay.trip_id == trip_id
     ).order_by(models.itinerary.ItineraryDay.day_number).all()
-    
+    if not days:
+        return []
+
+    activities = (
+        db.query(models.itinerary.Activity)
+        .join(
+            models.itinerary.ItineraryDay,
+            models.itinerary.Activity.day_id == models.itinerary.ItineraryDay.id,
+        )
+        .filter(models.itinerary.ItineraryDay.trip_id == trip_id)
+        .order_by(models.itinerary.Activity.id)
+        .all()
+    )
+
+    user_ids = {a.created_by for a in activities if a.created_by is not None}
+    user_name_by_id: dict[int, str] = {}
+    if user_ids:
+        users = (
+            db.query(models.user.User.id, models.user.User.name)
+            .filter(models.user.User.id.in_(user_ids))
+            .all()
+        )
+        user_name_by_id = {uid: (name or "").strip() for uid, name in users}
+
+    my_vote_by_activity_id: dict[int, str] = {}
+    if current_user_id is not None and activities:
+        votes = (
+            db.query(models.itinerary.ActivityVote.activity_id, models.itinerary.ActivityVote.vote)
+            .join(
+                models.itinerary.Activity,
+                models.itinerary.ActivityVote.activity_id == models.itinerary.Activity.id,
+            )
+            .join(
+                models.itinerary.ItineraryDay,
+                models.itinerary.Activity.day_id == models.itinerary.ItineraryDay.id,
+            )
+            .filter(models.itinerary.ItineraryDay.trip_id == trip_id)
+            .filter(models.itinerary.ActivityVote.user_id == current_user_id)
+            .all()
+        )
+        my_vote_by_activity_id = {activity_id: vote for activity_id, vote in votes}
+
+    activities_by_day_id: dict[int, list] = {day.id: [] for day in days}
+    for activity in activities:
+        upvotes = activity.upvote_count or 0
+        downvotes = activity.downvote_count or 0
+        activities_by_day_id.setdefault(activity.day_id, []).append({
+            "activity": activity,
+            "upvotes": upvotes,
+            "downvotes": downvotes,
+            "net_votes": upvotes - downvotes,
+            "created_by_name": user_name_by_id.get(activity.created_by, "") if activity.created_by is not None else "",
+            "my_vote": my_vote_by_activity_id.get(activity.id),
+        })
+
     result = []
     for day in days:
-        activities_data = get_activities_for_day(db, day.id)
         result.append({
             "day": day,
-            "activities": activities_data
+            "activities": activities_by_day_id.get(day.id, [])
         })
     return result
 
@@ -403,18 +586,8 @@ def get_activities_by_trip_and_day_number(
 
     result = []
     for activity in activities:
-        upvotes = (
-            db.query(models.itinerary.ActivityVote)
-            .filter(models.itinerary.ActivityVote.activity_id == activity.id)
-            .filter(models.itinerary.ActivityVote.vote == "upvote")
-            .count()
-        )
-        downvotes = (
-            db.query(models.itinerary.ActivityVote)
-            .filter(models.itinerary.ActivityVote.activity_id == activity.id)
-            .filter(models.itinerary.ActivityVote.vote == "downvote")
-            .count()
-        )
+        upvotes = activity.upvote_count or 0
+        downvotes = activity.downvote_count or 0
 
         start_time = ""
         if activity.start_time is not None:
@@ -461,56 +634,75 @@ def get_activities_by_trip_and_day_number(
     return result
 
 # --- EXPENSES ---
+def _get_trip_member_ids(db: Session, trip_id: int, user_ids) -> set[int]:
+    """Trả về tập user_id (trong user_ids) là thành viên của trip, dùng một query IN."""
+    if not user_ids:
+        return set()
+    rows = db.query(models.trip.TripMember.user_id).filter(
+        models.trip.TripMember.trip_id == trip_id,
+        models.trip.TripMember.user_id.in_(user_ids)
+    ).all()
+    return {row[0] for row in rows}
+
+def _get_trip_member_ids_with_finance_state(db: Session, trip_id: int, user_ids) -> tuple[set[int], str, int]:
+    """Như _get_trip_member_ids, kèm (base_currency, finance_version) của trip đọc trong cùng query."""
+    Trip = models.trip.Trip
+    TripMember = models.trip.TripMember
+    rows = (
+        db.query(TripMember.user_id, Trip.base_currency, Trip.finance_version)
+        .join(Trip, Trip.id == TripMember.trip_id)
+        .filter(TripMember.trip_id == trip_id, TripMember.user_id.in_(user_ids))
+        .all()
+    )
+    if not rows:
+        return set(), "VND", 0
+    return {row.user_id for row in rows}, rows[0].base_currency or "VND", rows[0].finance_version or 0
+
 def create_expense(db: Session, expense: expense_schema.ExpenseCreate, user_id: int):
-    # Validate: Check if payer is a member of the trip
-    is_payer_member = db.query(models.trip.TripMember).filter(
-        models.trip.TripMember.trip_id == expense.trip_id,
-        models.trip.TripMember.user_id == user_id
-    ).first()
-    if not is_payer_member:
+    # Validate: payer và tất cả người được chia đều phải là thành viên (một query IN duy nhất)
+    involved_ids = list(dict.fromkeys(expense.involved_user_ids or []))
+    member_ids, base_currency, version = _get_trip_member_ids_with_finance_state(
+        db, expense.trip_id, {user_id, *involved_ids}
+    )
+    if user_id not in member_ids:
         raise ValueError(f"Người trả tiền (ID {user_id}) không phải là thành viên của chuyến đi này")
-    
-    # Validate: Check if all involved users are members of the trip
-    if expense.involved_user_ids:
-        for member_id in expense.involved_user_ids:
-            is_member = db.query(models.trip.TripMember).filter(
-                models.trip.TripMember.trip_id == expense.trip_id,
-                models.trip.TripMember.user_id == member_id
-            ).first()
-            if not is_member:
-                raise ValueError(f"User ID {member_id} không phải là thành viên của chuyến đi này")
+
+    non_member_ids = [member_id for member_id in involved_ids if member_id not in member_ids]
+    if non_member_ids:
+        raise ValueError(
+            f"User ID {', '.join(str(i) for i in non_member_ids)} không phải là thành viên của chuyến đi này"
+        )
+
+    # Lưu số nguyên theo đơn vị nhỏ nhất của loại tiền (VND: đồng, USD: cent)
+    amount_minor = to_minor(expense.amount, expense.currency)
+    if amount_minor <= 0:
+        raise ValueError(f"Số tiền quá nhỏ đối với loại tiền {expense.currency}")
+    if expense.currency != base_currency:
+        ensure_convertible(get_rate_graph(db, expense.trip_id, version), expense.currency, base_currency)
     
     # Tạo expense record
     db_expense = models.expense.Expense(
         trip_id=expense.trip_id,
         payer_id=user_id,
-        amount=expense.amount,
+        amount=from_minor(amount_minor, expense.currency),
+        amount_minor=amount_minor,
         currency=expense.currency,
         description=expense.description,
         split_method=expense.split_method,
-        expense_date=expense.expense_date
+        expense_date=expense.expense_date,
+        # Chia đều: lưu danh sách người tham gia ngay trên expense, không tạo dòng expense_splits
+        participant_ids=involved_ids,
     )
     db.add(db_expense)
+    split_rows = equal_split_rows(amount_minor, involved_ids)
+
+    # Cập nhật sổ cái số dư trong cùng transaction
+    apply_balance_deltas(
+        db, expense.trip_id, expense_balance_deltas(user_id, amount_minor, split_rows), expense.currency
+    )
+    bump_finance_version(db, expense.trip_id)
     
-    # Flush để gán ID cho expense (cần ID để tạo splits), nhưng CHƯA lưu vào DB
-    # Nếu có lỗi ở bước sau, toàn bộ transaction sẽ bị rollback
-    db.flush()
-    
-    # Tạo expense splits (chia tiền cho từng người)
-    if expense.involved_user_ids:
-        num_people = len(expense.involved_user_ids)
-        split_amount = expense.amount / num_people
-
-        for member_id in expense.involved_user_ids:
-            split = models.expense.ExpenseSplit(
-                expense_id=db_expense.id,
-                user_id=member_id,
-                amount_owed=split_amount
-            )
-            db.add(split)
-    
-    # Commit tất cả cùng lúc (expense + splits) để đảm bảo tính toàn vẹn dữ liệu
-    # Nếu tạo splits bị lỗi, expense cũng sẽ không được lưu
+    # Commit tất cả cùng lúc (expense + sổ cái) để đảm bảo tính toàn vẹn dữ liệu
     db.commit()
     db.refresh(db_expense)
     return db_expense
@@ -518,19 +710,173 @@ def create_expense(db: Session, expense: expense_schema.ExpenseCreate, user_id:
 def list_expenses_for_trip(db: Session, trip_id: int):
     return db.query(models.expense.Expense).filter(models.expense.Expense.trip_id == trip_id).all()
 
+def _encode_expense_cursor(expense) -> str:
+    raw = f"{expense.expense_date.isoformat()}|{expense.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_expense_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        date_part, id_part = raw.rsplit("|", 1)
+        return datetime.fromisoformat(date_part), int(id_part)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Cursor không hợp lệ")
+
+def list_expenses_page(
+    db: Session,
+    trip_id: int,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    payer_id: Optional[int] = None,
+    currency: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+):
+    """
+    Danh sách chi tiêu mới nhất trước, phân trang keyset theo (expense_date, id).
+    Trả về (items, next_cursor); next_cursor là None khi hết dữ liệu hoặc không phân trang.
+    """
+    Expense = models.expense.Expense
+    ExpenseSplit = models.expense.ExpenseSplit
+
+    query = db.query(Expense).filter(Expense.trip_id == trip_id)
+    if payer_id is not None:
+        query = query.filter(Expense.payer_id == payer_id)
+    if currency:
+        query = query.filter(Expense.currency == currency)
+    if date_from is not None:
+        query = query.filter(Expense.expense_date >= date_from)
+    if date_to is not None:
+        query = query.filter(Expense.expense_date <= date_to)
+    if cursor:
+        cursor_date, cursor_id = _decode_expense_cursor(cursor)
+        query = query.filter(or_(
+            Expense.expense_date < cursor_date,
+            and_(Expense.expense_date == cursor_date, Expense.id < cursor_id),
+        ))
+
+    # payer là many-to-one nên joinedload không nhân dòng; splits dùng selectinload (1 query/trang)
+    query = query.options(
+        joinedload(Expense.payer),
+        selectinload(Expense.splits).joinedload(ExpenseSplit.user),
+    ).order_by(Expense.expense_date.desc(), Expense.id.desc())
+
+    if limit is None:
+        items = query.all()
+        _attach_equal_splits(db, items)
+        return items, None
+
+    items = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = _encode_expense_cursor(items[-1])
+    _attach_equal_splits(db, items)
+    return items, next_cursor
+
+COMPACT_SPLIT_ID_STRIDE = 1_000_000 # Số người tối đa của một expense chia đều khi dựng id split tạm
+
+def _attach_equal_splits(db: Session, expenses):
+    """
+    Expense chia đều lưu gọn không có dòng expense_splits: dựng các split tạm (không thêm vào session)
+    để response giữ nguyên dạng cũ. User của tất cả người tham gia được tải bằng một query.
+    Split tạm có id âm cố định theo (expense.id, vị trí) nên không trùng id của dòng expense_splits thật.
+    """
+    ExpenseSplit = models.expense.ExpenseSplit
+    compact = [e for e in expenses if e.participant_ids is not None]
+    user_ids = {user_id for e in compact for user_id in e.participant_ids}
+    if not user_ids:
+        return
+    users_by_id = {
+        u.id: u for u in db.query(models.user.User).filter(models.user.User.id.in_(user_ids)).all()
+    }
+
+    for expense in compact:
+        splits = []
+        rows = equal_split_rows(expense.amount_minor, expense.participant_ids)
+        for position, (user_id, amount_owed_minor) in enumerate(rows, start=1):
+            split = ExpenseSplit(
+                id=-(expense.id * COMPACT_SPLIT_ID_STRIDE + position),
+                expense_id=expense.id,
+                user_id=user_id,
+                amount_owed=from_minor(amount_owed_minor, expense.currency),
+                amount_owed_minor=amount_owed_minor,
+            )
+            set_committed_value(split, "user", users_by_id.get(user_id))
+            splits.append(split)
+        set_committed_value(expense, "splits", splits)
+
 # --- SETTLEMENTS (Mới: Thanh toán nợ) ---
 def create_settlement(db: Session, settlement: expense_schema.SettlementCreate, payer_id: int):
+    # Khoản trả nợ được ghi theo base_currency của trip
+    currency = get_trip_base_currency(db, settlement.trip_id)
+    amount_minor = to_minor(settlement.amount, currency)
+    if amount_minor <= 0:
+        raise ValueError(f"Số tiền quá nhỏ đối với loại tiền {currency}")
     db_settlement = models.expense.Settlement(
         trip_id=settlement.trip_id,
         payer_id=payer_id,
         receiver_id=settlement.receiver_id,
-        amount=settlement.amount
+        amount=from_minor(amount_minor, currency),
+        amount_minor=amount_minor,
+        currency=currency
     )
     db.add(db_settlement)
+    apply_balance_deltas(db, settlement.trip_id, {
+        payer_id: amount_minor,
+        settlement.receiver_id: -amount_minor,
+    }, currency)
+    bump_finance_version(db, settlement.trip_id)
     db.commit()
     db.refresh(db_settlement)
     return db_settlement
 
+def create_settlements_batch(db: Session, trip_id: int, items) -> int:
+    """
+    Ghi nhận nhiều khoản trả nợ trong một transaction: một câu INSERT hàng loạt
+    và một lần cập nhật sổ cái. items: danh sách (payer_id, receiver_id, amount).
+    """
+    if not items:
+        return 0
+
+    user_ids = {user_id for payer_id, receiver_id, _ in items for user_id in (payer_id, receiver_id)}
+    member_ids = _get_trip_member_ids(db, trip_id, user_ids)
+    non_member_ids = sorted(user_ids - member_ids)
+    if non_member_ids:
+        raise ValueError(
+            f"User ID {', '.join(str(i) for i in non_member_ids)} không phải là thành viên của chuyến đi này"
+        )
+    if any(payer_id == receiver_id for payer_id, receiver_id, _ in items):
+        raise ValueError("Người trả và người nhận phải khác nhau")
+
+    currency = get_trip_base_currency(db, trip_id)
+    rows = []
+    deltas = {}
+    for payer_id, receiver_id, amount in items:
+        amount_minor = to_minor(amount, currency)
+        if amount_minor <= 0:
+            raise ValueError(f"Số tiền quá nhỏ đối với loại tiền {currency}")
+        rows.append({
+            "trip_id": trip_id,
+            "payer_id": payer_id,
+            "receiver_id": receiver_id,
+            "amount": from_minor(amount_minor, currency),
+            "amount_minor": amount_minor,
+            "currency": currency,
+        })
+        deltas[payer_id] = deltas.get(payer_id, 0) + amount_minor
+        deltas[receiver_id] = deltas.get(receiver_id, 0) - amount_minor
+
+    try:
+        db.execute(insert(models.expense.Settlement), rows)
+        apply_balance_deltas(db, trip_id, deltas, currency)
+        bump_finance_version(db, trip_id)
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        raise
+    return len(items)
+
 def list_settlements_for_trip(db: Session, trip_id: int):
     return db.query(models.expense.Settlement).filter(models.expense.Settlement.trip_id == trip_id).all()
 
@@ -588,16 +934,24 @@ def delete_trip(db: Session, trip_id: int):
             models.itinerary.ActivityVote.activity_id.in_(activity_ids_subq)
         ).delete(synchronize_session=False)
 
-        db.query(models.trip.TripMember).filter(
-            models.trip.TripMember.trip_id == trip_id
-        ).delete(synchronize_session=False)
+        member_ids = db.execute(
+            delete(models.trip.TripMember)
+            .where(models.trip.TripMember.trip_id == trip_id)
+            .returning(models.trip.TripMember.user_id)
+        ).scalars().all()
+        _bump_membership_versions(db, member_ids)
 
         db.query(models.expense.Settlement).filter(
             models.expense.Settlement.trip_id == trip_id
         ).delete(synchronize_session=False)
 
+        db.query(models.expense.TripBalance).filter(
+            models.expense.TripBalance.trip_id == trip_id
+        ).delete(synchronize_session=False)
+
         db.delete(trip)
         db.commit()
+        invalidate_user_memberships(*member_ids)
         return trip
     except SQLAlchemyError:
         db.rollback()
@@ -613,7 +967,13 @@ def delete_activity(db: Session, activity_id: int):
 def delete_expense(db: Session, expense_id: int):
     expense = db.query(models.expense.Expense).filter(models.expense.Expense.id == expense_id).first()
     if expense:
+        split_rows = expense_split_rows(expense)
+        currency = expense.currency or get_trip_base_currency(db, expense.trip_id)
+        apply_balance_deltas(
+            db, expense.trip_id, expense_balance_deltas(expense.payer_id, expense.amount_minor, split_rows, sign=-1), currency
+        )
         db.delete(expense)
+        bump_finance_version(db, expense.trip_id)
         db.commit()
     return expense
 
@@ -650,6 +1010,25 @@ def get_document_by_id(db: Session, document_id: int):
 def get_checklist_item_by_id(db: Session, item_id: int):
     return db.query(models.checklist.ChecklistItem).filter(models.checklist.ChecklistItem.id == item_id).first()
 
+# trip_id của tài nguyên con, dùng để kiểm tra quyền thành viên (dependencies.check_*_member)
+def get_trip_id_for_day(db: Session, day_id: int) -> Optional[int]:
+    return db.query(models.itinerary.ItineraryDay.trip_id).filter(models.itinerary.ItineraryDay.id == day_id).scalar()
+
+def get_trip_id_for_activity(db: Session, activity_id: int) -> Optional[int]:
+    return (
+        db.query(models.itinerary.ItineraryDay.trip_id)
+        .join(models.itinerary.Activity, models.itinerary.Activity.day_id == models.itinerary.ItineraryDay.id)
+        .filter(models.itinerary.Activity.id == activity_id)
+        .scalar()
+    )
+
+def get_trip_id_for_checklist_item(db: Session, item_id: int) -> Optional[int]:
+    return (
+        db.query(models.checklist.ChecklistItem.trip_id)
+        .filter(models.checklist.ChecklistItem.id == item_id)
+        .scalar()
+    )
+
 def get_trip_members(db: Session, trip_id: int):
     members = db.query(models.user.User).join(
         models.trip.TripMember,
@@ -681,11 +1060,49 @@ def update_expense(db: Session, expense_id: int, expense_data):
     if not expense:
         return None
     
-    expense.amount = expense_data.amount
+    # Người tham gia không đổi khi sửa expense. Chia đều (lưu gọn) thì phần của mỗi người theo amount mới;
+    # dòng expense_splits giữ nguyên trừ khi đổi loại tiền. Sổ cái được đảo bút toán cũ và ghi bút toán mới.
+    old_rows = expense_split_rows(expense)
+    new_amount_minor = to_minor(expense_data.amount, expense_data.currency)
+    if new_amount_minor <= 0:
+        raise ValueError(f"Số tiền quá nhỏ đối với loại tiền {expense_data.currency}")
+    base_currency, version = get_trip_finance_state(db, expense.trip_id)
+    if expense_data.currency != base_currency:
+        ensure_convertible(get_rate_graph(db, expense.trip_id, version), expense_data.currency, base_currency)
+    old_currency = expense.currency or base_currency
+    if expense.participant_ids is not None:
+        new_rows = equal_split_rows(new_amount_minor, expense.participant_ids)
+    elif expense_data.currency != old_currency:
+        # Dòng expense_splits cũ tính theo đơn vị nhỏ nhất của loại tiền cũ (cent != đồng):
+        # chia lại amount mới theo tỷ lệ phần của từng người
+        owed = [amount for _, amount in old_rows]
+        if expense.amount_minor <= 0 or any(amount < 0 for amount in owed) or sum(owed) <= 0:
+            raise ValueError(f"Không thể quy đổi các phần chia của chi tiêu sang {expense_data.currency}")
+        total_owed = (sum(owed) * new_amount_minor + expense.amount_minor // 2) // expense.amount_minor
+        shares = allocate_largest_remainder(total_owed, owed)
+        for split, share in zip(expense.splits, shares):
+            split.amount_owed_minor = share
+            split.amount_owed = from_minor(share, expense_data.currency)
+        new_rows = [(user_id, share) for (user_id, _), share in zip(old_rows, shares)]
+    else:
+        new_rows = old_rows
+    old_deltas = expense_balance_deltas(expense.payer_id, expense.amount_minor, old_rows, sign=-1)
+    new_deltas = expense_balance_deltas(expense.payer_id, new_amount_minor, new_rows)
+    if expense_data.currency != old_currency:
+        apply_balance_deltas(db, expense.trip_id, old_deltas, old_currency)
+        apply_balance_deltas(db, expense.trip_id, new_deltas, expense_data.currency)
+    else:
+        for user_id, delta in old_deltas.items():
+            new_deltas[user_id] += delta
+        apply_balance_deltas(db, expense.trip_id, new_deltas, old_currency)
+
+    expense.amount = from_minor(new_amount_minor, expense_data.currency)
+    expense.amount_minor = new_amount_minor
     expense.currency = expense_data.currency
     expense.description = expense_data.description
     expense.expense_date = expense_data.expense_date
     
+    bump_finance_version(db, expense.trip_id)
     db.commit()
     db.refresh(expense)
     return expense
@@ -714,6 +1131,7 @@ def update_user_profile(db: Session, user_id: int, name: str, avatar_url: str =
     
     db.commit()
     db.refresh(user)
+    invalidate_cached_user(user.id)
     return user
 
 # --- LOCATIONS FOR MAP ---
@@ -755,6 +1173,7 @@ def create_exchange_rate(db: Session, exchange_rate, user_id: int):
         created_by=user_id
     )
     db.add(rate)
+    bump_finance_version(db, exchange_rate.trip_id)
     db.commit()
     db.refresh(rate)
     return rate
@@ -764,17 +1183,5 @@ def get_exchange_rates_for_trip(db: Session, trip_id: int):
     return db.query(ExchangeRate).filter(ExchangeRate.trip_id == trip_id).all()
 
 def convert_currency(db: Session, trip_id: int, amount: float, from_currency: str, to_currency: str):
-    from app.models.exchange_rate import ExchangeRate
-    if from_currency == to_currency:
-        return amount
-    
-    rate = db.query(ExchangeRate).filter(
-        ExchangeRate.trip_id == trip_id,
-        ExchangeRate.from_currency == from_currency,
-        ExchangeRate.to_currency == to_currency
-    ).first()
-    
-    if not rate:
-        raise ValueError(f"Không tìm thấy tỷ giá từ {from_currency} sang {to_currency}")
-    
-    return amount * rate.rate
\ No newline at end of file
+    # Dùng đồ thị tỷ giá đã cache của trip (hỗ trợ tỷ giá nghịch đảo và quy đổi nhiều bước)
+    return convert_amount(db, trip_id, amount, from_currency, to_currency)
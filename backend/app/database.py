@@ -13,6 +13,14 @@ def get_db():
     finally:
         db.close()
 
+def dialect_insert(db, model):
+    """INSERT theo dialect của session để dùng được ON CONFLICT (PostgreSQL; SQLite khi chạy local)."""
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(model)
+
 def test_db_connection():
     try:
         with engine.connect() as conn:
@@ -1,12 +1,14 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.core.security import oauth2_scheme, decode_access_token  # Import từ security.py
+from app.core.user_cache import user_cache
+from app.core.membership_cache import membership_cache
 
 # XÓA dòng này:
 # oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def get_token_payload(token: str = Depends(oauth2_scheme)) -> dict:
     payload = decode_access_token(token)
     if not payload:
         raise HTTPException(
@@ -14,13 +16,19 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             detail="Thông tin xác thực không hợp lệ"
         )
     
-    user_id = payload.get("sub")
-    if not user_id:
+    if not payload.get("sub"):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, 
             detail="Dữ liệu token không hợp lệ"
         )
-    
+    return payload
+
+def get_current_user(payload: dict = Depends(get_token_payload), db: Session = Depends(get_db)):
+    user_id = payload["sub"]
+    user = user_cache.get(int(user_id))
+    if user is not None:
+        return user
+
     from app.models.user import User
     user = db.query(User).filter(User.id == int(user_id)).first()
     if not user:
@@ -28,15 +36,104 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             status_code=status.HTTP_401_UNAUTHORIZED, 
             detail="Người dùng không tồn tại"
         )
+    # Tách khỏi session để dùng lại giữa các request; các cột đã được nạp sẵn
+    db.expunge(user)
+    user_cache.set(user.id, user)
     return user
 
-def check_trip_member(trip_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    """Verify user is a member of the trip"""
+def get_member_trip_ids(db: Session, user_id: int, refresh: bool = False) -> frozenset:
+    """Tập trip_id mà user là thành viên; lấy từ membership_cache, hết hạn thì đọc lại trip_members."""
+    if not refresh:
+        trip_ids = membership_cache.get(user_id)
+        if trip_ids is not None:
+            return trip_ids
+
     from app.models.trip import TripMember
-    member = db.query(TripMember).filter(
-        TripMember.trip_id == trip_id,
-        TripMember.user_id == current_user.id
-    ).first()
-    if not member:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not a member of this trip")
-    return current_user
\ No newline at end of file
+    trip_ids = frozenset(
+        trip_id for (trip_id,) in db.query(TripMember.trip_id).filter(TripMember.user_id == user_id).all()
+    )
+    membership_cache.set(user_id, trip_ids)
+    return trip_ids
+
+def ensure_trip_member(db: Session, user_id: int, trip_id: int):
+    """
+    Báo 403 nếu user không thuộc trip. Cache trúng thì không chạy câu SQL nào; không có trong cache
+    thì đọc lại một lần (user có thể vừa tham gia qua worker khác) trước khi từ chối.
+    """
+    if trip_id in get_member_trip_ids(db, user_id):
+        return
+    if trip_id in get_member_trip_ids(db, user_id, refresh=True):
+        return
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Bạn không phải thành viên của chuyến đi này")
+
+def _authorize_trip(trip_id: int, response: Response, db: Session, payload: dict, current_user):
+    """
+    Token có claim "trips" cùng version với user thì quyết định luôn từ token; claim cũ thì kiểm tra
+    như thường và gửi token mới qua header X-Access-Token.
+    """
+    claims = payload.get("trips")
+    if claims is not None:
+        if payload.get("trips_v") == current_user.membership_version:
+            if any(claim[0] == trip_id for claim in claims):
+                return
+        else:
+            from app.crud.crud import create_user_access_token
+            response.headers["X-Access-Token"] = create_user_access_token(db, current_user)
+
+    ensure_trip_member(db, current_user.id, trip_id)
+
+def check_trip_member(
+    trip_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    payload: dict = Depends(get_token_payload),
+    current_user = Depends(get_current_user),
+):
+    """Dependency cho endpoint có trip_id (path/query): kiểm tra thành viên rồi trả về current_user."""
+    _authorize_trip(trip_id, response, db, payload, current_user)
+    return current_user
+
+def check_day_member(
+    day_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    payload: dict = Depends(get_token_payload),
+    current_user = Depends(get_current_user),
+):
+    """Như check_trip_member cho endpoint có day_id: một câu SQL đọc trip_id của ngày."""
+    from app.crud.crud import get_trip_id_for_day
+    trip_id = get_trip_id_for_day(db, day_id)
+    if trip_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ngày không tồn tại")
+    _authorize_trip(trip_id, response, db, payload, current_user)
+    return current_user
+
+def check_activity_member(
+    activity_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    payload: dict = Depends(get_token_payload),
+    current_user = Depends(get_current_user),
+):
+    """Như check_trip_member cho endpoint có activity_id: một câu JOIN activity -> itinerary_days."""
+    from app.crud.crud import get_trip_id_for_activity
+    trip_id = get_trip_id_for_activity(db, activity_id)
+    if trip_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Hoạt động không tồn tại")
+    _authorize_trip(trip_id, response, db, payload, current_user)
+    return current_user
+
+def check_checklist_item_member(
+    item_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    payload: dict = Depends(get_token_payload),
+    current_user = Depends(get_current_user),
+):
+    """Như check_trip_member cho endpoint có item_id của checklist."""
+    from app.crud.crud import get_trip_id_for_checklist_item
+    trip_id = get_trip_id_for_checklist_item(db, item_id)
+    if trip_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Checklist item không tồn tại")
+    _authorize_trip(trip_id, response, db, payload, current_user)
+    return current_user
@@ -2,7 +2,9 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, status
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.database import engine, Base
-from app.config import UPLOAD_DIR, CORS_ORIGINS
+from app.config import UPLOAD_DIR, CORS_ORIGINS, DEBUG, SQL_QUERY_WARN_THRESHOLD
+from app.core.query_stats import install_query_counter, track_queries
+from app.core.user_cache import user_cache
 import os
 from typing import List, Dict
 import logging
@@ -69,6 +71,29 @@ async def log_errors_middleware(request: Request, call_next):
             }
         )
 
+# Đếm số câu SQL / thời gian DB của từng request để phát hiện N+1
+install_query_counter(engine)
+
+@app.middleware("http")
+async def query_stats_middleware(request: Request, call_next):
+    with track_queries() as stats:
+        response = await call_next(request)
+
+    if DEBUG:
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = str(stats.duration_ms)
+        cache_stats = user_cache.stats()
+        response.headers["X-User-Cache-Hits"] = str(cache_stats["hits"])
+        response.headers["X-User-Cache-Misses"] = str(cache_stats["misses"])
+    if stats.count > SQL_QUERY_WARN_THRESHOLD:
+        route = request.scope.get("route")
+        path = route.path if route is not None else request.url.path
+        logger.warning(
+            f"⚠️ {request.method} {path}: {stats.count} câu SQL ({stats.duration_ms} ms), "
+            f"vượt ngưỡng {SQL_QUERY_WARN_THRESHOLD}"
+        )
+    return response
+
 # Mount thư mục upload
 if os.path.isdir(UPLOAD_DIR):
     from fastapi.staticfiles import StaticFiles
@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 class ChecklistItem(Base):
     __tablename__ = "checklist_items"
     id = Column(Integer, primary_key=True, index=True)
-    trip_id = Column(Integer, ForeignKey("trips.id"), nullable=False)
+    trip_id = Column(Integer, ForeignKey("trips.id"), nullable=False, index=True)
     content = Column(String, nullable=False)
     assignee = Column(Integer, ForeignKey("users.id"), nullable=True)
     is_done = Column(Boolean, default=False)
@@ -1,17 +1,23 @@
-from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, BigInteger, Float, String, ForeignKey, DateTime, Boolean, UniqueConstraint, Index, JSON
 from sqlalchemy.sql import func
 from app.database import Base
 from sqlalchemy.orm import relationship
 class Expense(Base):
     __tablename__ = "expenses"
+    # Phục vụ phân trang keyset GET /expenses/trip/{trip_id} (ORDER BY expense_date, id)
+    __table_args__ = (Index("ix_expenses_trip_date_id", "trip_id", "expense_date", "id"),)
     id = Column(Integer, primary_key=True, index=True)
     trip_id = Column(Integer, ForeignKey("trips.id"), nullable=False)
     payer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     amount = Column(Float, nullable=False)
+    amount_minor = Column(BigInteger, nullable=False) # Số nguyên đơn vị nhỏ nhất của currency (xem money_service)
     currency = Column(String, default="VND")
     description = Column(String, nullable=True)
     expense_date = Column(DateTime(timezone=True), nullable=False)
     split_method = Column(String, default="equal")
+    # Chia đều: chỉ lưu danh sách user_id, mỗi người nợ amount / len(participant_ids).
+    # None = dùng các dòng expense_splits (các cách chia khác)
+    participant_ids = Column(JSON(none_as_null=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     trip = relationship("Trip", back_populates="expenses")
@@ -20,9 +26,10 @@ class Expense(Base):
 class ExpenseSplit(Base):
     __tablename__ = "expense_splits"
     id = Column(Integer, primary_key=True, index=True)
-    expense_id = Column(Integer, ForeignKey("expenses.id"), nullable=False)
+    expense_id = Column(Integer, ForeignKey("expenses.id"), nullable=False, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     amount_owed = Column(Float, nullable=False)
+    amount_owed_minor = Column(BigInteger, nullable=False)
 
     expense = relationship("Expense", back_populates="splits")
     user = relationship("User", foreign_keys=[user_id])
@@ -34,8 +41,21 @@ class Settlement(Base):
     payer_id = Column(Integer, ForeignKey("users.id"), nullable=False)   # Người trả nợ (người chuyển tiền)
     receiver_id = Column(Integer, ForeignKey("users.id"), nullable=False) # Người nhận nợ (chủ nợ)
     amount = Column(Float, nullable=False) # Số tiền trả
+    amount_minor = Column(BigInteger, nullable=False)
+    currency = Column(String, nullable=True) # Mặc định là base_currency của trip lúc ghi nhận
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     trip = relationship("Trip", back_populates="settlements")
     payer = relationship("User", foreign_keys=[payer_id])
-    receiver = relationship("User", foreign_keys=[receiver_id])
\ No newline at end of file
+    receiver = relationship("User", foreign_keys=[receiver_id])
+
+class TripBalance(Base):
+    """Số dư lũy kế của từng thành viên trong chuyến đi, cập nhật cùng transaction với expense/settlement."""
+    __tablename__ = "trip_balances"
+    __table_args__ = (UniqueConstraint("trip_id", "user_id", "currency", name="uq_trip_balances_trip_user_currency"),)
+    id = Column(Integer, primary_key=True, index=True)
+    trip_id = Column(Integer, ForeignKey("trips.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    currency = Column(String, nullable=False) # Số dư được giữ theo từng loại tiền, quy đổi khi đọc
+    # Số nguyên đơn vị nhỏ nhất của currency. Dương là được nhận, Âm là phải trả
+    balance = Column(BigInteger, nullable=False, default=0, server_default="0")
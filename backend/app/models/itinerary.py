@@ -1,10 +1,11 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, DateTime, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from app.database import Base
 from sqlalchemy import Time
 from sqlalchemy.orm import relationship
 class ItineraryDay(Base):
     __tablename__ = "itinerary_days" 
+    __table_args__ = (UniqueConstraint("trip_id", "day_number", name="uq_itinerary_days_trip_day"),)
     id = Column(Integer, primary_key=True, index=True)
     trip_id = Column(Integer, ForeignKey("trips.id"), nullable=False)
     day_number = Column(Integer, nullable=False)
@@ -14,7 +15,7 @@ class ItineraryDay(Base):
 class Activity(Base):
     __tablename__ = "activities"
     id = Column(Integer, primary_key=True, index=True)
-    day_id = Column(Integer, ForeignKey("itinerary_days.id"), nullable=False)
+    day_id = Column(Integer, ForeignKey("itinerary_days.id"), nullable=False, index=True)
     title = Column(String, nullable=False)
     category = Column(String, nullable=True)
     description = Column(Text, nullable=True)
@@ -23,12 +24,19 @@ class Activity(Base):
     location_long = Column(String, nullable=True)
     start_time = Column(Time, nullable=True) 
     is_confirmed = Column(Boolean, default=False)
+    # Bộ đếm vote được cập nhật cùng transaction với activity_votes (xem crud.vote_activity)
+    upvote_count = Column(Integer, nullable=False, default=0, server_default="0")
+    downvote_count = Column(Integer, nullable=False, default=0, server_default="0")
     created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     day = relationship("ItineraryDay", back_populates="activities")
 class ActivityVote(Base):
     __tablename__ = "activity_votes"
+    __table_args__ = (
+        UniqueConstraint("activity_id", "user_id", name="uq_activity_votes_activity_user"),
+        Index("ix_activity_votes_activity_vote", "activity_id", "vote"), # Đếm vote theo loại
+    )
     id = Column(Integer, primary_key=True, index=True)
     activity_id = Column(Integer, ForeignKey("activities.id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Date, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Date, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base # Sửa dòng này (bỏ dấu chấm)
@@ -16,6 +16,10 @@ class Trip(Base):
     end_date = Column(Date, nullable=True)
     base_currency = Column(String,default="VND")
     invite_code = Column(String, nullable=True, default=lambda: str(uuid.uuid4())[:8], index=True)   
+    # Số thành viên đã tham gia (status "joined"), cập nhật khi thêm thành viên
+    member_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Tăng mỗi khi expense/split/settlement/tỷ giá của trip thay đổi (khóa cache bảng cân đối, ETag)
+    finance_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     members = relationship("User", back_populates="trips", secondary="trip_members")
@@ -34,8 +38,10 @@ class Trip(Base):
 # Class TripMember giữ nguyên
 class TripMember(Base):
     __tablename__ = "trip_members"
+    # Mỗi user chỉ là thành viên một lần; index (trip_id, user_id) phục vụ kiểm tra quyền thành viên
+    __table_args__ = (UniqueConstraint("trip_id", "user_id", name="uq_trip_members_trip_user"),)
     id = Column(Integer, primary_key=True, index=True)
     trip_id = Column(Integer, ForeignKey("trips.id"), nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True) # Danh sách trip của user
     role = Column(String, default="member")
     status = Column(String, default="joined")
@@ -10,6 +10,8 @@ class User(Base):
     name = Column(String, nullable=False)
     avatar_url = Column(String, nullable=True) 
     is_active = Column(Boolean, default=True)
+    # Tăng mỗi khi tập trip của user thay đổi; so với claim "trips_v" trong access token
+    membership_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # OTP fields for password reset
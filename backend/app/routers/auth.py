@@ -4,9 +4,8 @@ from sqlalchemy.orm import Session
 from app.schemas.user import UserCreate, UserRead
 from app.schemas.auth import ForgotPasswordRequest, VerifyOtpRequest, ResetPasswordRequest
 from app.schemas.response import ApiResponse
-from app.crud.crud import get_user_by_email, create_user, authenticate_user, update_user_otp, verify_user_otp, reset_user_password
+from app.crud.crud import get_user_by_email, create_user, authenticate_user, update_user_otp, verify_user_otp, reset_user_password, create_user_access_token
 from app.database import get_db
-from app.core.security import create_access_token
 from app.services.email_service import send_otp_email
 from datetime import timedelta, datetime, timezone
 from app.config import ACCESS_TOKEN_EXPIRE_MINUTES, OTP_EXPIRE_MINUTES
@@ -34,9 +33,8 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email hoặc mật khẩu sai")
     
-    access_token = create_access_token(
-        data={"sub": str(user.id)}, 
-        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_user_access_token(
+        db, user, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     
     return ApiResponse(message="Đăng nhập thành công!", data={"access_token": access_token, "token_type": "bearer"})
@@ -48,9 +46,8 @@ def login_for_swagger(form_data: OAuth2PasswordRequestForm = Depends(), db: Sess
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email hoặc mật khẩu sai")
     
-    access_token = create_access_token(
-        data={"sub": str(user.id)}, 
-        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_user_access_token(
+        db, user, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, check_trip_member, ensure_trip_member
 import os
 from app.config import (
     UPLOAD_DIR,
@@ -52,7 +52,9 @@ async def upload(
 
     if trip_id is None and normalized_category not in _AVATAR_CATEGORIES:
         raise HTTPException(400, "Thiếu trip_id")
-    
+    if normalized_category not in _AVATAR_CATEGORIES:
+        ensure_trip_member(db, current_user.id, trip_id)
+
     # Save file (Render free filesystem is ephemeral; prefer Cloudinary)
     url: str
     if CLOUDINARY_ENABLED:
@@ -150,7 +152,7 @@ async def upload(
     return ApiResponse(message="Tải lên thành công", data=doc)
 
 @router.get("/trip/{trip_id}", response_model=ApiResponse)
-def list_docs(trip_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def list_docs(trip_id: int, db: Session = Depends(get_db), current_user = Depends(check_trip_member)):
     docs = list_documents_for_trip(db, trip_id)
     return ApiResponse(message="Danh sách tài liệu", data=docs)
 
@@ -160,6 +162,7 @@ def get_document(document_id: int, db: Session = Depends(get_db), current_user =
     document = get_document_by_id(db, document_id)
     if not document:
         raise HTTPException(404, "Tài liệu không tồn tại")
+    ensure_trip_member(db, current_user.id, document.trip_id)
     return ApiResponse(message="Chi tiết tài liệu", data=document)
 
 @router.delete("/{document_id}", response_model=ApiResponse)
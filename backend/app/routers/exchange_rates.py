@@ -2,19 +2,21 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.crud.crud import create_exchange_rate, get_exchange_rates_for_trip, convert_currency
-from app.schemas.exchange_rate import ExchangeRateCreate
+from app.schemas.exchange_rate import ExchangeRateCreate, BatchConvertRequest
+from app.services.currency_service import convert_batch
 from app.schemas.response import ApiResponse
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, check_trip_member, ensure_trip_member
 
 router = APIRouter(prefix="/exchange-rates", tags=["exchange-rates"])
 
 @router.post("", response_model=ApiResponse)
 def add_exchange_rate(rate: ExchangeRateCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    ensure_trip_member(db, current_user.id, rate.trip_id)
     exchange_rate = create_exchange_rate(db, exchange_rate=rate, user_id=current_user.id)
     return ApiResponse(message="Thêm tỷ giá thành công", data=exchange_rate)
 
 @router.get("/trip/{trip_id}", response_model=ApiResponse)
-def get_trip_exchange_rates(trip_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_trip_exchange_rates(trip_id: int, db: Session = Depends(get_db), current_user = Depends(check_trip_member)):
     rates = get_exchange_rates_for_trip(db, trip_id)
     return ApiResponse(message="Danh sách tỷ giá", data=rates)
 
@@ -25,7 +27,7 @@ def convert_currency_endpoint(
     from_currency: str, 
     to_currency: str, 
     db: Session = Depends(get_db), 
-    current_user = Depends(get_current_user)
+    current_user = Depends(check_trip_member)
 ):
     try:
         converted = convert_currency(db, trip_id, amount, from_currency, to_currency)
@@ -40,3 +42,13 @@ def convert_currency_endpoint(
         )
     except ValueError as e:
         raise HTTPException(400, str(e))
+
+@router.post("/convert/batch", response_model=ApiResponse)
+def convert_currency_batch_endpoint(
+    request: BatchConvertRequest,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    ensure_trip_member(db, current_user.id, request.trip_id)
+    results = convert_batch(db, request.trip_id, request.items)
+    return ApiResponse(message="Quy đổi thành công", data=results)
@@ -1,55 +1,214 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Response, Header
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.crud.crud import create_expense, list_expenses_for_trip, create_settlement, list_settlements_for_trip
-from app.schemas.expense import ExpenseCreate, SettlementCreate
+from app.crud.crud import create_expense, list_expenses_page, create_settlement, create_settlements_batch, list_settlements_for_trip, get_trip
+from app.schemas.expense import ExpenseCreate, SettlementCreate, SettlementBatchCreate
 from app.schemas.response import ApiResponse
-from app.dependencies import get_current_user
-from app.services.finance_service import calculate_trip_balances
+from app.dependencies import get_current_user, check_trip_member, ensure_trip_member
+from app.services.finance_service import calculate_trip_balances, get_finance_version, get_trip_balances_snapshot
+from app.services.analytics_service import get_trip_analytics
+from app.services.expense_import_service import import_expenses_csv
+from app.services.expense_export_service import iter_expenses_csv, iter_expenses_jsonl
+import io
+import os
 
 router = APIRouter(prefix="/expenses", tags=["expenses"])
 
+# Trường công khai của expense/split: cột lưu trữ nội bộ (amount_minor, participant_ids...) không trả ra
+_EXPENSE_FIELDS = ("id", "trip_id", "payer_id", "amount", "currency", "description", "expense_date", "split_method", "created_at")
+_SPLIT_FIELDS = ("id", "expense_id", "user_id", "amount_owed")
+
+
+def _expense_payload(expense) -> dict:
+    """Dạng response của expense như trước; payer/splits chỉ có khi đã được nạp."""
+    data = {field: getattr(expense, field) for field in _EXPENSE_FIELDS}
+    if "payer" in expense.__dict__:
+        data["payer"] = expense.payer
+    if "splits" in expense.__dict__:
+        data["splits"] = [
+            {
+                **{field: getattr(split, field) for field in _SPLIT_FIELDS},
+                **({"user": split.user} if "user" in split.__dict__ else {}),
+            }
+            for split in expense.splits
+        ]
+    return data
+
 @router.post("", response_model=ApiResponse)
 def add_expense(e: ExpenseCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    ensure_trip_member(db, current_user.id, e.trip_id)
     try:
         # Sử dụng payer_id từ request, nếu không có thì dùng current_user
         payer_id = e.payer_id if e.payer_id is not None else current_user.id
         ex = create_expense(db, expense=e, user_id=payer_id)
-        return ApiResponse(message="Thêm chi tiêu thành công", data=ex)
+        return ApiResponse(message="Thêm chi tiêu thành công", data=_expense_payload(ex))
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
 
+@router.post("/trip/{trip_id}/import", response_model=ApiResponse)
+def import_expenses(
+    trip_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user = Depends(check_trip_member)
+):
+    """Import chi tiêu hàng loạt từ file CSV, trả về báo cáo lỗi theo từng dòng"""
+    ext = os.path.splitext(file.filename or "")[1].lower()
+    if ext != ".csv":
+        raise HTTPException(400, "Chỉ hỗ trợ file .csv")
+
+    text_stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        report = import_expenses_csv(db, trip_id, text_stream, default_payer_id=current_user.id)
+    except (ValueError, UnicodeDecodeError) as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    finally:
+        text_stream.detach()
+    return ApiResponse(message=f"Đã import {report['imported']} chi tiêu", data=report)
+
+@router.get("/trip/{trip_id}/export")
+def export_expenses(
+    trip_id: int,
+    format: Literal["csv", "jsonl"] = "csv",
+    current_user = Depends(check_trip_member)
+):
+    """Xuất expense, split và settlement của chuyến đi dưới dạng stream (CSV hoặc JSON lines)"""
+    if format == "jsonl":
+        return StreamingResponse(
+            iter_expenses_jsonl(trip_id),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="trip_{trip_id}_expenses.jsonl"'},
+        )
+    return StreamingResponse(
+        iter_expenses_csv(trip_id),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="trip_{trip_id}_expenses.csv"'},
+    )
+
 @router.get("/trip/{trip_id}", response_model=ApiResponse)
-def get_expenses(trip_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    from sqlalchemy.orm import joinedload
-    from app.models.expense import Expense, ExpenseSplit
-    
-    expenses = db.query(Expense).filter(Expense.trip_id == trip_id).options(
-        joinedload(Expense.payer),
-        joinedload(Expense.splits).joinedload(ExpenseSplit.user)
-    ).all()
-    
-    return ApiResponse(message="Danh sách chi tiêu", data=expenses)
+def get_expenses(
+    trip_id: int,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
+    payer_id: Optional[int] = None,
+    currency: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(check_trip_member)
+):
+    """
+    Không truyền limit: trả về toàn bộ như trước. Có limit: trả về một trang,
+    cursor của trang tiếp theo nằm trong header X-Next-Cursor.
+    """
+    try:
+        expenses, next_cursor = list_expenses_page(
+            db,
+            trip_id,
+            limit=limit,
+            cursor=cursor,
+            payer_id=payer_id,
+            currency=currency,
+            date_from=date_from,
+            date_to=date_to,
+        )
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
 
-@router.get("/trip/{trip_id}/balances", response_model=ApiResponse)
-def get_trip_balances(trip_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    balances = calculate_trip_balances(db, trip_id)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return ApiResponse(message="Danh sách chi tiêu", data=[_expense_payload(e) for e in expenses])
+
+def _balances_response(db: Session, trip_id: int, solver: str, response: Response, if_none_match: Optional[str]):
+    """
+    ETag theo finance_version của trip: nếu client gửi If-None-Match khớp thì trả 304 ngay,
+    chỉ đọc bảng trips. Ngược lại dùng snapshot đã cache cho version hiện tại.
+    """
+    version = get_finance_version(db, trip_id)
+    try:
+        if version is None:
+            return ApiResponse(message="Bảng cân đối chi tiêu", data=calculate_trip_balances(db, trip_id, solver=solver))
+
+        etag = f'"{trip_id}-{version}-{solver}"'
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        balances = get_trip_balances_snapshot(db, trip_id, version, solver=solver)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    response.headers["ETag"] = etag
     return ApiResponse(message="Bảng cân đối chi tiêu", data=balances)
 
+@router.get("/trip/{trip_id}/balances", response_model=ApiResponse)
+def get_trip_balances(
+    trip_id: int,
+    response: Response,
+    solver: Literal["greedy", "optimal"] = "greedy",
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user = Depends(check_trip_member)
+):
+    return _balances_response(db, trip_id, solver, response, if_none_match)
+
 @router.get("/debts/trip/{trip_id}", response_model=ApiResponse)
-def get_trip_debts(trip_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_trip_debts(
+    trip_id: int,
+    response: Response,
+    solver: Literal["greedy", "optimal"] = "greedy",
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user = Depends(check_trip_member)
+):
     """Alias cho balances - dễ nhớ hơn"""
-    balances = calculate_trip_balances(db, trip_id)
-    return ApiResponse(message="Bảng cân đối chi tiêu", data=balances)
+    return _balances_response(db, trip_id, solver, response, if_none_match)
+
+@router.get("/trip/{trip_id}/analytics", response_model=ApiResponse)
+def get_expense_analytics(trip_id: int, db: Session = Depends(get_db), current_user = Depends(check_trip_member)):
+    """Thống kê chi tiêu của trip: theo ngày, người trả, loại tiền, thành viên; trung bình và phân vị"""
+    try:
+        analytics = get_trip_analytics(db, trip_id)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    return ApiResponse(message="Thống kê chi tiêu", data=analytics)
 
 # --- API MỚI ---
 @router.post("/settle", response_model=ApiResponse)
 def settle_debt(s: SettlementCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    settlement = create_settlement(db, settlement=s, payer_id=current_user.id)
+    ensure_trip_member(db, current_user.id, s.trip_id)
+    try:
+        settlement = create_settlement(db, settlement=s, payer_id=current_user.id)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
     return ApiResponse(message="Ghi nhận trả nợ thành công", data=settlement)
 
+@router.post("/settle/batch", response_model=ApiResponse)
+def settle_debts_batch(s: SettlementBatchCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Ghi nhận nhiều khoản trả nợ cùng lúc (mặc định: toàn bộ gợi ý hiện tại), trả về bảng cân đối mới"""
+    trip = get_trip(db, s.trip_id)
+    if not trip:
+        raise HTTPException(404, "Chuyến đi không tồn tại")
+    if trip.owner_id != current_user.id:
+        raise HTTPException(403, "Chỉ chủ nhóm mới có thể ghi nhận trả nợ hàng loạt")
+
+    try:
+        if s.items is None:
+            suggestions = calculate_trip_balances(db, s.trip_id, solver=s.solver)["settlements"]
+            items = [(t["from_user"]["id"], t["to_user"]["id"], t["amount"]) for t in suggestions]
+        else:
+            items = [(item.payer_id, item.receiver_id, item.amount) for item in s.items]
+        settled = create_settlements_batch(db, s.trip_id, items)
+        balances = calculate_trip_balances(db, s.trip_id, solver=s.solver)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    return ApiResponse(message="Ghi nhận trả nợ thành công", data={"settled": settled, **balances})
+
 @router.get("/settle/trip/{trip_id}", response_model=ApiResponse)
-def get_settlements(trip_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_settlements(trip_id: int, db: Session = Depends(get_db), current_user = Depends(check_trip_member)):
     settlements = list_settlements_for_trip(db, trip_id)
     return ApiResponse(message="Lịch sử trả nợ", data=settlements)
 
@@ -59,7 +218,8 @@ def get_expense(expense_id: int, db: Session = Depends(get_db), current_user = D
     expense = get_expense_by_id(db, expense_id)
     if not expense:
         raise HTTPException(404, "Chi tiêu không tồn tại")
-    return ApiResponse(message="Chi tiết chi tiêu", data=expense)
+    ensure_trip_member(db, current_user.id, expense.trip_id)
+    return ApiResponse(message="Chi tiết chi tiêu", data=_expense_payload(expense))
 
 @router.put("/{expense_id}", response_model=ApiResponse)
 def update_expense_endpoint(expense_id: int, expense_data: ExpenseCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
@@ -69,8 +229,11 @@ def update_expense_endpoint(expense_id: int, expense_data: ExpenseCreate, db: Se
         raise HTTPException(404, "Chi tiêu không tồn tại")
     if expense.payer_id != current_user.id:
         raise HTTPException(403, "Chỉ người trả tiền mới có thể sửa chi tiêu")
-    updated = update_expense(db, expense_id, expense_data)
-    return ApiResponse(message="Cập nhật chi tiêu thành công", data=updated)
+    try:
+        updated = update_expense(db, expense_id, expense_data)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    return ApiResponse(message="Cập nhật chi tiêu thành công", data=_expense_payload(updated))
 
 @router.delete("/{expense_id}", response_model=ApiResponse)
 def delete_expense_endpoint(expense_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
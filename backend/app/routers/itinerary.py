@@ -5,12 +5,12 @@ from app.crud.crud import create_itinerary_day, create_activity, vote_activity,
 from app.crud.crud import create_itinerary_day, create_activity, vote_activity, get_activities_for_day, confirm_activity, get_itinerary_for_trip, get_trip_locations
 from app.schemas.response import ApiResponse
 from app.schemas.itinerary import ActivityCreate
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, check_trip_member, check_day_member, check_activity_member, ensure_trip_member
 
 router = APIRouter(prefix="/itinerary", tags=["itinerary"])
 
 @router.post("/days", response_model=ApiResponse)
-def create_day(trip_id: int, day_number: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def create_day(trip_id: int, day_number: int, db: Session = Depends(get_db), current_user = Depends(check_trip_member)):
     try:
         day = create_itinerary_day(db, trip_id=trip_id, day_number=day_number)
         return ApiResponse(message="Tạo ngày thành công", data=day)
@@ -18,22 +18,27 @@ def create_day(trip_id: int, day_number: int, db: Session = Depends(get_db), cur
         raise HTTPException(status_code=400, detail=str(ve))
 
 @router.get("/trip/{trip_id}", response_model=ApiResponse)
-def get_trip_itinerary(trip_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    itinerary = get_itinerary_for_trip(db, trip_id)
+def get_trip_itinerary(trip_id: int, db: Session = Depends(get_db), current_user = Depends(check_trip_member)):
+    itinerary = get_itinerary_for_trip(db, trip_id, current_user_id=current_user.id)
     return ApiResponse(message="Lịch trình chuyến đi", data=itinerary)
 
 @router.get("/days/{day_id}/activities", response_model=ApiResponse)
-def get_day_activities(day_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_day_activities(day_id: int, db: Session = Depends(get_db), current_user = Depends(check_day_member)):
     activities = get_activities_for_day(db, day_id)
     return ApiResponse(message="Danh sách hoạt động", data=activities)
 
 @router.post("/activities", response_model=ApiResponse)
 def add_activity(a: ActivityCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    from app.crud.crud import get_trip_id_for_day
+    trip_id = get_trip_id_for_day(db, a.day_id)
+    if trip_id is None:
+        raise HTTPException(404, "Ngày không tồn tại")
+    ensure_trip_member(db, current_user.id, trip_id)
     activity = create_activity(db, activity=a,user_id=current_user.id)
     return ApiResponse(message="Thêm hoạt động thành công", data=activity)
 
 @router.post("/activities/{activity_id}/vote", response_model=ApiResponse)
-def vote(activity_id: int, vote_type: str = "upvote", db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def vote(activity_id: int, vote_type: str = "upvote", db: Session = Depends(get_db), current_user = Depends(check_activity_member)):
     try:
         v = vote_activity(db, activity_id=activity_id, user_id=current_user.id, vote=vote_type)
     except ValueError as ve:
@@ -50,7 +55,7 @@ def list_activities_by_day_number(
     trip_id: int,
     day_number: int,
     db: Session = Depends(get_db),
-    current_user = Depends(get_current_user),
+    current_user = Depends(check_trip_member),
 ):
     activities = get_activities_by_trip_and_day_number(
         db,
@@ -61,14 +66,14 @@ def list_activities_by_day_number(
     return ApiResponse(message=f"Danh sách hoạt động ngày {day_number}", data=activities)
 
 @router.post("/activities/{activity_id}/confirm", response_model=ApiResponse)
-def confirm_activity_endpoint(activity_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def confirm_activity_endpoint(activity_id: int, db: Session = Depends(get_db), current_user = Depends(check_activity_member)):
     activity = confirm_activity(db, activity_id)
     if not activity:
         raise HTTPException(404, "Hoạt động không tồn tại")
     return ApiResponse(message="Xác nhận hoạt động thành công", data=activity)
 
 @router.get("/activities/{activity_id}", response_model=ApiResponse)
-def get_activity(activity_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_activity(activity_id: int, db: Session = Depends(get_db), current_user = Depends(check_activity_member)):
     from app.crud.crud import get_activity_by_id
     activity = get_activity_by_id(db, activity_id)
     if not activity:
@@ -76,7 +81,7 @@ def get_activity(activity_id: int, db: Session = Depends(get_db), current_user =
     return ApiResponse(message="Chi tiết hoạt động", data=activity)
 
 @router.put("/activities/{activity_id}", response_model=ApiResponse)
-def update_activity_endpoint(activity_id: int, activity_data: ActivityCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def update_activity_endpoint(activity_id: int, activity_data: ActivityCreate, db: Session = Depends(get_db), current_user = Depends(check_activity_member)):
     from app.crud.crud import get_activity_by_id, update_activity
     from app.models.itinerary import Activity
     activity = get_activity_by_id(db, activity_id)
@@ -88,7 +93,7 @@ def update_activity_endpoint(activity_id: int, activity_data: ActivityCreate, db
     return ApiResponse(message="Cập nhật hoạt động thành công", data=updated)
 
 @router.delete("/activities/{activity_id}", response_model=ApiResponse)
-def delete_activity_endpoint(activity_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def delete_activity_endpoint(activity_id: int, db: Session = Depends(get_db), current_user = Depends(check_activity_member)):
     from app.crud.crud import delete_activity
     from app.models.itinerary import Activity
     activity = db.query(Activity).filter(Activity.id == activity_id).first()
@@ -100,7 +105,7 @@ def delete_activity_endpoint(activity_id: int, db: Session = Depends(get_db), cu
     return ApiResponse(message="Xóa hoạt động thành công", data=None)
 
 @router.get("/trip/{trip_id}/locations", response_model=ApiResponse)
-def get_map_locations(trip_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_map_locations(trip_id: int, db: Session = Depends(get_db), current_user = Depends(check_trip_member)):
     """Lấy tất cả địa điểm confirmed để hiển thị trên Google Maps"""
     locations = get_trip_locations(db, trip_id)
     return ApiResponse(
@@ -11,7 +11,7 @@ from app.crud.crud import (
 )
 from app.schemas.trip import TripCreate, TripRead, TripUpdate
 from app.schemas.response import ApiResponse
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, check_trip_member
 from pydantic import BaseModel, EmailStr
 
 
@@ -31,7 +31,7 @@ def list_trips(db: Session = Depends(get_db), current_user = Depends(get_current
     )
 
 @router.get("/{trip_id}", response_model=ApiResponse)
-def get_trip_detail(trip_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_trip_detail(trip_id: int, db: Session = Depends(get_db), current_user = Depends(check_trip_member)):
     trip = get_trip(db, trip_id)
     if not trip:
         raise HTTPException(404, "Chuyến đi không tồn tại")
@@ -51,7 +51,10 @@ def update_trip_endpoint(
     if trip.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Bạn không có quyền cập nhật chuyến đi này")
 
-    updated_trip = update_trip(db, trip_id=trip_id, trip_update=trip_in)
+    try:
+        updated_trip = update_trip(db, trip_id=trip_id, trip_update=trip_in)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
     
     return updated_trip
 
@@ -86,7 +89,7 @@ def add_member(trip_id: int, member_data: AddMemberRequest, db: Session = Depend
     return ApiResponse(message="Thêm thành viên thành công", data=result["user"])
 
 @router.get("/{trip_id}/members", response_model=ApiResponse)
-def get_members(trip_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_members(trip_id: int, db: Session = Depends(get_db), current_user = Depends(check_trip_member)):
     from app.crud.crud import get_trip_members
     trip = get_trip(db, trip_id)
     if not trip:
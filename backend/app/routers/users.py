@@ -5,6 +5,7 @@ from app.schemas.user import UserRead
 from app.schemas.response import ApiResponse
 from app.crud.crud import get_user_by_email, get_user_by_id, update_user_profile
 from app.dependencies import get_current_user
+from app.services.finance_service import calculate_user_summary
 from pydantic import BaseModel
 from app.config import (
     UPLOAD_DIR,
@@ -27,6 +28,15 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 def me(current_user = Depends(get_current_user)):
     return ApiResponse(message="Thông tin người dùng", data=current_user)
 
+@router.get("/me/balances", response_model=ApiResponse)
+def my_balances(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Số dư và người cần trả / sẽ nhận tiền của user trên tất cả chuyến đi"""
+    try:
+        summary = calculate_user_summary(db, current_user.id)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    return ApiResponse(message="Tổng hợp công nợ", data=summary)
+
 @router.get("/{user_id}", response_model=ApiResponse)
 def get_user(user_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     user = get_user_by_id(db, user_id)
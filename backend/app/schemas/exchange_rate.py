@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, conlist
 from datetime import datetime
 
 class ExchangeRateCreate(BaseModel):
@@ -18,3 +18,12 @@ class ExchangeRateRead(BaseModel):
 
     class Config:
         orm_mode = True
+
+class ConvertItem(BaseModel):
+    amount: float
+    from_currency: str
+    to_currency: str
+
+class BatchConvertRequest(BaseModel):
+    trip_id: int
+    items: conlist(ConvertItem, min_items=1, max_items=1000)
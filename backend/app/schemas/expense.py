@@ -73,12 +73,24 @@ class SettlementCreate(BaseModel):
     receiver_id: UserId
     amount: PositiveFloat
 
+class SettlementBatchItem(BaseModel):
+    payer_id: UserId
+    receiver_id: UserId
+    amount: PositiveFloat
+
+class SettlementBatchCreate(BaseModel):
+    trip_id: TripId
+    # Để trống = ghi nhận toàn bộ gợi ý thanh toán hiện tại (theo solver)
+    items: Optional[conlist(SettlementBatchItem, min_items=1, max_items=500)] = None
+    solver: Literal["greedy", "optimal"] = "greedy"
+
 class SettlementRead(BaseModel):
     id: int
     trip_id: int
     payer_id: int
     receiver_id: int
     amount: float
+    currency: Optional[str] = None
     created_at: datetime
 
     class Config:
@@ -0,0 +1,128 @@
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app import models
+from app.config import ANALYTICS_CACHE_SIZE, ANALYTICS_CACHE_TTL_SECONDS
+from app.core.ttl_cache import TTLCache
+from app.services.currency_service import get_rate_graph, get_rate
+from app.services.finance_service import equal_split_rows, get_trip_finance_state
+from app.services.money_service import from_minor
+
+ANALYTICS_PERCENTILES = (25, 50, 75, 90)
+
+# Cache kết quả thống kê theo (trip_id, finance_version). Mọi thay đổi expense/tỷ giá/base_currency
+# đều tăng finance_version nên không cần xóa cache thủ công, kể cả khi chạy nhiều worker.
+_analytics_cache = TTLCache(ANALYTICS_CACHE_SIZE, ANALYTICS_CACHE_TTL_SECONDS)
+
+
+def _compute_trip_analytics(db: Session, trip_id: int, base_currency: str, version: int) -> dict:
+    """Tổng hợp bằng SUM/GROUP BY trong SQL, quy đổi về tiền tệ gốc của trip."""
+    Expense = models.expense.Expense
+    ExpenseSplit = models.expense.ExpenseSplit
+
+    rate_graph = get_rate_graph(db, trip_id, version)
+    currency_col = func.coalesce(Expense.currency, base_currency)
+
+    def to_base(amount, currency) -> float:
+        return (amount or 0.0) * get_rate(rate_graph, currency, base_currency)
+
+    # Tổng theo từng loại tiền (giữ nguyên số tiền gốc)
+    by_currency = []
+    for currency, count, total in (
+        db.query(currency_col, func.count(Expense.id), func.sum(Expense.amount))
+        .filter(Expense.trip_id == trip_id)
+        .group_by(currency_col)
+        .all()
+    ):
+        by_currency.append({
+            "currency": currency,
+            "count": count,
+            "total": round(total or 0.0, 2),
+            "converted_total": round(to_base(total, currency), 2),
+        })
+
+    # Tổng theo ngày
+    day_col = func.date(Expense.expense_date)
+    totals_by_day: dict[str, float] = {}
+    for day, currency, total in (
+        db.query(day_col, currency_col, func.sum(Expense.amount))
+        .filter(Expense.trip_id == trip_id)
+        .group_by(day_col, currency_col)
+        .all()
+    ):
+        key = str(day)
+        totals_by_day[key] = totals_by_day.get(key, 0.0) + to_base(total, currency)
+
+    # Tổng đã trả theo người trả
+    totals_by_payer: dict[int, float] = {}
+    for payer_id, currency, total in (
+        db.query(Expense.payer_id, currency_col, func.sum(Expense.amount))
+        .filter(Expense.trip_id == trip_id)
+        .group_by(Expense.payer_id, currency_col)
+        .all()
+    ):
+        totals_by_payer[payer_id] = totals_by_payer.get(payer_id, 0.0) + to_base(total, currency)
+
+    # Tổng tiêu thụ theo thành viên: dòng expense_splits + expense chia đều lưu gọn
+    totals_by_member: dict[int, float] = {}
+    for user_id, currency, total in (
+        db.query(ExpenseSplit.user_id, currency_col, func.sum(ExpenseSplit.amount_owed))
+        .join(Expense, Expense.id == ExpenseSplit.expense_id)
+        .filter(Expense.trip_id == trip_id)
+        .group_by(ExpenseSplit.user_id, currency_col)
+        .all()
+    ):
+        totals_by_member[user_id] = totals_by_member.get(user_id, 0.0) + to_base(total, currency)
+    for amount, currency, participant_ids in (
+        db.query(Expense.amount_minor, currency_col, Expense.participant_ids)
+        .filter(Expense.trip_id == trip_id, Expense.participant_ids.isnot(None))
+        .all()
+    ):
+        for user_id, amount_owed_minor in equal_split_rows(amount, participant_ids):
+            amount_owed = from_minor(amount_owed_minor, currency)
+            totals_by_member[user_id] = totals_by_member.get(user_id, 0.0) + to_base(amount_owed, currency)
+
+    # Trung bình / phân vị: chỉ tải cột amount + currency rồi tính bằng NumPy
+    rows = db.query(Expense.amount, currency_col).filter(Expense.trip_id == trip_id).all()
+    rate_by_currency = {c["currency"]: get_rate(rate_graph, c["currency"], base_currency) for c in by_currency}
+    amounts = np.fromiter((amount or 0.0 for amount, _ in rows), dtype=np.float64, count=len(rows))
+    rates = np.fromiter((rate_by_currency[currency] for _, currency in rows), dtype=np.float64, count=len(rows))
+    converted = amounts * rates
+
+    total = float(converted.sum()) if len(converted) else 0.0
+    percentiles = {f"p{p}": 0.0 for p in ANALYTICS_PERCENTILES}
+    if len(converted):
+        values = np.percentile(converted, ANALYTICS_PERCENTILES)
+        percentiles = {f"p{p}": round(float(v), 2) for p, v in zip(ANALYTICS_PERCENTILES, values)}
+
+    return {
+        "currency": base_currency,
+        "expense_count": len(rows),
+        "total": round(total, 2),
+        "average_expense": round(float(converted.mean()), 2) if len(converted) else 0.0,
+        "average_per_day": round(total / len(totals_by_day), 2) if totals_by_day else 0.0,
+        "average_per_member": round(total / len(totals_by_member), 2) if totals_by_member else 0.0,
+        "percentiles": percentiles,
+        "by_day": [{"date": day, "total": round(v, 2)} for day, v in sorted(totals_by_day.items())],
+        "by_payer": [
+            {"user_id": user_id, "total": round(v, 2)}
+            for user_id, v in sorted(totals_by_payer.items(), key=lambda x: x[1], reverse=True)
+        ],
+        "by_currency": by_currency,
+        "by_member": [
+            {"user_id": user_id, "consumed": round(v, 2)}
+            for user_id, v in sorted(totals_by_member.items(), key=lambda x: x[1], reverse=True)
+        ],
+    }
+
+
+def get_trip_analytics(db: Session, trip_id: int) -> dict:
+    base_currency, version = get_trip_finance_state(db, trip_id)
+    key = (trip_id, version)
+    cached = _analytics_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = _compute_trip_analytics(db, trip_id, base_currency, version)
+    _analytics_cache.set(key, result)
+    return result
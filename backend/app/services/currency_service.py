@@ -0,0 +1,151 @@
+from collections import deque
+from typing import Optional
+import numpy as np
+from sqlalchemy.orm import Session
+from app import models
+from app.config import RATE_GRAPH_CACHE_SIZE, RATE_GRAPH_CACHE_TTL_SECONDS
+from app.core.ttl_cache import TTLCache
+
+# Cache đồ thị tỷ giá: (trip_id, finance_version) -> { "USD": { "VND": 25000.0, ... }, ... }
+# Xây một lần từ bảng exchange_rates (kèm tỷ giá nghịch đảo và quy đổi nhiều bước).
+# Thêm tỷ giá làm tăng finance_version (crud.create_exchange_rate) nên mọi worker tự bỏ đồ thị cũ,
+# không cần xóa cache; mục cũ hết hạn theo TTL / bị đẩy ra theo LRU.
+_rate_graph_cache = TTLCache(RATE_GRAPH_CACHE_SIZE, RATE_GRAPH_CACHE_TTL_SECONDS)
+
+
+def _build_rate_graph(rates) -> dict[str, dict[str, float]]:
+    """
+    rates: danh sách (from_currency, to_currency, rate) theo thứ tự cũ -> mới.
+    Trả về bảng tỷ giá giữa mọi cặp tiền tệ liên thông.
+    """
+    direct: dict[str, dict[str, float]] = {}
+    inverse: dict[str, dict[str, float]] = {}
+    for from_currency, to_currency, rate in rates:
+        if not rate or from_currency == to_currency:
+            continue
+        # Tỷ giá nhập sau ghi đè tỷ giá cũ của cùng cặp
+        direct.setdefault(from_currency, {})[to_currency] = rate
+        inverse.setdefault(to_currency, {})[from_currency] = 1 / rate
+
+    # Tỷ giá người dùng nhập trực tiếp luôn được ưu tiên hơn tỷ giá nghịch đảo
+    edges: dict[str, dict[str, float]] = {}
+    for source in (inverse, direct):
+        for from_currency, targets in source.items():
+            edges.setdefault(from_currency, {}).update(targets)
+
+    # BFS từ mỗi loại tiền để tính sẵn tỷ giá nhiều bước (ít bước nhất)
+    graph: dict[str, dict[str, float]] = {}
+    for start in edges:
+        reachable = {start: 1.0}
+        queue = deque([start])
+        while queue:
+            current = queue.popleft()
+            for neighbor, rate in edges.get(current, {}).items():
+                if neighbor not in reachable:
+                    reachable[neighbor] = reachable[current] * rate
+                    queue.append(neighbor)
+        graph[start] = reachable
+    return graph
+
+
+def _get_finance_versions(db: Session, trip_ids) -> dict[int, int]:
+    Trip = models.trip.Trip
+    return dict(db.query(Trip.id, Trip.finance_version).filter(Trip.id.in_(list(trip_ids))).all())
+
+
+def get_rate_graph(db: Session, trip_id: int, version: Optional[int] = None) -> dict[str, dict[str, float]]:
+    """version: finance_version của trip nếu caller đã đọc sẵn; không có thì đọc thêm từ bảng trips."""
+    if version is None:
+        version = _get_finance_versions(db, [trip_id]).get(trip_id, 0)
+    return get_rate_graphs(db, {trip_id: version})[trip_id]
+
+
+def get_rate(graph: dict[str, dict[str, float]], from_currency: str, to_currency: str) -> float:
+    if from_currency == to_currency:
+        return 1.0
+    rate = graph.get(from_currency, {}).get(to_currency)
+    if rate is None:
+        raise ValueError(f"Không tìm thấy tỷ giá từ {from_currency} sang {to_currency}")
+    return rate
+
+
+def ensure_convertible(graph: dict[str, dict[str, float]], currency: str, base_currency: str):
+    """
+    Báo ValueError nếu currency chưa quy đổi được về base_currency của trip. Gọi trước khi ghi khoản tiền
+    vào sổ cái, để balances / analytics / batch settle không bao giờ gặp khoản không quy đổi được.
+    """
+    if currency != base_currency and base_currency not in graph.get(currency, {}):
+        raise ValueError(
+            f"Chưa có tỷ giá quy đổi {currency} sang {base_currency} (tiền tệ gốc của chuyến đi), hãy thêm tỷ giá trước"
+        )
+
+
+def convert_amount(db: Session, trip_id: int, amount: float, from_currency: str, to_currency: str) -> float:
+    if from_currency == to_currency:
+        return amount
+    return amount * get_rate(get_rate_graph(db, trip_id), from_currency, to_currency)
+
+
+def convert_batch(db: Session, trip_id: int, items) -> list[dict]:
+    """
+    Quy đổi nhiều khoản trong một lần: đồ thị tỷ giá chỉ được tải một lần (hoặc lấy từ cache),
+    mỗi cặp tiền tệ chỉ tra một lần, phép nhân chạy trên mảng numpy. Kết quả giữ đúng thứ tự đầu vào,
+    lỗi được báo theo từng dòng.
+    """
+    graph = get_rate_graph(db, trip_id)
+
+    pair_index: dict[tuple[str, str], int] = {}
+    pair_rates: list[float] = []
+    for item in items:
+        pair = (item.from_currency, item.to_currency)
+        if pair not in pair_index:
+            pair_index[pair] = len(pair_rates)
+            try:
+                pair_rates.append(get_rate(graph, *pair))
+            except ValueError:
+                pair_rates.append(np.nan)
+
+    count = len(items)
+    pair_ids = np.fromiter(
+        (pair_index[(item.from_currency, item.to_currency)] for item in items), dtype=np.intp, count=count
+    )
+    amounts = np.fromiter((item.amount for item in items), dtype=np.float64, count=count)
+    # Cặp không có tỷ giá mang NaN trong bảng rates; lỗi được đánh dấu theo tỷ giá, không theo kết quả
+    rates = np.asarray(pair_rates, dtype=np.float64)[pair_ids]
+    missing = np.isnan(rates)
+    converted = amounts * rates
+
+    return [
+        {
+            "original_amount": item.amount,
+            "from_currency": item.from_currency,
+            "converted_amount": None if is_missing else float(value),
+            "to_currency": item.to_currency,
+            "error": f"Không tìm thấy tỷ giá từ {item.from_currency} sang {item.to_currency}" if is_missing else None,
+        }
+        for item, value, is_missing in zip(items, converted.tolist(), missing.tolist())
+    ]
+
+
+def get_rate_graphs(db: Session, trip_versions: dict[int, int]) -> dict[int, dict[str, dict[str, float]]]:
+    """
+    Như get_rate_graph cho nhiều trip. trip_versions: { trip_id: finance_version }.
+    Các trip chưa có trong cache được tải bằng một query.
+    """
+    graphs = {trip_id: _rate_graph_cache.get((trip_id, version)) for trip_id, version in trip_versions.items()}
+    missing = [trip_id for trip_id, graph in graphs.items() if graph is None]
+    if missing:
+        ExchangeRate = models.exchange_rate.ExchangeRate
+        rates_by_trip = {trip_id: [] for trip_id in missing}
+        for trip_id, from_currency, to_currency, rate in (
+            db.query(ExchangeRate.trip_id, ExchangeRate.from_currency, ExchangeRate.to_currency, ExchangeRate.rate)
+            .filter(ExchangeRate.trip_id.in_(missing))
+            .order_by(ExchangeRate.id)
+            .all()
+        ):
+            rates_by_trip[trip_id].append((from_currency, to_currency, rate))
+
+        for trip_id, rates in rates_by_trip.items():
+            graphs[trip_id] = _build_rate_graph(rates)
+            _rate_graph_cache.set((trip_id, trip_versions[trip_id]), graphs[trip_id])
+    return graphs
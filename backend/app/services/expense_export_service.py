@@ -0,0 +1,150 @@
+import csv
+import io
+import json
+from sqlalchemy.orm import Session
+from app import models
+from app.database import SessionLocal
+from app.services.finance_service import equal_split_rows
+from app.services.money_service import from_minor
+
+EXPORT_BATCH_SIZE = 1000        # Số dòng mỗi lần đọc từ server-side cursor
+EXPORT_FLUSH_BYTES = 64 * 1024  # Gửi dữ liệu cho client mỗi khi buffer đạt kích thước này
+
+CSV_COLUMNS = [
+    "record_type",
+    "id",
+    "expense_id",
+    "payer_id",
+    "receiver_id",
+    "user_id",
+    "amount",
+    "currency",
+    "description",
+    "split_method",
+    "expense_date",
+    "created_at",
+]
+
+
+def _iter_records(db: Session, trip_id: int):
+    """Đọc expense, split và settlement của trip theo từng lô (yield_per), không nạp hết vào bộ nhớ."""
+    Expense = models.expense.Expense
+    ExpenseSplit = models.expense.ExpenseSplit
+    Settlement = models.expense.Settlement
+
+    expenses = (
+        db.query(
+            Expense.id, Expense.payer_id, Expense.amount, Expense.currency, Expense.description,
+            Expense.split_method, Expense.expense_date, Expense.created_at,
+        )
+        .filter(Expense.trip_id == trip_id)
+        .order_by(Expense.id)
+        .yield_per(EXPORT_BATCH_SIZE)
+    )
+    for row in expenses:
+        yield {
+            "record_type": "expense",
+            "id": row.id,
+            "payer_id": row.payer_id,
+            "amount": row.amount,
+            "currency": row.currency,
+            "description": row.description,
+            "split_method": row.split_method,
+            "expense_date": row.expense_date,
+            "created_at": row.created_at,
+        }
+
+    splits = (
+        db.query(ExpenseSplit.id, ExpenseSplit.expense_id, ExpenseSplit.user_id, ExpenseSplit.amount_owed, Expense.currency)
+        .join(Expense, Expense.id == ExpenseSplit.expense_id)
+        .filter(Expense.trip_id == trip_id)
+        .order_by(ExpenseSplit.expense_id, ExpenseSplit.id)
+        .yield_per(EXPORT_BATCH_SIZE)
+    )
+    for row in splits:
+        yield {
+            "record_type": "split",
+            "id": row.id,
+            "expense_id": row.expense_id,
+            "user_id": row.user_id,
+            "amount": row.amount_owed,
+            "currency": row.currency,
+        }
+
+    # Expense chia đều lưu gọn: mở rộng thành các dòng split (không có id riêng)
+    equal_expenses = (
+        db.query(Expense.id, Expense.amount_minor, Expense.currency, Expense.participant_ids)
+        .filter(Expense.trip_id == trip_id, Expense.participant_ids.isnot(None))
+        .order_by(Expense.id)
+        .yield_per(EXPORT_BATCH_SIZE)
+    )
+    for row in equal_expenses:
+        for user_id, amount_owed_minor in equal_split_rows(row.amount_minor, row.participant_ids):
+            yield {
+                "record_type": "split",
+                "id": None,
+                "expense_id": row.id,
+                "user_id": user_id,
+                "amount": from_minor(amount_owed_minor, row.currency),
+                "currency": row.currency,
+            }
+
+    settlements = (
+        db.query(
+            Settlement.id, Settlement.payer_id, Settlement.receiver_id, Settlement.amount,
+            Settlement.currency, Settlement.created_at,
+        )
+        .filter(Settlement.trip_id == trip_id)
+        .order_by(Settlement.id)
+        .yield_per(EXPORT_BATCH_SIZE)
+    )
+    for row in settlements:
+        yield {
+            "record_type": "settlement",
+            "id": row.id,
+            "payer_id": row.payer_id,
+            "receiver_id": row.receiver_id,
+            "amount": row.amount,
+            "currency": row.currency,
+            "created_at": row.created_at,
+        }
+
+
+def _stream(trip_id: int, make_writer):
+    """make_writer(buffer) trả về hàm ghi một record vào buffer."""
+    # Generator chạy sau khi endpoint trả về nên dùng session riêng, đóng khi stream kết thúc
+    db = SessionLocal()
+    try:
+        buffer = io.StringIO()
+        write_record = make_writer(buffer)
+        for record in _iter_records(db, trip_id):
+            write_record(record)
+            if buffer.tell() >= EXPORT_FLUSH_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        db.close()
+
+
+def iter_expenses_csv(trip_id: int):
+    def make_writer(buffer):
+        writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        return lambda record: writer.writerow(
+            {k: (v.isoformat() if hasattr(v, "isoformat") else v) for k, v in record.items()}
+        )
+
+    return _stream(trip_id, make_writer)
+
+
+def iter_expenses_jsonl(trip_id: int):
+    def make_writer(buffer):
+        def write_record(record):
+            buffer.write(json.dumps(record, default=str, ensure_ascii=False))
+            buffer.write("\n")
+        return write_record
+
+    return _stream(trip_id, make_writer)
@@ -0,0 +1,145 @@
+import csv
+from collections import defaultdict
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app import models
+from app.schemas.expense import ExpenseCreate
+from app.services.currency_service import ensure_convertible, get_rate_graph
+from app.services.finance_service import (
+    apply_balance_deltas,
+    bump_finance_version,
+    equal_split_rows,
+    expense_balance_deltas,
+    get_trip_finance_state,
+)
+from app.services.money_service import from_minor, to_minor
+
+IMPORT_CHUNK_SIZE = 500
+
+# Cột của file CSV: amount, currency, description, expense_date, payer_id, involved_user_ids.
+# Chỉ amount là bắt buộc. involved_user_ids cách nhau bởi ";" (để trống = chia cho cả nhóm),
+# payer_id để trống = người đang import.
+
+
+def _parse_row(
+    row: dict, trip_id: int, default_payer_id: int, member_ids: set[int], rate_graph: dict, base_currency: str
+) -> ExpenseCreate:
+    involved_raw = (row.get("involved_user_ids") or "").strip()
+    if involved_raw:
+        # Bỏ id trùng (giữ thứ tự) để mỗi người chỉ chịu một phần
+        involved_ids = list(dict.fromkeys(int(v) for v in involved_raw.replace(",", ";").split(";") if v.strip()))
+    else:
+        involved_ids = sorted(member_ids)
+
+    data = {
+        "trip_id": trip_id,
+        "payer_id": int(row["payer_id"]) if (row.get("payer_id") or "").strip() else default_payer_id,
+        "amount": (row.get("amount") or "").strip(),
+        "description": (row.get("description") or "").strip() or None,
+        "involved_user_ids": involved_ids,
+    }
+    if (row.get("currency") or "").strip():
+        data["currency"] = row["currency"].strip().upper()
+    if (row.get("expense_date") or "").strip():
+        data["expense_date"] = row["expense_date"].strip()
+
+    expense = ExpenseCreate(**data)
+    if to_minor(expense.amount, expense.currency) <= 0:
+        raise ValueError(f"Số tiền quá nhỏ đối với loại tiền {expense.currency}")
+    ensure_convertible(rate_graph, expense.currency, base_currency)
+    non_member_ids = [i for i in [expense.payer_id, *expense.involved_user_ids] if i not in member_ids]
+    if non_member_ids:
+        raise ValueError(
+            f"User ID {', '.join(str(i) for i in dict.fromkeys(non_member_ids))} không phải là thành viên của chuyến đi này"
+        )
+    return expense
+
+
+def _flush_chunk(db: Session, chunk: list[ExpenseCreate], ledger_deltas: dict):
+    amounts_minor = [to_minor(e.amount, e.currency) for e in chunk]
+    db.execute(
+        insert(models.expense.Expense),
+        [
+            {
+                "trip_id": e.trip_id,
+                "payer_id": e.payer_id,
+                "amount": from_minor(amount_minor, e.currency),
+                "amount_minor": amount_minor,
+                "currency": e.currency,
+                "description": e.description,
+                "split_method": e.split_method,
+                "expense_date": e.expense_date,
+                # Chia đều: lưu danh sách người tham gia trên expense, không tạo dòng expense_splits
+                "participant_ids": list(e.involved_user_ids),
+            }
+            for e, amount_minor in zip(chunk, amounts_minor)
+        ],
+    )
+
+    for e, amount_minor in zip(chunk, amounts_minor):
+        splits = equal_split_rows(amount_minor, e.involved_user_ids)
+        for user_id, delta in expense_balance_deltas(e.payer_id, amount_minor, splits).items():
+            ledger_deltas[e.currency][user_id] += delta
+
+
+def import_expenses_csv(db: Session, trip_id: int, text_stream, default_payer_id: int) -> dict:
+    """
+    Đọc CSV theo từng dòng (không nạp cả file vào bộ nhớ), kiểm tra với tập thành viên được tải
+    một lần, ghi expense theo từng lô INSERT hàng loạt trong một transaction duy nhất.
+    Dòng lỗi được bỏ qua và báo lại theo số dòng.
+    """
+    member_ids = {
+        row[0] for row in db.query(models.trip.TripMember.user_id).filter(
+            models.trip.TripMember.trip_id == trip_id
+        ).all()
+    }
+    if default_payer_id not in member_ids:
+        raise ValueError(f"Người trả tiền (ID {default_payer_id}) không phải là thành viên của chuyến đi này")
+
+    # Đồ thị tỷ giá tải một lần cho cả file: dòng có loại tiền chưa quy đổi được về base_currency bị báo lỗi
+    base_currency, version = get_trip_finance_state(db, trip_id)
+    rate_graph = get_rate_graph(db, trip_id, version)
+
+    reader = csv.DictReader(text_stream)
+    if "amount" not in (reader.fieldnames or []):
+        raise ValueError("File CSV thiếu cột: amount")
+
+    errors = []
+    imported = 0
+    chunk: list[ExpenseCreate] = []
+    ledger_deltas = defaultdict(lambda: defaultdict(int)) # currency -> user_id -> delta (đơn vị nhỏ nhất)
+
+    try:
+        # Dòng 1 là header
+        for line_number, row in enumerate(reader, start=2):
+            try:
+                chunk.append(_parse_row(row, trip_id, default_payer_id, member_ids, rate_graph, base_currency))
+            except ValidationError as ve:
+                errors.append({"row": line_number, "error": "; ".join(
+                    f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in ve.errors()
+                )})
+            except ValueError as ve:
+                errors.append({"row": line_number, "error": str(ve)})
+
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                _flush_chunk(db, chunk, ledger_deltas)
+                imported += len(chunk)
+                chunk = []
+
+        if chunk:
+            _flush_chunk(db, chunk, ledger_deltas)
+            imported += len(chunk)
+
+        for currency, deltas in ledger_deltas.items():
+            apply_balance_deltas(db, trip_id, deltas, currency)
+        if imported:
+            bump_finance_version(db, trip_id)
+
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        raise
+
+    return {"imported": imported, "failed": len(errors), "errors": errors}
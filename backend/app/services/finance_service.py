@@ -1,7 +1,15 @@
+from sqlalchemy import func, insert, select
 from sqlalchemy.orm import Session
 from app import models
+from app.config import BALANCE_SNAPSHOT_CACHE_SIZE, BALANCE_SNAPSHOT_CACHE_TTL_SECONDS
+from app.core.ttl_cache import TTLCache
+from app.database import dialect_insert
+from app.services.currency_service import get_rate_graph, get_rate_graphs, get_rate
+from app.services.money_service import allocate_largest_remainder, currency_exponent, from_minor
 from collections import defaultdict
 import math
+import time
+import numpy as np
 
 # Định nghĩa một class nhỏ để chứa kết quả trả về
 class TransactionSuggestion:
@@ -10,68 +18,220 @@ class TransactionSuggestion:
         self.to_user = to_user     # Người thụ hưởng
         self.amount = amount
 
-def calculate_trip_balances(db: Session, trip_id: int):
+# ---------------------------------------------------------
+# SỔ CÁI SỐ DƯ (trip_balances)
+# ---------------------------------------------------------
+def get_trip_base_currency(db: Session, trip_id: int) -> str:
+    base_currency = db.query(models.trip.Trip.base_currency).filter(models.trip.Trip.id == trip_id).scalar()
+    return base_currency or "VND"
+
+
+def get_trip_finance_state(db: Session, trip_id: int) -> tuple[str, int]:
+    """(base_currency, finance_version) của trip trong một query; trip không tồn tại thì ("VND", 0)."""
+    Trip = models.trip.Trip
+    row = db.query(Trip.base_currency, Trip.finance_version).filter(Trip.id == trip_id).first()
+    if row is None:
+        return "VND", 0
+    return row.base_currency or "VND", row.finance_version or 0
+
+
+def bump_finance_version(db: Session, trip_id: int):
+    """Tăng finance_version của trip. Không commit: gọi trong transaction của thao tác ghi."""
+    Trip = models.trip.Trip
+    db.query(Trip).filter(Trip.id == trip_id).update(
+        {Trip.finance_version: Trip.finance_version + 1}, synchronize_session=False
+    )
+
+
+def get_finance_version(db: Session, trip_id: int):
+    """finance_version hiện tại của trip (None nếu trip không tồn tại); chỉ đọc bảng trips."""
+    return db.query(models.trip.Trip.finance_version).filter(models.trip.Trip.id == trip_id).scalar()
+
+
+def apply_balance_deltas(db: Session, trip_id: int, deltas: dict, currency: str):
     """
-    Hàm tính toán ai nợ ai trong chuyến đi.
-    Trả về danh sách các giao dịch cần thực hiện để mọi người 'huề' tiền.
+    Cộng dồn thay đổi số dư (số nguyên đơn vị nhỏ nhất của `currency`) vào trip_balances. Không commit:
+    gọi trong transaction của expense/settlement để sổ cái luôn khớp với dữ liệu gốc.
     """
-    
-    # ---------------------------------------------------------
-    # BƯỚC 1: Tính Net Balance (Dư/Nợ) từ các khoản chi tiêu (Expenses)
-    # ---------------------------------------------------------
+    deltas = {user_id: amount for user_id, amount in deltas.items() if amount}
+    if not deltas:
+        return
+
+    # Một câu INSERT ... ON CONFLICT: dòng chưa có thì tạo, đã có thì cộng trong SQL.
+    # Hai request cùng tạo dòng đầu tiên cho (trip, user, currency) không còn va vào unique constraint.
+    TripBalance = models.expense.TripBalance
+    stmt = dialect_insert(db, TripBalance).values([
+        {"trip_id": trip_id, "user_id": user_id, "currency": currency, "balance": amount}
+        for user_id, amount in sorted(deltas.items())
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[TripBalance.trip_id, TripBalance.user_id, TripBalance.currency],
+        set_={"balance": TripBalance.balance + stmt.excluded.balance},
+    ))
+
+
+def equal_split_rows(amount_minor: int, participant_ids) -> list:
+    """
+    Mở rộng expense chia đều thành danh sách (user_id, amount_owed_minor). Phần dư không chia hết
+    được cộng 1 đơn vị cho những người đầu danh sách (largest remainder), tổng luôn bằng amount_minor.
+    """
+    if not participant_ids:
+        return []
+    shares = allocate_largest_remainder(amount_minor, [1] * len(participant_ids))
+    return list(zip(participant_ids, shares))
+
+
+def expense_split_rows(expense) -> list:
+    """(user_id, amount_owed_minor) của một expense, dù lưu dạng chia đều gọn hay từng dòng expense_splits."""
+    if expense.participant_ids is not None:
+        return equal_split_rows(expense.amount_minor, expense.participant_ids)
+    return [(split.user_id, split.amount_owed_minor) for split in expense.splits]
+
+
+def expense_balance_deltas(payer_id: int, amount_minor: int, splits, sign: int = 1) -> dict:
+    """Thay đổi số dư do một expense: payer được cộng amount, mỗi người trong splits bị trừ phần của mình."""
+    deltas = defaultdict(int)
+    deltas[payer_id] += sign * amount_minor
+    for user_id, amount_owed in splits:
+        deltas[user_id] -= sign * amount_owed
+    return deltas
+
+
+def _recompute_raw_balances(db: Session, trip_id: int) -> dict:
+    """
+    Tính lại số dư từ đầu bằng expense, split và settlement (dùng để kiểm tra/xây lại sổ cái).
+    Số query không phụ thuộc số expense (SUM ... GROUP BY, expense chia đều được mở rộng trong bộ nhớ).
+    Key là (user_id, currency) giống sổ cái, giá trị là số nguyên đơn vị nhỏ nhất nên so sánh chính xác.
+    """
+    Expense = models.expense.Expense
+    ExpenseSplit = models.expense.ExpenseSplit
+    Settlement = models.expense.Settlement
+    base_currency = get_trip_base_currency(db, trip_id)
+    expense_currency = func.coalesce(Expense.currency, base_currency)
+    settlement_currency = func.coalesce(Settlement.currency, base_currency)
+
     # Logic: Balance = (Tổng tiền mình đã trả dùm) - (Tổng tiền mình tiêu thụ)
-    
-    balances = defaultdict(float) # Key: user_id, Value: amount (Dương là được nhận, Âm là phải trả)
+    #                  + (Tổng tiền mình đã trả nợ) - (Tổng tiền mình đã nhận trả nợ)
+    balances = defaultdict(int) # Key: (user_id, currency), Value: amount (Dương là được nhận, Âm là phải trả)
 
-    # Lấy tất cả expense của trip
-    expenses = db.query(models.expense.Expense).filter(models.expense.Expense.trip_id == trip_id).all()
+    # Người trả tiền (Payer) được cộng tiền vào balance
+    paid = (
+        db.query(Expense.payer_id, expense_currency, func.sum(Expense.amount_minor))
+        .filter(Expense.trip_id == trip_id)
+        .group_by(Expense.payer_id, expense_currency)
+        .all()
+    )
+    for user_id, currency, amount in paid:
+        balances[(user_id, currency)] += amount or 0
 
-    for exp in expenses:
-        # Người trả tiền (Payer) được cộng tiền vào balance
-        balances[exp.payer_id] += exp.amount
-        
-        # Lấy danh sách những người phải chia tiền trong khoản này
-        splits = db.query(models.expense.ExpenseSplit).filter(
-            models.expense.ExpenseSplit.expense_id == exp.id
-        ).all()
-        
-        for split in splits:
-            # Người hưởng thụ (Split) bị trừ tiền khỏi balance
-            balances[split.user_id] -= split.amount_owed
+    # Người hưởng thụ (Split) bị trừ tiền khỏi balance
+    owed = (
+        db.query(ExpenseSplit.user_id, expense_currency, func.sum(ExpenseSplit.amount_owed_minor))
+        .join(Expense, Expense.id == ExpenseSplit.expense_id)
+        .filter(Expense.trip_id == trip_id)
+        .group_by(ExpenseSplit.user_id, expense_currency)
+        .all()
+    )
+    for user_id, currency, amount in owed:
+        balances[(user_id, currency)] -= amount or 0
 
-    # ---------------------------------------------------------
-    # BƯỚC 2: Tính toán các khoản Đã Thanh Toán (Settlements)
-    # ---------------------------------------------------------
-    # Nếu A nợ B 100k, nhưng A đã dùng chức năng "Trả nợ" để trả 50k,
-    # thì nợ thực tế chỉ còn 50k.
-    
-    settlements = db.query(models.expense.Settlement).filter(
-        models.expense.Settlement.trip_id == trip_id
+    # Expense chia đều lưu gọn: mở rộng danh sách người tham gia trong bộ nhớ
+    equal_expenses = (
+        db.query(Expense.amount_minor, expense_currency, Expense.participant_ids)
+        .filter(Expense.trip_id == trip_id, Expense.participant_ids.isnot(None))
+        .all()
+    )
+    for amount, currency, participant_ids in equal_expenses:
+        for user_id, amount_owed in equal_split_rows(amount, participant_ids):
+            balances[(user_id, currency)] -= amount_owed
+
+    # Nếu A nợ B 100k, nhưng A đã dùng chức năng "Trả nợ" để trả 50k, thì nợ thực tế chỉ còn 50k.
+    # Payer (người trả nợ) đã thực hiện nghĩa vụ, nên balance của họ tăng lên (bớt âm).
+    settled_out = (
+        db.query(Settlement.payer_id, settlement_currency, func.sum(Settlement.amount_minor))
+        .filter(Settlement.trip_id == trip_id)
+        .group_by(Settlement.payer_id, settlement_currency)
+        .all()
+    )
+    for user_id, currency, amount in settled_out:
+        balances[(user_id, currency)] += amount or 0
+
+    # Receiver (người nhận nợ) đã nhận tiền, nên balance của họ giảm xuống (bớt dương).
+    settled_in = (
+        db.query(Settlement.receiver_id, settlement_currency, func.sum(Settlement.amount_minor))
+        .filter(Settlement.trip_id == trip_id)
+        .group_by(Settlement.receiver_id, settlement_currency)
+        .all()
+    )
+    for user_id, currency, amount in settled_in:
+        balances[(user_id, currency)] -= amount or 0
+
+    return balances
+
+
+def _load_ledger(db: Session, trip_id: int) -> dict:
+    TripBalance = models.expense.TripBalance
+    rows = db.query(TripBalance.user_id, TripBalance.currency, TripBalance.balance).filter(
+        TripBalance.trip_id == trip_id
     ).all()
-    
-    for settlement in settlements:
-        # Người trả nợ (Payer) bị trừ tiền (vì tiền đã ra khỏi túi) -> Sai! 
-        # Logic đúng: Trong bảng Balance ảo này:
-        # Payer (người trả nợ) đã thực hiện nghĩa vụ, nên balance của họ tăng lên (bớt âm).
-        balances[settlement.payer_id] += settlement.amount
-        
-        # Receiver (người nhận nợ) đã nhận tiền, nên balance của họ giảm xuống (bớt dương).
-        balances[settlement.receiver_id] -= settlement.amount
+    return {(user_id, currency): balance for user_id, currency, balance in rows}
 
-    # Làm tròn số tiền để tránh lỗi float (ví dụ 33333.3333)
-    for user_id in balances:
-        balances[user_id] = round(balances[user_id], 2)
 
-    # ---------------------------------------------------------
-    # BƯỚC 3: Thuật toán Tối giản nợ (Greedy Algorithm)
-    # ---------------------------------------------------------
+def verify_trip_ledger(db: Session, trip_id: int) -> list:
+    """So sánh sổ cái với kết quả tính lại từ đầu. Trả về danh sách các dòng bị lệch."""
+    expected = _recompute_raw_balances(db, trip_id)
+    stored = _load_ledger(db, trip_id)
+
+    mismatches = []
+    for key in set(expected) | set(stored):
+        exp_amount = int(expected.get(key, 0))
+        got_amount = int(stored.get(key, 0))
+        if exp_amount != got_amount:
+            user_id, currency = key
+            mismatches.append({
+                "user_id": user_id,
+                "currency": currency,
+                "expected": exp_amount,
+                "stored": got_amount,
+            })
+    return mismatches
+
+
+def rebuild_trip_ledger(db: Session, trip_id: int):
+    """Xây lại sổ cái của một chuyến đi từ dữ liệu gốc."""
+    TripBalance = models.expense.TripBalance
+    balances = _recompute_raw_balances(db, trip_id)
+    db.query(TripBalance).filter(TripBalance.trip_id == trip_id).delete(synchronize_session=False)
+    rows = [
+        {"trip_id": trip_id, "user_id": user_id, "currency": currency, "balance": amount}
+        for (user_id, currency), amount in balances.items()
+    ]
+    if rows:
+        db.execute(insert(TripBalance), rows)
+    bump_finance_version(db, trip_id)
+    db.commit()
+
+
+# ---------------------------------------------------------
+# THUẬT TOÁN TỐI GIẢN NỢ
+# ---------------------------------------------------------
+SETTLEMENT_SOLVERS = ("greedy", "optimal")
+OPTIMAL_SOLVER_MAX_MEMBERS = 20         # Số người tối đa (sau khi ghép cặp) cho DP bitmask
+OPTIMAL_SOLVER_TIME_BUDGET_SECONDS = 0.5
+
+
+def _greedy_transactions(balances: dict) -> list:
+    """
+    Ghép người nợ nhiều nhất với chủ nợ lớn nhất (two-pointer).
+    balances là số nguyên đơn vị nhỏ nhất nên so sánh với 0 là chính xác, không cần ngưỡng làm tròn.
+    """
     debtors = []   # Danh sách người nợ (Balance < 0)
     creditors = [] # Danh sách chủ nợ (Balance > 0)
 
     for user_id, amount in balances.items():
-        if amount < -0.01: # Dùng ngưỡng nhỏ để tránh lỗi làm tròn số 0
+        if amount < 0:
             debtors.append({"id": user_id, "amount": amount})
-        elif amount > 0.01:
+        elif amount > 0:
             creditors.append({"id": user_id, "amount": amount})
 
     # Sắp xếp danh sách (Optional: Giúp ưu tiên trả khoản lớn trước)
@@ -88,44 +248,195 @@ def calculate_trip_balances(db: Session, trip_id: int):
         creditor = creditors[j]
 
         # Số tiền cần xử lý là min của (khoản nợ, khoản được nhận)
-        amount = min(abs(debtor["amount"]), creditor["amount"])
-        
-        # Làm tròn 2 số thập phân
-        amount = round(amount, 2)
+        amount = min(-debtor["amount"], creditor["amount"])
 
         # Ghi nhận giao dịch: Debtor trả cho Creditor
-        if amount > 0:
-            transactions.append({
-                "from_user_id": debtor["id"],
-                "to_user_id": creditor["id"],
-                "amount": amount
-            })
+        transactions.append({
+            "from_user_id": debtor["id"],
+            "to_user_id": creditor["id"],
+            "amount": amount
+        })
 
         # Cập nhật lại số dư sau khi trả
         debtor["amount"] += amount
         creditor["amount"] -= amount
 
         # Nếu debtor đã hết nợ -> Chuyển sang người tiếp theo
-        if abs(debtor["amount"]) < 0.01:
+        if debtor["amount"] == 0:
             i += 1
         
         # Nếu creditor đã nhận đủ -> Chuyển sang người tiếp theo
-        if abs(creditor["amount"]) < 0.01:
+        if creditor["amount"] == 0:
             j += 1
 
+    return transactions
+
+
+def _optimal_transactions(
+    balances: dict,
+    max_members: int = OPTIMAL_SOLVER_MAX_MEMBERS,
+    time_budget: float = OPTIMAL_SOLVER_TIME_BUDGET_SECONDS,
+):
+    """
+    Tìm số giao dịch ít nhất: chia các số dư thành nhiều nhóm có tổng bằng 0 nhất có thể,
+    mỗi nhóm k người chỉ cần k-1 giao dịch. DP bitmask trên số nguyên đơn vị nhỏ nhất nên so sánh
+    tổng bằng 0 là chính xác. Trả về None nếu nhóm quá lớn hoặc vượt time_budget.
+    """
+    deadline = time.perf_counter() + time_budget
+    minor_balances = {user_id: amount for user_id, amount in balances.items() if amount != 0}
+
+    # Ghép trước các cặp trái dấu bằng nhau: luôn nằm trong một lời giải tối ưu
+    groups = []
+    by_amount = defaultdict(list)
+    for user_id, c in minor_balances.items():
+        by_amount[c].append(user_id)
+    remaining = []
+    for c, user_ids in by_amount.items():
+        if c < 0:
+            continue
+        opposite = by_amount.get(-c, [])
+        paired = min(len(user_ids), len(opposite))
+        for k in range(paired):
+            groups.append([user_ids[k], opposite[k]])
+        remaining.extend(user_ids[paired:])
+        if paired < len(opposite):
+            remaining.extend(opposite[paired:])
+    for c, user_ids in by_amount.items():
+        if c < 0 and -c not in by_amount:
+            remaining.extend(user_ids)
+
+    n = len(remaining)
+    if n > max_members:
+        return None
+
+    if n:
+        values = [minor_balances[user_id] for user_id in remaining]
+        size = 1 << n
+        sums = [0] * size
+        dp = [0] * size # dp[mask]: số nhóm tổng 0 nhiều nhất khi bóc dần từng phần tử khỏi mask
+        for mask in range(1, size):
+            low = mask & -mask
+            sums[mask] = sums[mask ^ low] + values[low.bit_length() - 1]
+            best = 0
+            m = mask
+            while m:
+                bit = m & -m
+                if dp[mask ^ bit] > best:
+                    best = dp[mask ^ bit]
+                m ^= bit
+            dp[mask] = best + (1 if sums[mask] == 0 else 0)
+            if not (mask & 0xFFF) and time.perf_counter() > deadline:
+                return None
+
+        # Truy vết: mỗi đoạn giữa hai mask có tổng 0 liên tiếp là một nhóm
+        mask = size - 1
+        boundary = mask
+        while mask:
+            if sums[mask] == 0:
+                if boundary ^ mask:
+                    groups.append([remaining[i] for i in range(n) if (boundary ^ mask) >> i & 1])
+                boundary = mask
+            target = dp[mask] - (1 if sums[mask] == 0 else 0)
+            m = mask
+            while m:
+                bit = m & -m
+                if dp[mask ^ bit] == target:
+                    mask ^= bit
+                    break
+                m ^= bit
+        if boundary:
+            groups.append([remaining[i] for i in range(n) if boundary >> i & 1])
+
+    transactions = []
+    for group in groups:
+        transactions.extend(_greedy_transactions({user_id: minor_balances[user_id] for user_id in group}))
+    return transactions
+
+
+def _sum_in_base_minor(rows, rate_graph: dict, base_currency: str) -> dict:
+    """
+    rows: danh sách (key, currency, amount_minor). Quy đổi từng loại tiền về đơn vị nhỏ nhất của
+    base_currency và cộng theo key trên mảng số nguyên NumPy (mỗi loại tiền một phép nhân vector).
+    """
+    keys = list(dict.fromkeys(key for key, _, _ in rows))
+    index = {key: i for i, key in enumerate(keys)}
+    totals = np.zeros(len(keys), dtype=np.int64)
+
+    by_currency = defaultdict(lambda: ([], []))
+    for key, currency, amount in rows:
+        positions, amounts = by_currency[currency]
+        positions.append(index[key])
+        amounts.append(amount or 0)
+
+    for currency, (positions, amounts) in by_currency.items():
+        values = np.asarray(amounts, dtype=np.int64)
+        if currency != base_currency:
+            factor = get_rate(rate_graph, currency, base_currency) * 10.0 ** (
+                currency_exponent(base_currency) - currency_exponent(currency)
+            )
+            values = np.rint(values * factor).astype(np.int64)
+        np.add.at(totals, np.asarray(positions, dtype=np.intp), values)
+
+    return {key: int(totals[i]) for i, key in enumerate(keys)}
+
+
+def calculate_trip_balances(db: Session, trip_id: int, solver: str = "greedy"):
+    """
+    Hàm tính toán ai nợ ai trong chuyến đi.
+    Trả về danh sách các giao dịch cần thực hiện để mọi người 'huề' tiền.
+    Số dư được đọc từ sổ cái trip_balances, không tính lại toàn bộ expense, và quy đổi về base_currency.
+    solver="optimal" tìm số giao dịch ít nhất, tự quay về greedy nếu nhóm quá lớn hoặc hết thời gian.
+    """
+    # Quy đổi số dư từng loại tiền về base_currency của trip bằng đồ thị tỷ giá đã cache
+    base_currency, version = get_trip_finance_state(db, trip_id)
+    rate_graph = get_rate_graph(db, trip_id, version)
+
+    balances = _sum_in_base_minor(
+        [(user_id, currency, amount) for (user_id, currency), amount in _load_ledger(db, trip_id).items()],
+        rate_graph,
+        base_currency,
+    )
+
+    # ---------------------------------------------------------
+    # BƯỚC 3: Thuật toán Tối giản nợ (greedy hoặc tối ưu số giao dịch)
+    # ---------------------------------------------------------
+    transactions = None
+    solver_used = "greedy"
+    if solver == "optimal":
+        transactions = _optimal_transactions(balances)
+        if transactions is not None:
+            solver_used = "optimal"
+    if transactions is None:
+        transactions = _greedy_transactions(balances)
+
     # BƯỚC 4: Tính tổng chi tiêu (total_expense)
-    total_expense = sum(exp.amount for exp in expenses)
+    Expense = models.expense.Expense
+    expense_currency = func.coalesce(Expense.currency, base_currency)
+    totals_by_currency = (
+        db.query(expense_currency, func.sum(Expense.amount_minor))
+        .filter(Expense.trip_id == trip_id)
+        .group_by(expense_currency)
+        .all()
+    )
+    total_expense = _sum_in_base_minor(
+        [(None, currency, amount) for currency, amount in totals_by_currency], rate_graph, base_currency
+    ).get(None, 0)
     
-    # BƯỚC 5: Tạo danh sách balances với thông tin user
+    # BƯỚC 5: Tạo danh sách balances với thông tin user (tải tất cả user trong một query)
+    users_by_id = {}
+    if balances:
+        users = db.query(models.user.User).filter(models.user.User.id.in_(balances.keys())).all()
+        users_by_id = {u.id: u for u in users}
+
     balance_list = []
     for user_id, balance_amount in balances.items():
-        user = db.query(models.user.User).get(user_id)
+        user = users_by_id.get(user_id)
         if user:
             balance_list.append({
                 "user_id": user_id,
                 "name": user.name,
                 "avatar_url": user.avatar_url,
-                "balance": balance_amount
+                "balance": from_minor(balance_amount, base_currency)
             })
     
     # Sắp xếp theo balance giảm dần (người được trả nhiều nhất trước)
@@ -134,8 +445,8 @@ def calculate_trip_balances(db: Session, trip_id: int):
     # BƯỚC 6: Lấy thông tin User cho settlements (để hiển thị suggestions)
     settlements_result = []
     for t in transactions:
-        from_user = db.query(models.user.User).get(t["from_user_id"])
-        to_user = db.query(models.user.User).get(t["to_user_id"])
+        from_user = users_by_id[t["from_user_id"]]
+        to_user = users_by_id[t["to_user_id"]]
         
         settlements_result.append({
             "from_user": {
@@ -148,12 +459,139 @@ def calculate_trip_balances(db: Session, trip_id: int):
                 "name": to_user.name,
                 "avatar_url": to_user.avatar_url
             },
-            "amount": t["amount"]
+            "amount": from_minor(t["amount"], base_currency)
         })
     
     # Trả về format mới: total_expense + balances + settlements
     return {
-        "total_expense": round(total_expense, 2),
+        "currency": base_currency,
+        "total_expense": from_minor(total_expense, base_currency),
         "balances": balance_list,
-        "settlements": settlements_result  # Giữ lại cho FE nếu cần hiển thị gợi ý thanh toán
-    }
\ No newline at end of file
+        "settlements": settlements_result,  # Giữ lại cho FE nếu cần hiển thị gợi ý thanh toán
+        "solver": solver_used,
+    }
+
+
+# Cache bảng cân đối theo (trip_id, solver, finance_version). finance_version tăng thì khóa mới được dùng,
+# snapshot cũ không được đọc nữa và tự hết hạn theo TTL / bị đẩy ra theo LRU.
+_balance_snapshot_cache = TTLCache(BALANCE_SNAPSHOT_CACHE_SIZE, BALANCE_SNAPSHOT_CACHE_TTL_SECONDS)
+
+
+def get_trip_balances_snapshot(db: Session, trip_id: int, version: int, solver: str = "greedy") -> dict:
+    """calculate_trip_balances có cache theo finance_version (version lấy từ get_finance_version)."""
+    key = (trip_id, solver, version)
+    cached = _balance_snapshot_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = calculate_trip_balances(db, trip_id, solver=solver)
+    _balance_snapshot_cache.set(key, result)
+    return result
+
+
+def calculate_user_summary(db: Session, user_id: int) -> dict:
+    """
+    Tổng hợp "ai nợ ai" của một user trên tất cả chuyến đi user tham gia.
+    Đọc sổ cái của mọi trip bằng một query (không gọi calculate_trip_balances cho từng trip),
+    rồi chạy greedy trong bộ nhớ để tìm người user cần trả / sẽ nhận tiền.
+    Trip không quy đổi được về base_currency có "error" và balance None, không cộng vào totals.
+    """
+    Trip = models.trip.Trip
+    TripBalance = models.expense.TripBalance
+    trip_ids_subq = select(models.trip.TripMember.trip_id).where(models.trip.TripMember.user_id == user_id)
+
+    trips = (
+        db.query(Trip.id, Trip.name, Trip.base_currency, Trip.finance_version)
+        .filter(Trip.id.in_(trip_ids_subq))
+        .order_by(Trip.id)
+        .all()
+    )
+    if not trips:
+        return {"totals": [], "trips": []}
+
+    base_currencies = {trip.id: trip.base_currency or "VND" for trip in trips}
+    rate_graphs = get_rate_graphs(db, {trip.id: trip.finance_version or 0 for trip in trips})
+
+    # Sổ cái (đơn vị nhỏ nhất) của mọi trip trong một query, quy đổi về base_currency của từng trip
+    rows_by_trip = defaultdict(list)
+    for trip_id, member_id, currency, amount in (
+        db.query(TripBalance.trip_id, TripBalance.user_id, TripBalance.currency, TripBalance.balance)
+        .filter(TripBalance.trip_id.in_(trip_ids_subq))
+        .all()
+    ):
+        rows_by_trip[trip_id].append((member_id, currency, amount))
+
+    trip_results = []
+    counterparty_ids = set()
+    for trip in trips:
+        try:
+            balances = _sum_in_base_minor(rows_by_trip[trip.id], rate_graphs[trip.id], base_currencies[trip.id])
+        except ValueError as ve:
+            # Một trip thiếu tỷ giá (dữ liệu cũ) không làm hỏng cả bản tổng hợp: đánh dấu lỗi, bỏ khỏi totals
+            trip_results.append((trip, None, [], str(ve)))
+            continue
+        transactions = [
+            t for t in _greedy_transactions(balances) if user_id in (t["from_user_id"], t["to_user_id"])
+        ]
+        counterparty_ids.update(t["to_user_id"] if t["from_user_id"] == user_id else t["from_user_id"] for t in transactions)
+        trip_results.append((trip, balances.get(user_id, 0), transactions, None))
+
+    users_by_id = {}
+    if counterparty_ids:
+        users = db.query(models.user.User).filter(models.user.User.id.in_(counterparty_ids)).all()
+        users_by_id = {u.id: u for u in users}
+
+    def user_info(member_id):
+        user = users_by_id[member_id]
+        return {"id": user.id, "name": user.name, "avatar_url": user.avatar_url}
+
+    totals = defaultdict(int)
+    result_trips = []
+    for trip, balance, transactions, error in trip_results:
+        currency = base_currencies[trip.id]
+        if error is None:
+            totals[currency] += balance
+        result_trips.append({
+            "trip_id": trip.id,
+            "trip_name": trip.name,
+            "currency": currency,
+            "balance": from_minor(balance, currency) if error is None else None,
+            "error": error,
+            # Người user cần trả
+            "owes": [
+                {"user": user_info(t["to_user_id"]), "amount": from_minor(t["amount"], currency)}
+                for t in transactions if t["from_user_id"] == user_id
+            ],
+            # Người sẽ trả cho user
+            "owed_by": [
+                {"user": user_info(t["from_user_id"]), "amount": from_minor(t["amount"], currency)}
+                for t in transactions if t["to_user_id"] == user_id
+            ],
+        })
+
+    return {
+        # Mỗi trip có base_currency riêng nên tổng được tách theo loại tiền
+        "totals": [{"currency": currency, "balance": from_minor(amount, currency)} for currency, amount in totals.items()],
+        "trips": result_trips,
+    }
+
+
+# Kiểm tra sổ cái, chạy trong terminal: python -m app.services.finance_service [--rebuild]
+if __name__ == "__main__":
+    import sys
+    from app.database import SessionLocal
+
+    rebuild = "--rebuild" in sys.argv[1:]
+    session = SessionLocal()
+    try:
+        trip_ids = [trip_id for (trip_id,) in session.query(models.trip.Trip.id).order_by(models.trip.Trip.id).all()]
+        for trip_id in trip_ids:
+            mismatches = verify_trip_ledger(session, trip_id)
+            if not mismatches:
+                continue
+            print(f"Chuyến đi {trip_id}: {len(mismatches)} số dư bị lệch {mismatches}")
+            if rebuild:
+                rebuild_trip_ledger(session, trip_id)
+                print(f"Chuyến đi {trip_id}: đã xây lại sổ cái")
+    finally:
+        session.close()
@@ -0,0 +1,49 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+# Số chữ số thập phân của đơn vị nhỏ nhất theo ISO 4217 (VND = 0: 1 đồng, USD = 2: 1 cent).
+# Loại tiền không có trong bảng dùng DEFAULT_CURRENCY_EXPONENT.
+CURRENCY_EXPONENTS = {
+    "VND": 0, "JPY": 0, "KRW": 0, "CLP": 0, "ISK": 0, "PYG": 0, "UGX": 0, "XAF": 0, "XOF": 0,
+    "BHD": 3, "IQD": 3, "JOD": 3, "KWD": 3, "LYD": 3, "OMR": 3, "TND": 3,
+}
+DEFAULT_CURRENCY_EXPONENT = 2
+
+
+def currency_exponent(currency: str) -> int:
+    return CURRENCY_EXPONENTS.get(currency, DEFAULT_CURRENCY_EXPONENT)
+
+
+def to_minor(amount: float, currency: str) -> int:
+    """Số tiền (đơn vị chính) -> số nguyên đơn vị nhỏ nhất, làm tròn nửa lên."""
+    value = Decimal(str(amount)).scaleb(currency_exponent(currency))
+    return int(value.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor(amount_minor: int, currency: str) -> float:
+    exponent = currency_exponent(currency)
+    if exponent == 0:
+        return float(amount_minor)
+    return float(Decimal(amount_minor).scaleb(-exponent))
+
+
+def allocate_largest_remainder(total_minor: int, weights) -> list[int]:
+    """
+    Chia total_minor theo tỷ lệ weights thành các số nguyên có tổng đúng bằng total_minor:
+    mỗi phần lấy phần nguyên, phần dư được chia cho các phần có phần lẻ lớn nhất (bằng nhau thì theo thứ tự).
+    """
+    weights = list(weights)
+    weight_sum = sum(weights)
+    if not weights or weight_sum <= 0:
+        return [0] * len(weights)
+
+    shares = []
+    remainders = []
+    for index, weight in enumerate(weights):
+        share, remainder = divmod(total_minor * weight, weight_sum)
+        shares.append(share)
+        remainders.append((-remainder, index))
+
+    leftover = total_minor - sum(shares)
+    for _, index in sorted(remainders)[:leftover]:
+        shares[index] += 1
+    return shares
@@ -0,0 +1,76 @@
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from app import models
+
+
+def _vote_count_subquery(vote: str):
+    ActivityVote = models.itinerary.ActivityVote
+    return (
+        select(func.count(ActivityVote.id))
+        .where(ActivityVote.activity_id == models.itinerary.Activity.id)
+        .where(ActivityVote.vote == vote)
+        .scalar_subquery()
+    )
+
+
+def _member_count_subquery():
+    TripMember = models.trip.TripMember
+    return (
+        select(func.count(TripMember.id))
+        .where(TripMember.trip_id == models.trip.Trip.id)
+        .where(TripMember.status == "joined")
+        .scalar_subquery()
+    )
+
+
+def rebuild_vote_counters(db: Session, trip_id: int | None = None, batch_size: int = 1000) -> dict:
+    """
+    Tính lại Activity.upvote_count / downvote_count và Trip.member_count từ dữ liệu gốc.
+    Dùng để sửa bộ đếm nếu bị lệch. Chạy theo từng lô id, mỗi lô commit một lần.
+    """
+    Activity = models.itinerary.Activity
+    ItineraryDay = models.itinerary.ItineraryDay
+    Trip = models.trip.Trip
+
+    activity_ids_q = db.query(Activity.id)
+    trip_ids_q = db.query(Trip.id)
+    if trip_id is not None:
+        activity_ids_q = activity_ids_q.join(ItineraryDay, Activity.day_id == ItineraryDay.id).filter(
+            ItineraryDay.trip_id == trip_id
+        )
+        trip_ids_q = trip_ids_q.filter(Trip.id == trip_id)
+
+    activity_ids = [row[0] for row in activity_ids_q.order_by(Activity.id).all()]
+    for i in range(0, len(activity_ids), batch_size):
+        batch = activity_ids[i:i + batch_size]
+        db.query(Activity).filter(Activity.id.in_(batch)).update(
+            {
+                Activity.upvote_count: _vote_count_subquery("upvote"),
+                Activity.downvote_count: _vote_count_subquery("downvote"),
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+
+    trip_ids = [row[0] for row in trip_ids_q.order_by(Trip.id).all()]
+    for i in range(0, len(trip_ids), batch_size):
+        batch = trip_ids[i:i + batch_size]
+        db.query(Trip).filter(Trip.id.in_(batch)).update(
+            {Trip.member_count: _member_count_subquery()},
+            synchronize_session=False,
+        )
+        db.commit()
+
+    return {"activities": len(activity_ids), "trips": len(trip_ids)}
+
+
+# Sửa lại bộ đếm, chạy trong terminal: python -m app.services.vote_service
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        result = rebuild_vote_counters(session)
+        print(f"Đã tính lại bộ đếm cho {result['activities']} hoạt động và {result['trips']} chuyến đi")
+    finally:
+        session.close()
@@ -0,0 +1,109 @@
+"""
+Benchmark bảng cân đối của một trip ở 100 / 1k / 10k expense:
+- cũ: tính lại từ đầu, một câu SELECT split cho mỗi expense, một lần đọc user cho mỗi dòng;
+- SUM ... GROUP BY: _recompute_raw_balances (dùng khi kiểm tra/xây lại sổ cái);
+- sổ cái: calculate_trip_balances đọc trip_balances, không phụ thuộc số expense.
+Chạy: python -m tests.bench_balances
+"""
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from tests.bench_common import SessionLocal, create_users, measure, models, print_table, reset_database
+
+from app.crud import crud
+from app.schemas.trip import TripCreate
+from app.services.finance_service import (
+    _greedy_transactions,
+    _recompute_raw_balances,
+    calculate_trip_balances,
+    equal_split_rows,
+    rebuild_trip_ledger,
+)
+
+EXPENSE_COUNTS = (100, 1_000, 10_000)
+MEMBERS = 8
+
+
+# --- Cách cũ, giữ lại chỉ để so sánh ---
+def _legacy_balances(db, trip_id: int):
+    balances = defaultdict(int)
+    expenses = db.query(models.expense.Expense).filter(models.expense.Expense.trip_id == trip_id).all()
+    for exp in expenses:
+        balances[exp.payer_id] += exp.amount_minor
+        splits = db.query(models.expense.ExpenseSplit).filter(
+            models.expense.ExpenseSplit.expense_id == exp.id
+        ).all()
+        for split in splits:
+            balances[split.user_id] -= split.amount_owed_minor
+    for settlement in db.query(models.expense.Settlement).filter(models.expense.Settlement.trip_id == trip_id).all():
+        balances[settlement.payer_id] += settlement.amount_minor
+        balances[settlement.receiver_id] -= settlement.amount_minor
+    result = []
+    for t in _greedy_transactions(balances):
+        result.append((db.get(models.user.User, t["from_user_id"]).name,
+                       db.get(models.user.User, t["to_user_id"]).name, t["amount"]))
+    for user_id in balances:
+        db.get(models.user.User, user_id)
+    return result
+
+
+# --- Dữ liệu ---
+def _seed_trip(db, user_ids: list, expense_count: int) -> int:
+    """Trip với expense_count expense chia cho 2..MEMBERS người và vài settlement; sổ cái được xây lại."""
+    rng = random.Random(expense_count)
+    trip = crud.create_trip(db, TripCreate(name=f"{expense_count} expense"), user_ids[0])
+    db.execute(models.trip.TripMember.__table__.insert(), [
+        {"trip_id": trip.id, "user_id": user_id, "role": "member", "status": "joined"} for user_id in user_ids[1:]
+    ])
+
+    first_id = (db.query(models.expense.Expense.id).order_by(models.expense.Expense.id.desc()).limit(1).scalar() or 0) + 1
+    expenses, splits = [], []
+    for expense_id in range(first_id, first_id + expense_count):
+        amount = rng.randint(1, 2_000) * 1_000
+        participants = rng.sample(user_ids, rng.randint(2, MEMBERS))
+        expenses.append({
+            "id": expense_id, "trip_id": trip.id, "payer_id": rng.choice(user_ids), "amount": float(amount),
+            "amount_minor": amount, "currency": "VND", "split_method": "exact",
+            "expense_date": datetime(2025, 1, 1) + timedelta(minutes=expense_id),
+        })
+        splits.extend(
+            {"expense_id": expense_id, "user_id": user_id, "amount_owed": float(owed), "amount_owed_minor": owed}
+            for user_id, owed in equal_split_rows(amount, participants)
+        )
+    db.execute(models.expense.Expense.__table__.insert(), expenses)
+    db.execute(models.expense.ExpenseSplit.__table__.insert(), splits)
+    db.execute(models.expense.Settlement.__table__.insert(), [
+        {"trip_id": trip.id, "payer_id": user_ids[i], "receiver_id": user_ids[0], "amount": 50_000.0,
+         "amount_minor": 50_000, "currency": "VND"}
+        for i in range(1, MEMBERS)
+    ])
+    db.commit()
+    rebuild_trip_ledger(db, trip.id)
+    return trip.id
+
+
+def main():
+    reset_database()
+    db = SessionLocal()
+    user_ids = create_users(db, MEMBERS)
+    rows = []
+
+    for expense_count in EXPENSE_COUNTS:
+        trip_id = _seed_trip(db, user_ids, expense_count)
+        repeat = 3 if expense_count >= 10_000 else 5
+        for path, fn in (
+            ("cũ (N+1)", lambda: _legacy_balances(db, trip_id)),
+            ("SUM ... GROUP BY", lambda: _recompute_raw_balances(db, trip_id)),
+            ("sổ cái", lambda: calculate_trip_balances(db, trip_id)),
+        ):
+            db.expire_all()  # Không để identity map của lần trước làm nhẹ lần sau
+            count, ms = measure(fn, repeat=repeat)
+            rows.append((expense_count, path, count, f"{ms:.2f}"))
+
+    db.close()
+    print_table(("expense", "đường", "câu SQL", "ms (trung vị)"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Phần dùng chung cho các script benchmark (tests/bench_*.py, pytest không thu thập).
+Chạy từ thư mục backend: python -m tests.bench_trip_days
+Mặc định dùng SQLite tạm; đặt BENCH_DATABASE_URL để đo trên PostgreSQL (database riêng, bị xóa sạch).
+"""
+import os
+import statistics
+import tempfile
+import time
+
+_TMP_DIR = tempfile.mkdtemp(prefix="tripsync-bench-")
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{_TMP_DIR}/bench.db")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP_DIR, "uploads")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("SENDGRID_API_KEY", "bench")
+os.environ.setdefault("SENDGRID_FROM_EMAIL", "bench@example.com")
+
+from app import models  # noqa: E402
+from app.core.query_stats import track_queries  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+import app.main  # noqa: E402,F401  (nạp đủ model và bật bộ đếm câu SQL)
+
+
+def reset_database():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+
+def create_users(db, count: int) -> list:
+    users = [
+        models.user.User(email=f"bench{i}@example.com", hashed_password="x", name=f"Bench {i}")
+        for i in range(count)
+    ]
+    db.add_all(users)
+    db.commit()
+    return [user.id for user in users]
+
+
+def measure(fn, repeat: int = 5, setup=None) -> tuple[int, float]:
+    """Chạy fn `repeat` lần (setup trước mỗi lần, không tính giờ); trả về (số câu SQL, trung vị ms)."""
+    timings = []
+    count = 0
+    for _ in range(repeat):
+        state = setup() if setup else None
+        with track_queries() as stats:
+            started = time.perf_counter()
+            fn(state) if setup else fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        count = stats.count
+    return count, statistics.median(timings)
+
+
+def print_table(header: tuple, rows: list):
+    widths = [max(len(str(cell)) for cell in column) for column in zip(header, *rows)]
+    for row in (header, *rows):
+        print("  ".join(str(cell).rjust(width) for cell, width in zip(row, widths)))
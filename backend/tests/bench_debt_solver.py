@@ -0,0 +1,83 @@
+"""
+Benchmark hai thuật toán tối giản nợ trên số dư ngẫu nhiên (seed cố định), n = 5..20 thành viên:
+- greedy: ghép người nợ nhiều nhất với chủ nợ lớn nhất;
+- optimal: DP bitmask, quay về greedy (None) khi vượt giới hạn thành viên / thời gian.
+Mỗi n đo hai kiểu dữ liệu: ngẫu nhiên hoàn toàn và nhiều nhóm con tổng 0 (greedy hay tốn giao dịch thừa).
+Chạy: python -m tests.bench_debt_solver
+"""
+import random
+import statistics
+import time
+
+from tests.bench_common import print_table
+
+from app.services.finance_service import _greedy_transactions, _optimal_transactions
+
+MEMBER_COUNTS = range(5, 21)
+SAMPLES = 5
+
+
+def _random_balances(rng: random.Random, members: int) -> dict:
+    values = [rng.randint(-50_000, 50_000) for _ in range(members - 1)]
+    values.append(-sum(values))
+    return dict(enumerate(values, start=1))
+
+
+def _grouped_balances(rng: random.Random, members: int) -> dict:
+    values = []
+    while len(values) < members:
+        left = members - len(values)
+        size = min(rng.randint(2, 4), left)
+        if left - size == 1:  # Không để thừa một người lẻ (nhóm 1 người phải có số dư 0)
+            size += 1
+        group = [rng.randint(-9_000, 9_000) for _ in range(size - 1)]
+        group.append(-sum(group))
+        values.extend(group)
+    rng.shuffle(values)
+    return dict(enumerate(values, start=1))
+
+
+def _timed(fn, balances: dict):
+    started = time.perf_counter()
+    result = fn(balances)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    rows = []
+    for kind, generate in (("ngẫu nhiên", _random_balances), ("nhóm con", _grouped_balances)):
+        for members in MEMBER_COUNTS:
+            rng = random.Random(members)
+            greedy_counts, optimal_counts, greedy_ms, optimal_ms = [], [], [], []
+            fallbacks = 0
+            for _ in range(SAMPLES):
+                balances = generate(rng, members)
+                greedy, ms = _timed(_greedy_transactions, balances)
+                greedy_counts.append(len(greedy))
+                greedy_ms.append(ms)
+
+                optimal, ms = _timed(_optimal_transactions, balances)
+                optimal_ms.append(ms)
+                if optimal is None:
+                    # Hết thời gian / quá nhiều người: endpoint trả về kết quả greedy
+                    fallbacks += 1
+                    optimal = greedy
+                optimal_counts.append(len(optimal))
+            rows.append((
+                kind,
+                members,
+                f"{statistics.mean(greedy_counts):.1f}",
+                f"{statistics.mean(optimal_counts):.1f}",
+                f"{statistics.median(greedy_ms):.3f}",
+                f"{statistics.median(optimal_ms):.2f}",
+                f"{fallbacks}/{SAMPLES}",
+            ))
+
+    print_table(
+        ("dữ liệu", "n", "giao dịch greedy", "giao dịch optimal", "ms greedy", "ms optimal", "quay về greedy"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
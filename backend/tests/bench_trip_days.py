@@ -0,0 +1,101 @@
+"""
+Benchmark tạo trip dài ngày và đồng bộ lại khoảng ngày: đường bulk hiện tại so với cách cũ
+(một ItineraryDay ORM mỗi ngày, commit nhiều lần, xóa từng ngày).
+Chạy: python -m tests.bench_trip_days
+"""
+from datetime import date, timedelta
+
+from tests.bench_common import SessionLocal, create_users, measure, models, print_table, reset_database
+
+from app.crud import crud
+from app.schemas.trip import TripCreate, TripUpdate
+
+TRIP_LENGTHS = (30, 90, 365)
+START = date(2025, 1, 1)
+
+
+# --- Cách cũ, giữ lại chỉ để so sánh ---
+def _legacy_sync_days(db, trip_id, start_date, end_date):
+    if not start_date or not end_date:
+        return
+    total_days = (end_date - start_date).days + 1
+    if total_days <= 0:
+        return
+    existing_days = db.query(models.itinerary.ItineraryDay).filter(
+        models.itinerary.ItineraryDay.trip_id == trip_id
+    ).all()
+    existing_numbers = {d.day_number for d in existing_days}
+    for i in range(1, total_days + 1):
+        if i not in existing_numbers:
+            db.add(models.itinerary.ItineraryDay(trip_id=trip_id, day_number=i))
+    for d in existing_days:
+        if d.day_number > total_days:
+            db.delete(d)
+    db.commit()
+
+
+def _legacy_create_trip(db, trip: TripCreate, user_id: int):
+    db_trip = models.trip.Trip(
+        name=trip.name, owner_id=user_id, start_date=trip.start_date, end_date=trip.end_date,
+        base_currency=trip.base_currency,
+    )
+    db.add(db_trip)
+    db.commit()
+    db.refresh(db_trip)
+    _legacy_sync_days(db, db_trip.id, db_trip.start_date, db_trip.end_date)
+    db.add(models.trip.TripMember(trip_id=db_trip.id, user_id=user_id, role="owner"))
+    db_trip.member_count = 1
+    db.commit()
+    return db_trip
+
+
+def _legacy_update_dates(db, trip_id: int, end_date: date):
+    db_trip = db.query(models.trip.Trip).filter(models.trip.Trip.id == trip_id).first()
+    db_trip.end_date = end_date
+    db.commit()
+    db.refresh(db_trip)
+    _legacy_sync_days(db, trip_id, db_trip.start_date, db_trip.end_date)
+
+
+# --- Kịch bản ---
+def _trip_payload(days: int) -> TripCreate:
+    return TripCreate(name=f"Trip {days} ngày", start_date=START, end_date=START + timedelta(days=days - 1))
+
+
+def main():
+    reset_database()
+    db = SessionLocal()
+    (owner_id,) = create_users(db, 1)
+    rows = []
+
+    for days in TRIP_LENGTHS:
+        for path, create in (("cũ", _legacy_create_trip), ("bulk", crud.create_trip)):
+            count, ms = measure(lambda: create(db, _trip_payload(days), owner_id))
+            rows.append((f"tạo {days} ngày", path, count, f"{ms:.2f}"))
+
+    for days in TRIP_LENGTHS:
+        # Nới từ 1 ngày lên `days` ngày rồi thu lại còn 1 ngày (xóa days-1 ngày)
+        longest = START + timedelta(days=days - 1)
+        for path, update in (
+            ("cũ", lambda trip_id, end: _legacy_update_dates(db, trip_id, end)),
+            ("bulk", lambda trip_id, end: crud.update_trip(db, trip_id, TripUpdate(end_date=end))),
+        ):
+            def fresh_trip():
+                return crud.create_trip(db, _trip_payload(1), owner_id).id
+
+            def short_trip():
+                trip_id = fresh_trip()
+                update(trip_id, longest)
+                return trip_id
+
+            count, ms = measure(lambda trip_id: update(trip_id, longest), setup=fresh_trip)
+            rows.append((f"nới 1 -> {days} ngày", path, count, f"{ms:.2f}"))
+            count, ms = measure(lambda trip_id: update(trip_id, START), setup=short_trip)
+            rows.append((f"thu {days} -> 1 ngày", path, count, f"{ms:.2f}"))
+
+    db.close()
+    print_table(("kịch bản", "đường", "câu SQL", "ms (trung vị)"), rows)
+
+
+if __name__ == "__main__":
+    main()
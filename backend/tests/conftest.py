@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+# Cấu hình phải có trước khi import app (app.config đọc biến môi trường lúc import).
+# Mặc định dùng SQLite tạm; đặt TEST_DATABASE_URL để chạy trên PostgreSQL (database riêng cho test, bị xóa sạch).
+_TMP_DIR = tempfile.mkdtemp(prefix="tripsync-test-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{_TMP_DIR}/test.db")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP_DIR, "uploads")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("SENDGRID_API_KEY", "test")
+os.environ.setdefault("SENDGRID_FROM_EMAIL", "test@example.com")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import models
+from app.core.membership_cache import membership_cache
+from app.core.query_stats import assert_max_queries
+from app.core.security import create_access_token
+from app.core.user_cache import user_cache
+from app.crud import crud
+from app.database import Base, SessionLocal, engine
+from app.main import app
+from app.schemas.trip import TripCreate
+from app.services import analytics_service, currency_service, finance_service
+
+
+def _clear_caches():
+    # Id được dùng lại sau mỗi lần tạo lại bảng nên cache trong tiến trình phải được xóa theo
+    user_cache.clear()
+    membership_cache.clear()
+    currency_service._rate_graph_cache.clear()
+    analytics_service._analytics_cache.clear()
+    finance_service._balance_snapshot_cache.clear()
+
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    _clear_caches()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(app)
+
+
+@pytest.fixture
+def users(db):
+    result = []
+    for i in range(3):
+        user = models.user.User(email=f"user{i}@example.com", hashed_password="x", name=f"User {i}")
+        db.add(user)
+        result.append(user)
+    db.commit()
+    return result
+
+
+@pytest.fixture
+def trip(db, users):
+    """Trip do users[0] tạo, users[1] và users[2] tham gia bằng mã mời."""
+    trip = crud.create_trip(db, TripCreate(name="Đà Lạt"), users[0].id)
+    for user in users[1:]:
+        crud.join_trip_by_code(db, trip.invite_code, user.id)
+    _clear_caches()
+    return trip
+
+
+def auth_headers(user) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': str(user.id)})}"}
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Giới hạn số câu SQL của một khối lệnh:
+
+        with query_budget(3):
+            client.get(...)
+    """
+    return assert_max_queries
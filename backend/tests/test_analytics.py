@@ -0,0 +1,79 @@
+import pytest
+
+from tests.conftest import auth_headers
+
+
+def _post_expense(client, trip, payer, amount, involved, day, currency="VND"):
+    response = client.post(
+        "/expenses",
+        json={
+            "trip_id": trip.id,
+            "amount": amount,
+            "currency": currency,
+            "involved_user_ids": [u.id for u in involved],
+            "expense_date": f"2025-06-0{day}T12:00:00",
+        },
+        headers=auth_headers(payer),
+    )
+    assert response.status_code == 200, response.text
+
+
+def test_analytics_aggregates_and_percentiles(client, db, users, trip):
+    a, b, c = users
+    client.post(
+        "/exchange-rates",
+        json={"trip_id": trip.id, "from_currency": "USD", "to_currency": "VND", "rate": 25000},
+        headers=auth_headers(a),
+    )
+    _post_expense(client, trip, a, 100000, users, day=1)
+    _post_expense(client, trip, b, 200000, [a, b], day=2)
+    _post_expense(client, trip, c, 10, [c], day=2, currency="USD")   # 250000 VND
+    _post_expense(client, trip, a, 400000, users, day=3)
+
+    response = client.get(f"/expenses/trip/{trip.id}/analytics", headers=auth_headers(b))
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["currency"] == "VND"
+    assert data["expense_count"] == 4
+    assert data["total"] == 950000.0
+    assert data["average_expense"] == 237500.0
+    assert data["average_per_day"] == pytest.approx(316666.67)
+    assert data["average_per_member"] == pytest.approx(316666.67)
+    # np.percentile nội suy tuyến tính trên [100k, 200k, 250k, 400k]
+    assert data["percentiles"] == {"p25": 175000.0, "p50": 225000.0, "p75": 287500.0, "p90": 355000.0}
+    assert data["by_day"] == [
+        {"date": "2025-06-01", "total": 100000.0},
+        {"date": "2025-06-02", "total": 450000.0},
+        {"date": "2025-06-03", "total": 400000.0},
+    ]
+    assert data["by_payer"] == [
+        {"user_id": a.id, "total": 500000.0},
+        {"user_id": c.id, "total": 250000.0},
+        {"user_id": b.id, "total": 200000.0},
+    ]
+    assert sorted(data["by_currency"], key=lambda row: row["currency"]) == [
+        {"currency": "USD", "count": 1, "total": 10.0, "converted_total": 250000.0},
+        {"currency": "VND", "count": 3, "total": 700000.0, "converted_total": 700000.0},
+    ]
+    assert {row["user_id"]: row["consumed"] for row in data["by_member"]} == {
+        a.id: 266668.0,
+        b.id: 266666.0,
+        c.id: 416666.0,
+    }
+
+
+def test_analytics_empty_trip_and_refresh_after_write(client, db, users, trip):
+    headers = auth_headers(users[0])
+    url = f"/expenses/trip/{trip.id}/analytics"
+
+    empty = client.get(url, headers=headers).json()["data"]
+    assert empty["expense_count"] == 0
+    assert empty["total"] == 0.0
+    assert empty["percentiles"] == {"p25": 0.0, "p50": 0.0, "p75": 0.0, "p90": 0.0}
+
+    _post_expense(client, trip, users[0], 120000, users, day=1)
+    # Kết quả cũ đã cache theo finance_version cũ không được trả lại
+    data = client.get(url, headers=headers).json()["data"]
+    assert data["expense_count"] == 1
+    assert data["percentiles"]["p50"] == 120000.0
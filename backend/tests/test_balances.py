@@ -0,0 +1,45 @@
+from app.services import finance_service
+from tests.conftest import auth_headers
+
+
+def test_balances_etag_and_not_modified(client, db, users, trip):
+    headers = auth_headers(users[0])
+    member_ids = [u.id for u in users]
+    url = f"/expenses/trip/{trip.id}/balances"
+    client.post("/expenses", json={"trip_id": trip.id, "amount": 90000, "involved_user_ids": member_ids}, headers=headers)
+
+    first = client.get(url, headers=headers)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+
+    cached = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+
+    # Solver khác có ETag riêng
+    optimal = client.get(url, params={"solver": "optimal"}, headers={**headers, "If-None-Match": etag})
+    assert optimal.status_code == 200
+    assert optimal.headers["ETag"] != etag
+
+    client.post("/expenses/settle", json={"trip_id": trip.id, "receiver_id": users[0].id, "amount": 30000},
+                headers=auth_headers(users[1]))
+
+    after_write = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert after_write.status_code == 200
+    assert after_write.headers["ETag"] != etag
+    balances = {b["user_id"]: b["balance"] for b in after_write.json()["data"]["balances"]}
+    assert balances == {users[0].id: 30000.0, users[1].id: 0.0, users[2].id: -30000.0}
+
+
+def test_balance_snapshot_cache_is_bounded(client, db, users, trip, monkeypatch):
+    cache = finance_service._balance_snapshot_cache
+    monkeypatch.setattr(cache, "max_size", 2)
+    headers = auth_headers(users[0])
+    member_ids = [u.id for u in users]
+
+    for _ in range(4):
+        client.post("/expenses", json={"trip_id": trip.id, "amount": 1000, "involved_user_ids": member_ids}, headers=headers)
+        assert client.get(f"/expenses/trip/{trip.id}/balances", headers=headers).status_code == 200
+
+    assert cache.stats()["size"] == 2
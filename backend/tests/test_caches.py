@@ -0,0 +1,66 @@
+from app import models
+from app.core.membership_cache import membership_cache
+from app.core.user_cache import user_cache
+from tests.conftest import auth_headers
+
+
+def _outsider(db):
+    user = models.user.User(email="outsider@example.com", hashed_password="x", name="Người ngoài")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_profile_update_invalidates_user_cache(client, users):
+    headers = auth_headers(users[0])
+    user_id = users[0].id
+
+    assert client.get("/users/me", headers=headers).json()["data"]["name"] == "User 0"
+    assert user_cache.get(user_id) is not None
+
+    response = client.put("/users/me", json={"name": "Tên mới"}, headers=headers)
+    assert response.status_code == 200
+    assert user_cache.get(user_id) is None
+
+    assert client.get("/users/me", headers=headers).json()["data"]["name"] == "Tên mới"
+
+
+def test_join_trip_invalidates_membership_cache(client, db, trip):
+    outsider = _outsider(db)
+    headers = auth_headers(outsider)
+    trip_id, invite_code, outsider_id = trip.id, trip.invite_code, outsider.id
+
+    # Lần từ chối để lại tập trip rỗng trong cache
+    assert client.get(f"/expenses/trip/{trip_id}", headers=headers).status_code == 403
+    assert membership_cache.get(outsider_id) == frozenset()
+
+    assert client.post("/trips/join", json={"invite_code": invite_code}, headers=headers).status_code == 200
+    assert membership_cache.get(outsider_id) is None
+
+    assert client.get(f"/expenses/trip/{trip_id}", headers=headers).status_code == 200
+    assert trip_id in membership_cache.get(outsider_id)
+
+
+def test_add_member_grants_access_immediately(client, db, users, trip):
+    outsider = _outsider(db)
+    headers = auth_headers(outsider)
+    trip_id, outsider_id, email = trip.id, outsider.id, outsider.email
+
+    assert client.get(f"/trips/{trip_id}/members", headers=headers).status_code == 403
+
+    response = client.post(f"/trips/{trip_id}/members", json={"user_email": email}, headers=auth_headers(users[0]))
+    assert response.status_code == 200
+    assert membership_cache.get(outsider_id) is None
+
+    assert client.get(f"/trips/{trip_id}/members", headers=headers).status_code == 200
+
+
+def test_delete_trip_revokes_cached_membership(client, users, trip):
+    member_headers = auth_headers(users[1])
+    trip_id, member_id = trip.id, users[1].id
+
+    assert client.get(f"/expenses/trip/{trip_id}", headers=member_headers).status_code == 200
+    assert trip_id in membership_cache.get(member_id)
+
+    assert client.delete(f"/trips/{trip_id}", headers=auth_headers(users[0])).status_code == 200
+    assert membership_cache.get(member_id) is None
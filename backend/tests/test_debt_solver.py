@@ -0,0 +1,131 @@
+"""
+Kiểm tra hai thuật toán tối giản nợ trên số dư nguyên (đơn vị nhỏ nhất):
+tổng bằng 0 sau khi thanh toán, tối ưu so với vét cạn ở nhóm nhỏ, và thời gian chạy gần giới hạn 20 người.
+"""
+import random
+import time
+
+import pytest
+
+from app.services.finance_service import (
+    OPTIMAL_SOLVER_MAX_MEMBERS,
+    OPTIMAL_SOLVER_TIME_BUDGET_SECONDS,
+    _greedy_transactions,
+    _optimal_transactions,
+)
+
+
+def _random_balances(rng: random.Random, members: int, spread: int = 50_000) -> dict:
+    values = [rng.randint(-spread, spread) for _ in range(members - 1)]
+    values.append(-sum(values))
+    return {user_id: amount for user_id, amount in enumerate(values, start=1)}
+
+
+def _grouped_balances(rng: random.Random, group_sizes) -> dict:
+    """Nhiều nhóm con tổng bằng 0 xáo trộn với nhau: greedy thường tốn giao dịch hơn lời giải tối ưu."""
+    values = []
+    for size in group_sizes:
+        group = [rng.randint(-9_000, 9_000) for _ in range(size - 1)]
+        group.append(-sum(group))
+        values.extend(group)
+    rng.shuffle(values)
+    return {user_id: amount for user_id, amount in enumerate(values, start=1)}
+
+
+def _settle(balances: dict, transactions: list) -> dict:
+    remaining = dict(balances)
+    for tx in transactions:
+        assert isinstance(tx["amount"], int) and tx["amount"] > 0
+        assert tx["from_user_id"] != tx["to_user_id"]
+        remaining[tx["from_user_id"]] += tx["amount"]
+        remaining[tx["to_user_id"]] -= tx["amount"]
+    return remaining
+
+
+def _brute_force_min_transactions(balances: dict) -> int:
+    """Vét cạn kiểu backtracking: tất toán người đầu tiên còn nợ với từng người trái dấu."""
+    values = [amount for amount in balances.values() if amount != 0]
+
+    def search(start: int) -> int:
+        while start < len(values) and values[start] == 0:
+            start += 1
+        if start == len(values):
+            return 0
+        best = len(values)
+        for k in range(start + 1, len(values)):
+            if values[k] * values[start] < 0:
+                values[k] += values[start]
+                best = min(best, 1 + search(start + 1))
+                values[k] -= values[start]
+        return best
+
+    return search(0)
+
+
+SOLVERS = {
+    "greedy": _greedy_transactions,
+    "optimal": lambda balances: _optimal_transactions(balances, time_budget=5),
+}
+
+
+@pytest.mark.parametrize("solver", sorted(SOLVERS))
+@pytest.mark.parametrize("seed", range(25))
+def test_solver_settles_everyone_to_zero(solver, seed):
+    rng = random.Random(seed)
+    balances = _random_balances(rng, rng.randint(2, 14))
+    if seed % 5 == 0:
+        balances[max(balances) + 1] = 0  # Người đã cân bằng không được xuất hiện trong giao dịch
+
+    transactions = SOLVERS[solver](balances)
+
+    assert all(amount == 0 for amount in _settle(balances, transactions).values())
+    nonzero = sum(1 for amount in balances.values() if amount != 0)
+    assert len(transactions) <= max(nonzero - 1, 0)
+
+
+@pytest.mark.parametrize("solver", sorted(SOLVERS))
+def test_solver_handles_settled_group(solver):
+    assert SOLVERS[solver]({1: 0, 2: 0}) == []
+    assert SOLVERS[solver]({}) == []
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_optimal_matches_brute_force_on_small_groups(seed):
+    rng = random.Random(1000 + seed)
+    if seed % 2:
+        balances = _random_balances(rng, rng.randint(2, 8), spread=rng.choice([5, 300, 50_000]))
+    else:
+        balances = _grouped_balances(rng, [rng.randint(2, 3) for _ in range(rng.randint(2, 3))])
+
+    transactions = _optimal_transactions(balances, time_budget=5)
+
+    assert transactions is not None
+    assert len(transactions) == _brute_force_min_transactions(balances)
+    assert len(transactions) <= len(_greedy_transactions(balances))
+
+
+def test_optimal_beats_greedy_on_hidden_subgroups():
+    # {1,2,3} và {4,5} tự cân bằng: tối ưu cần 3 giao dịch, greedy ghép -600 với 500 nên cần 4
+    balances = {1: -600, 2: 300, 3: 300, 4: 500, 5: -500}
+    assert len(_greedy_transactions(balances)) == 4
+    assert len(_optimal_transactions(balances)) == _brute_force_min_transactions(balances) == 3
+
+
+def test_optimal_solver_timing_near_member_limit():
+    """Gần giới hạn 20 người: hoặc giải xong, hoặc trả None (caller dùng greedy) trong khoảng time budget."""
+    timings = {}
+    for members in (12, 16, OPTIMAL_SOLVER_MAX_MEMBERS):
+        balances = _random_balances(random.Random(members), members)
+        started = time.perf_counter()
+        transactions = _optimal_transactions(balances)
+        timings[members] = time.perf_counter() - started
+
+        assert timings[members] < OPTIMAL_SOLVER_TIME_BUDGET_SECONDS + 0.5, timings
+        if transactions is not None:
+            assert all(amount == 0 for amount in _settle(balances, transactions).values())
+        else:
+            assert timings[members] >= OPTIMAL_SOLVER_TIME_BUDGET_SECONDS
+
+    # Nhóm 12 người phải giải xong trong time budget, không được rơi về greedy
+    assert _optimal_transactions(_random_balances(random.Random(12), 12)) is not None
+    assert _optimal_transactions(_random_balances(random.Random(0), OPTIMAL_SOLVER_MAX_MEMBERS + 1)) is None
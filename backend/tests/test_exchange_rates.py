@@ -0,0 +1,48 @@
+import pytest
+
+from tests.conftest import auth_headers
+
+
+def _add_rate(client, headers, trip_id, from_currency, to_currency, rate):
+    response = client.post(
+        "/exchange-rates",
+        json={"trip_id": trip_id, "from_currency": from_currency, "to_currency": to_currency, "rate": rate},
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+
+def test_convert_batch_multi_hop_and_row_errors(client, users, trip):
+    headers = auth_headers(users[0])
+    _add_rate(client, headers, trip.id, "USD", "VND", 25000)
+    _add_rate(client, headers, trip.id, "EUR", "USD", 1.1)
+
+    items = [
+        {"amount": 10, "from_currency": "EUR", "to_currency": "VND"},   # 2 bước: EUR -> USD -> VND
+        {"amount": 50000, "from_currency": "VND", "to_currency": "EUR"},  # nghịch đảo 2 bước
+        {"amount": 5, "from_currency": "JPY", "to_currency": "VND"},    # không có tỷ giá
+        {"amount": 7, "from_currency": "VND", "to_currency": "VND"},
+        {"amount": 2, "from_currency": "EUR", "to_currency": "VND"},
+    ]
+    response = client.post("/exchange-rates/convert/batch", json={"trip_id": trip.id, "items": items}, headers=headers)
+    assert response.status_code == 200
+    rows = response.json()["data"]
+
+    assert [(row["original_amount"], row["from_currency"], row["to_currency"]) for row in rows] == [
+        (item["amount"], item["from_currency"], item["to_currency"]) for item in items
+    ]
+    assert rows[0]["converted_amount"] == pytest.approx(10 * 1.1 * 25000)
+    assert rows[1]["converted_amount"] == pytest.approx(50000 / 25000 / 1.1)
+    assert rows[2]["converted_amount"] is None
+    assert rows[2]["error"] == "Không tìm thấy tỷ giá từ JPY sang VND"
+    assert rows[3]["converted_amount"] == 7
+    assert rows[4]["converted_amount"] == pytest.approx(2 * 1.1 * 25000)
+    assert [row["error"] is None for row in rows] == [True, True, False, True, True]
+
+
+def test_convert_batch_all_rows_missing(client, users, trip):
+    headers = auth_headers(users[0])
+    items = [{"amount": 1, "from_currency": "USD", "to_currency": "VND"}] * 3
+    response = client.post("/exchange-rates/convert/batch", json={"trip_id": trip.id, "items": items}, headers=headers)
+    assert response.status_code == 200
+    assert all(row["converted_amount"] is None and row["error"] for row in response.json()["data"])
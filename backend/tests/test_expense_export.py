@@ -0,0 +1,73 @@
+import csv
+import io
+import json
+
+from app import models
+from app.services import expense_export_service
+from tests.conftest import auth_headers
+
+
+def _seed(client, trip, users) -> list[int]:
+    headers = auth_headers(users[0])
+    member_ids = [u.id for u in users]
+    expense_ids = [
+        client.post(
+            "/expenses",
+            json={"trip_id": trip.id, "amount": amount, "description": f"Khoản {i}", "involved_user_ids": member_ids},
+            headers=headers,
+        ).json()["data"]["id"]
+        for i, amount in enumerate((100000, 20000, 3000))
+    ]
+    client.post("/expenses/settle", json={"trip_id": trip.id, "receiver_id": users[0].id, "amount": 10000},
+                headers=auth_headers(users[1]))
+    return expense_ids
+
+
+def test_export_csv_streams_every_record(client, db, users, trip, monkeypatch):
+    # Buffer nhỏ để response được gửi thành nhiều phần
+    monkeypatch.setattr(expense_export_service, "EXPORT_FLUSH_BYTES", 64)
+    expense_ids = _seed(client, trip, users)
+
+    response = client.get(f"/expenses/trip/{trip.id}/export", headers=auth_headers(users[2]))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert f'trip_{trip.id}_expenses.csv' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert list(rows[0]) == expense_export_service.CSV_COLUMNS
+
+    expenses = [r for r in rows if r["record_type"] == "expense"]
+    splits = [r for r in rows if r["record_type"] == "split"]
+    settlements = [r for r in rows if r["record_type"] == "settlement"]
+    assert [int(r["id"]) for r in expenses] == expense_ids
+    assert [r["description"] for r in expenses] == ["Khoản 0", "Khoản 1", "Khoản 2"]
+    assert len(splits) == 9
+    # Phần chia của mỗi expense cộng lại đúng bằng amount
+    for expense in expenses:
+        owed = [float(r["amount"]) for r in splits if r["expense_id"] == expense["id"]]
+        assert sum(owed) == float(expense["amount"])
+    assert [(int(r["payer_id"]), int(r["receiver_id"]), float(r["amount"])) for r in settlements] == [
+        (users[1].id, users[0].id, 10000.0)
+    ]
+
+
+def test_export_jsonl_matches_csv(client, db, users, trip):
+    _seed(client, trip, users)
+    headers = auth_headers(users[0])
+
+    jsonl = client.get(f"/expenses/trip/{trip.id}/export", params={"format": "jsonl"}, headers=headers)
+    csv_rows = list(csv.DictReader(io.StringIO(
+        client.get(f"/expenses/trip/{trip.id}/export", headers=headers).text
+    )))
+
+    assert jsonl.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in jsonl.text.splitlines()]
+    assert [r["record_type"] for r in records] == [r["record_type"] for r in csv_rows]
+    assert [r["amount"] for r in records] == [float(r["amount"]) for r in csv_rows]
+
+
+def test_export_requires_membership(client, db, users, trip):
+    outsider = models.user.User(email="outsider@example.com", hashed_password="x", name="Outsider")
+    db.add(outsider)
+    db.commit()
+    assert client.get(f"/expenses/trip/{trip.id}/export", headers=auth_headers(outsider)).status_code == 403
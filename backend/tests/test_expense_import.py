@@ -0,0 +1,67 @@
+from app import models
+from app.services.finance_service import verify_trip_ledger
+from tests.conftest import auth_headers
+
+
+def _import(client, trip_id: int, user, content: str, filename: str = "expenses.csv"):
+    return client.post(
+        f"/expenses/trip/{trip_id}/import",
+        files={"file": (filename, content.encode("utf-8"), "text/csv")},
+        headers=auth_headers(user),
+    )
+
+
+def test_import_rejects_rows_in_unconvertible_currency(client, db, users, trip):
+    response = _import(client, trip.id, users[0], "amount,currency\n50000,VND\n12,USD\n")
+
+    report = response.json()["data"]
+    assert response.status_code == 200
+    assert report["imported"] == 1
+    assert [error["row"] for error in report["errors"]] == [3]
+    assert "USD" in report["errors"][0]["error"]
+    assert verify_trip_ledger(db, trip.id) == []
+
+
+def test_import_reports_errors_per_row_and_imports_the_rest(client, db, users, trip):
+    a, b, c = (u.id for u in users)
+    content = (
+        "amount,currency,description,expense_date,payer_id,involved_user_ids\n"
+        f"90000,VND,Ăn tối,2025-03-01T19:00:00,{b},{a};{b};{c}\n"
+        "abc,VND,Sai số tiền,,,\n"
+        f"50000,VND,Người ngoài,,,{a};999\n"
+        "0.4,VND,Làm tròn về 0,,,\n"
+        f"30000,,Chia cả nhóm,,,\n"
+    )
+
+    response = _import(client, trip.id, users[0], content)
+
+    assert response.status_code == 200
+    report = response.json()["data"]
+    assert report["imported"] == 2
+    assert report["failed"] == 3
+    errors = {error["row"]: error["error"] for error in report["errors"]}
+    assert set(errors) == {3, 4, 5}
+    assert "amount" in errors[3]
+    assert "999" in errors[4]
+    assert "VND" in errors[5]
+    assert verify_trip_ledger(db, trip.id) == []
+
+    balances = client.get(f"/expenses/trip/{trip.id}/balances", headers=auth_headers(users[0])).json()["data"]
+    assert balances["total_expense"] == 120000.0
+    assert {row["user_id"]: row["balance"] for row in balances["balances"]} == {a: -10000.0, b: 50000.0, c: -40000.0}
+
+
+def test_import_rejects_file_without_amount_column_or_non_csv(client, db, users, trip):
+    response = _import(client, trip.id, users[0], "currency,description\nVND,x\n")
+    assert response.status_code == 400
+    assert "amount" in response.json()["detail"]
+
+    response = _import(client, trip.id, users[0], "amount\n1000\n", filename="expenses.xlsx")
+    assert response.status_code == 400
+
+
+def test_import_requires_membership(client, db, users, trip):
+    outsider = models.user.User(email="outsider@example.com", hashed_password="x", name="Outsider")
+    db.add(outsider)
+    db.commit()
+    assert _import(client, trip.id, outsider, "amount\n1000\n").status_code == 403
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+from tests.conftest import auth_headers
+
+START = datetime(2025, 5, 1, 8, 0)
+
+
+def _seed(client, trip, users) -> list[dict]:
+    """12 expense, ngày tăng dần; expense 4 và 5 cùng thời điểm để kiểm tra thứ tự theo id."""
+    member_ids = [u.id for u in users]
+    created = []
+    for i in range(12):
+        payer = users[i % 3]
+        expense_date = START + timedelta(days=i if i != 5 else 4)
+        data = client.post(
+            "/expenses",
+            json={
+                "trip_id": trip.id,
+                "amount": 1000 * (i + 1),
+                "involved_user_ids": member_ids,
+                "expense_date": expense_date.isoformat(),
+            },
+            headers=auth_headers(payer),
+        ).json()["data"]
+        created.append({"id": data["id"], "payer_id": payer.id, "expense_date": expense_date})
+    return created
+
+
+def _walk(client, url, headers, params) -> list[list[int]]:
+    pages, cursor = [], None
+    while True:
+        response = client.get(url, params={**params, **({"cursor": cursor} if cursor else {})}, headers=headers)
+        assert response.status_code == 200
+        pages.append([e["id"] for e in response.json()["data"]])
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+def test_cursor_pages_cover_all_expenses_newest_first(client, db, users, trip):
+    created = _seed(client, trip, users)
+    expected = [e["id"] for e in sorted(created, key=lambda e: (e["expense_date"], e["id"]), reverse=True)]
+
+    pages = _walk(client, f"/expenses/trip/{trip.id}", auth_headers(users[0]), {"limit": 5})
+
+    assert [len(page) for page in pages] == [5, 5, 2]
+    assert [expense_id for page in pages for expense_id in page] == expected
+    # Không truyền limit: toàn bộ danh sách, không có cursor
+    response = client.get(f"/expenses/trip/{trip.id}", headers=auth_headers(users[0]))
+    assert [e["id"] for e in response.json()["data"]] == expected
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_cursor_pagination_with_filters(client, db, users, trip):
+    created = _seed(client, trip, users)
+    payer_id = users[1].id
+    date_from, date_to = START + timedelta(days=2), START + timedelta(days=10)
+    expected = [
+        e["id"]
+        for e in sorted(created, key=lambda e: (e["expense_date"], e["id"]), reverse=True)
+        if e["payer_id"] == payer_id and date_from <= e["expense_date"] <= date_to
+    ]
+
+    pages = _walk(
+        client,
+        f"/expenses/trip/{trip.id}",
+        auth_headers(users[0]),
+        {"limit": 1, "payer_id": payer_id, "date_from": date_from.isoformat(), "date_to": date_to.isoformat()},
+    )
+
+    assert expected and [expense_id for page in pages for expense_id in page] == expected
+    assert all(len(page) == 1 for page in pages)
+
+    response = client.get(
+        f"/expenses/trip/{trip.id}", params={"currency": "USD"}, headers=auth_headers(users[0])
+    )
+    assert response.json()["data"] == []
+
+
+def test_bad_cursor_returns_400(client, db, users, trip):
+    _seed(client, trip, users)
+    headers = auth_headers(users[0])
+
+    for cursor in ("not-a-cursor", "bm8tc2VwYXJhdG9y", "MjAyNS0wMS0wMXxhYmM="):
+        response = client.get(f"/expenses/trip/{trip.id}", params={"limit": 5, "cursor": cursor}, headers=headers)
+        assert response.status_code == 400, cursor
+        assert response.json()["detail"] == "Cursor không hợp lệ"
+
+    assert client.get(f"/expenses/trip/{trip.id}", params={"limit": 0}, headers=headers).status_code == 422
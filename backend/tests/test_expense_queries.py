@@ -0,0 +1,35 @@
+import pytest
+
+from app import models
+from app.crud import crud
+from app.schemas.expense import ExpenseCreate
+from app.services.finance_service import verify_trip_ledger
+
+
+def _add_members(db, trip, count: int) -> list[int]:
+    ids = []
+    for i in range(count):
+        user = models.user.User(email=f"member{i}@example.com", hashed_password="x", name=f"Member {i}")
+        db.add(user)
+        db.commit()
+        crud.join_trip_by_code(db, trip.invite_code, user.id)
+        ids.append(user.id)
+    return ids
+
+
+@pytest.mark.parametrize("split_size", [3, 30])
+def test_create_expense_query_count(db, users, trip, query_budget, split_size):
+    """
+    Kiểm tra thành viên (1 câu IN), INSERT expense, upsert sổ cái (1 câu cho mọi người),
+    tăng finance_version, refresh: số câu không đổi theo số người được chia.
+    """
+    member_ids = [u.id for u in users]
+    member_ids += _add_members(db, trip, split_size - len(member_ids))
+    expense = ExpenseCreate(trip_id=trip.id, amount=100000, involved_user_ids=member_ids)
+    payer_id, trip_id = users[0].id, trip.id
+
+    with query_budget(5) as stats:
+        crud.create_expense(db, expense=expense, user_id=payer_id)
+
+    assert stats.count == 5
+    assert verify_trip_ledger(db, trip_id) == []
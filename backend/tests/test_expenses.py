@@ -0,0 +1,167 @@
+from app import models
+from app.services.finance_service import verify_trip_ledger
+from tests.conftest import auth_headers
+
+
+def _create_expense(client, trip_id: int, user, **fields):
+    payload = {"trip_id": trip_id, "amount": 90000, "involved_user_ids": [user.id], **fields}
+    return client.post("/expenses", json=payload, headers=auth_headers(user))
+
+
+def test_update_expense_rejects_amount_rounding_to_zero(client, db, users, trip):
+    member_ids = [u.id for u in users]
+    expense_id = _create_expense(client, trip.id, users[0], involved_user_ids=member_ids).json()["data"]["id"]
+
+    response = client.put(
+        f"/expenses/{expense_id}",
+        json={"trip_id": trip.id, "amount": 0.4, "currency": "VND", "involved_user_ids": member_ids},
+        headers=auth_headers(users[0]),
+    )
+
+    assert response.status_code == 400
+    db.expire_all()
+    assert db.get(models.expense.Expense, expense_id).amount_minor == 90000
+    assert verify_trip_ledger(db, trip.id) == []
+
+
+def _legacy_split_expense(db, trip, users) -> int:
+    """Expense kiểu cũ: participant_ids NULL, từng dòng expense_splits (USD, đơn vị cent)."""
+    from datetime import datetime
+    from app.services.finance_service import rebuild_trip_ledger
+
+    expense = models.expense.Expense(
+        trip_id=trip.id, payer_id=users[0].id, amount=30.0, amount_minor=3000, currency="USD",
+        expense_date=datetime(2025, 1, 1), split_method="exact", participant_ids=None,
+    )
+    db.add(expense)
+    db.flush()
+    for user, owed in zip(users, (1000, 1500, 500)):
+        db.add(models.expense.ExpenseSplit(
+            expense_id=expense.id, user_id=user.id, amount_owed=owed / 100, amount_owed_minor=owed
+        ))
+    db.commit()
+    rebuild_trip_ledger(db, trip.id)
+    return expense.id
+
+
+def test_update_expense_currency_rescales_legacy_splits(client, db, users, trip):
+    headers = auth_headers(users[0])
+    client.post(
+        "/exchange-rates",
+        json={"trip_id": trip.id, "from_currency": "USD", "to_currency": "VND", "rate": 25000},
+        headers=headers,
+    )
+    expense_id = _legacy_split_expense(db, trip, users)
+    member_ids = [u.id for u in users]
+
+    response = client.put(
+        f"/expenses/{expense_id}",
+        json={"trip_id": trip.id, "amount": 750000, "currency": "VND", "involved_user_ids": member_ids},
+        headers=headers,
+    )
+
+    assert response.status_code == 200
+    db.expire_all()
+    splits = db.query(models.expense.ExpenseSplit).filter_by(expense_id=expense_id).order_by("user_id").all()
+    assert [s.amount_owed_minor for s in splits] == [250000, 375000, 125000]
+    assert verify_trip_ledger(db, trip.id) == []
+    ledger = {
+        (row.user_id, row.currency): row.balance
+        for row in db.query(models.expense.TripBalance).filter_by(trip_id=trip.id)
+        if row.balance
+    }
+    assert ledger == {(users[0].id, "VND"): 500000, (users[1].id, "VND"): -375000, (users[2].id, "VND"): -125000}
+
+
+def test_duplicate_involved_ids_are_charged_once(client, db, users, trip):
+    a, b, c = (u.id for u in users)
+    response = _create_expense(client, trip.id, users[0], amount=90000, involved_user_ids=[a, b, b, c])
+
+    assert response.status_code == 200
+    assert verify_trip_ledger(db, trip.id) == []
+    balances = client.get(f"/expenses/trip/{trip.id}/balances", headers=auth_headers(users[0])).json()["data"]
+    assert {b["user_id"]: b["balance"] for b in balances["balances"]} == {a: 60000.0, b: -30000.0, c: -30000.0}
+
+
+EXPENSE_KEYS = {
+    "id", "trip_id", "payer_id", "amount", "currency", "description", "expense_date", "split_method", "created_at",
+    "payer", "splits",
+}
+SPLIT_KEYS = {"id", "expense_id", "user_id", "amount_owed", "user"}
+
+
+def test_expense_list_response_shape_is_stable(client, db, users, trip):
+    headers = auth_headers(users[0])
+    member_ids = [u.id for u in users]
+    _create_expense(client, trip.id, users[0], amount=100000, involved_user_ids=member_ids)
+    _legacy_split_expense(db, trip, users)
+
+    first = client.get(f"/expenses/trip/{trip.id}", headers=headers).json()["data"]
+    second = client.get(f"/expenses/trip/{trip.id}", headers=headers).json()["data"]
+
+    assert len(first) == 2
+    for expense in first:
+        assert set(expense) == EXPENSE_KEYS
+        assert {"id", "name", "avatar_url"} <= set(expense["payer"])
+        assert len(expense["splits"]) == 3
+        for split in expense["splits"]:
+            assert set(split) == SPLIT_KEYS
+            assert isinstance(split["id"], int)
+            assert split["expense_id"] == expense["id"]
+            assert split["user"]["id"] == split["user_id"]
+
+    split_ids = [split["id"] for expense in first for split in expense["splits"]]
+    assert len(set(split_ids)) == len(split_ids)
+    # id của split dựng từ expense chia đều giữ nguyên giữa các lần gọi
+    assert split_ids == [split["id"] for expense in second for split in expense["splits"]]
+
+    compact = next(e for e in first if e["split_method"] == "equal")
+    assert [s["amount_owed"] for s in compact["splits"]] == [33334.0, 33333.0, 33333.0]
+
+
+def test_expense_in_unconvertible_currency_is_rejected(client, db, users, trip):
+    headers = auth_headers(users[0])
+    member_ids = [u.id for u in users]
+
+    response = _create_expense(client, trip.id, users[0], amount=10, currency="USD", involved_user_ids=member_ids)
+    assert response.status_code == 400
+    assert "USD" in response.json()["detail"]
+
+    expense_id = _create_expense(client, trip.id, users[0], involved_user_ids=member_ids).json()["data"]["id"]
+    response = client.put(
+        f"/expenses/{expense_id}",
+        json={"trip_id": trip.id, "amount": 10, "currency": "JPY", "involved_user_ids": member_ids},
+        headers=headers,
+    )
+    assert response.status_code == 400
+
+    client.post(
+        "/exchange-rates",
+        json={"trip_id": trip.id, "from_currency": "USD", "to_currency": "VND", "rate": 25000},
+        headers=headers,
+    )
+    response = _create_expense(client, trip.id, users[0], amount=10, currency="USD", involved_user_ids=member_ids)
+    assert response.status_code == 200
+
+    # Balances vẫn đọc được: sổ cái chỉ chứa khoản quy đổi được
+    assert client.get(f"/expenses/trip/{trip.id}/balances", headers=headers).status_code == 200
+    assert verify_trip_ledger(db, trip.id) == []
+
+
+def test_base_currency_change_requires_rates_for_ledger_currencies(client, db, users, trip):
+    headers = auth_headers(users[0])
+    _create_expense(client, trip.id, users[0], involved_user_ids=[u.id for u in users])
+
+    response = client.put(f"/trips/{trip.id}", json={"base_currency": "EUR"}, headers=headers)
+    assert response.status_code == 400
+    db.expire_all()
+    assert db.get(models.trip.Trip, trip.id).base_currency == "VND"
+
+    client.post(
+        "/exchange-rates",
+        json={"trip_id": trip.id, "from_currency": "EUR", "to_currency": "VND", "rate": 27000},
+        headers=headers,
+    )
+    response = client.put(f"/trips/{trip.id}", json={"base_currency": "EUR"}, headers=headers)
+    assert response.status_code == 200
+    assert client.get(f"/expenses/trip/{trip.id}/balances", headers=headers).json()["data"]["currency"] == "EUR"
@@ -0,0 +1,41 @@
+import pytest
+
+from app.crud import crud
+from app.schemas.itinerary import ActivityCreate
+from tests.conftest import auth_headers
+
+
+def _seed_day(db, trip, users, activity_count: int):
+    day = crud.create_itinerary_day(db, trip.id, 1)
+    for i in range(activity_count):
+        creator = users[i % len(users)]
+        activity = crud.create_activity(db, ActivityCreate(day_id=day.id, title=f"Hoạt động {i}"), creator.id)
+        crud.vote_activity(db, activity.id, users[(i + 1) % len(users)].id, "upvote")
+        crud.vote_activity(db, activity.id, users[0].id, "downvote" if i % 2 else "upvote")
+
+
+@pytest.mark.parametrize("activity_count", [3, 30])
+def test_activities_by_day_number_constant_queries(db, users, trip, query_budget, activity_count):
+    """Số câu SQL không phụ thuộc số hoạt động: activity, tên người tạo, vote của mình."""
+    _seed_day(db, trip, users, activity_count)
+    trip_id, user_id = trip.id, users[0].id
+    db.expire_all()
+
+    with query_budget(3) as stats:
+        activities = crud.get_activities_by_trip_and_day_number(db, trip_id=trip_id, day_number=1, current_user_id=user_id)
+
+    assert len(activities) == activity_count
+    assert stats.count == 3
+
+
+@pytest.mark.parametrize("activity_count", [3, 30])
+def test_activities_by_day_number_endpoint(client, db, users, trip, query_budget, activity_count):
+    _seed_day(db, trip, users, activity_count)
+    headers = auth_headers(users[0])
+    trip_id = trip.id
+
+    # user + danh sách trip của user + 3 câu của crud
+    with query_budget(5):
+        response = client.get(f"/itinerary/trips/{trip_id}/days/1/activities", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == activity_count
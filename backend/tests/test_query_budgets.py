@@ -0,0 +1,110 @@
+"""
+Số câu SQL tối đa của các endpoint chính, mỗi router ít nhất một endpoint.
+Đo từ trạng thái cache lạnh (fixture trip xóa cache): đã bao gồm câu đọc user và danh sách trip của user.
+Tăng giới hạn chỉ khi thật sự cần, thường là dấu hiệu N+1.
+"""
+import pytest
+
+from app.core.security import get_password_hash
+from tests.conftest import auth_headers
+
+
+@pytest.fixture
+def seeded_trip(client, db, users, trip):
+    """Trip có vài chi tiêu, tỷ giá, checklist và một ngày lịch trình."""
+    headers = auth_headers(users[0])
+    member_ids = [u.id for u in users]
+    client.post("/exchange-rates", json={"trip_id": trip.id, "from_currency": "USD", "to_currency": "VND", "rate": 25000}, headers=headers)
+    for amount in (90000, 120000, 45000):
+        client.post("/expenses", json={"trip_id": trip.id, "amount": amount, "involved_user_ids": member_ids}, headers=headers)
+    client.post("/expenses", json={"trip_id": trip.id, "amount": 12, "currency": "USD", "involved_user_ids": member_ids}, headers=headers)
+    client.post("/checklist/item", params={"trip_id": trip.id, "content": "Mang áo mưa"}, headers=headers)
+    client.post("/itinerary/days", params={"trip_id": trip.id, "day_number": 1}, headers=headers)
+    from tests.conftest import _clear_caches
+    _clear_caches()
+    return trip
+
+
+def test_auth_login(client, db, users, query_budget):
+    users[0].hashed_password = get_password_hash("secret123")
+    db.commit()
+    email = users[0].email
+    with query_budget(1):
+        response = client.post("/auth/login", data={"username": email, "password": "secret123"})
+    assert response.status_code == 200
+
+
+def test_users_me_balances(client, users, seeded_trip, query_budget):
+    headers = auth_headers(users[0])
+    with query_budget(5):
+        response = client.get("/users/me/balances", headers=headers)
+    assert response.status_code == 200
+
+
+def test_trips_list_and_members(client, users, seeded_trip, query_budget):
+    headers = auth_headers(users[0])
+    trip_id = seeded_trip.id
+    with query_budget(2):
+        assert client.get("/trips", headers=headers).status_code == 200
+    with query_budget(3):
+        assert client.get(f"/trips/{trip_id}/members", headers=headers).status_code == 200
+
+
+def test_itinerary_for_trip(client, users, seeded_trip, query_budget):
+    headers = auth_headers(users[0])
+    trip_id = seeded_trip.id
+    with query_budget(6):
+        response = client.get(f"/itinerary/trip/{trip_id}", headers=headers)
+    assert response.status_code == 200
+
+
+def test_expenses_list(client, users, seeded_trip, query_budget):
+    headers = auth_headers(users[0])
+    trip_id = seeded_trip.id
+    with query_budget(5):
+        response = client.get(f"/expenses/trip/{trip_id}", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == 4
+
+
+def test_expenses_balances(client, users, seeded_trip, query_budget):
+    headers = auth_headers(users[0])
+    trip_id = seeded_trip.id
+    with query_budget(8):
+        response = client.get(f"/expenses/trip/{trip_id}/balances", headers=headers)
+    assert response.status_code == 200
+
+    # Cùng finance_version: snapshot đã cache, chỉ còn câu đọc version
+    with query_budget(1):
+        response = client.get(f"/expenses/trip/{trip_id}/balances", headers=headers)
+    assert response.status_code == 200
+
+
+def test_documents_list(client, users, seeded_trip, query_budget):
+    headers = auth_headers(users[0])
+    trip_id = seeded_trip.id
+    with query_budget(3):
+        response = client.get(f"/documents/trip/{trip_id}", headers=headers)
+    assert response.status_code == 200
+
+
+def test_checklist_list(client, users, seeded_trip, query_budget):
+    headers = auth_headers(users[0])
+    trip_id = seeded_trip.id
+    with query_budget(3):
+        response = client.get(f"/checklist/trip/{trip_id}", headers=headers)
+    assert response.status_code == 200
+
+
+def test_exchange_rates_convert_batch(client, users, seeded_trip, query_budget):
+    headers = auth_headers(users[0])
+    trip_id = seeded_trip.id
+    items = [{"amount": i, "from_currency": "USD", "to_currency": "VND"} for i in range(1, 51)]
+    with query_budget(4):
+        response = client.post(
+            "/exchange-rates/convert/batch",
+            json={"trip_id": trip_id, "items": items},
+            headers=headers,
+        )
+    assert response.status_code == 200
+    assert all(row["error"] is None for row in response.json()["data"])
@@ -0,0 +1,118 @@
+"""
+EXPLAIN các câu truy vấn nóng trên database đã seed và báo lỗi nếu có sequential scan.
+SQLite: EXPLAIN QUERY PLAN, dòng "SCAN <bảng>" là quét toàn bảng.
+PostgreSQL (TEST_DATABASE_URL): tắt enable_seqscan để planner chỉ chọn Seq Scan khi không có index dùng được.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, text
+
+from app import models
+from app.database import engine
+
+Activity = models.itinerary.Activity
+ActivityVote = models.itinerary.ActivityVote
+ItineraryDay = models.itinerary.ItineraryDay
+TripMember = models.trip.TripMember
+Expense = models.expense.Expense
+ExpenseSplit = models.expense.ExpenseSplit
+TripBalance = models.expense.TripBalance
+Document = models.document.Document
+ChecklistItem = models.checklist.ChecklistItem
+
+HOT_QUERIES = {
+    "trip_members theo user": select(TripMember.trip_id).where(TripMember.user_id == 1),
+    "trip_members theo trip + user": select(TripMember.user_id).where(TripMember.trip_id == 1, TripMember.user_id.in_([1, 2])),
+    "itinerary_days theo trip + ngày": select(ItineraryDay.id).where(ItineraryDay.trip_id == 1, ItineraryDay.day_number == 2),
+    "activities theo ngày": select(Activity.id).where(Activity.day_id == 1),
+    "đếm vote theo loại": select(ActivityVote.id).where(ActivityVote.activity_id == 1, ActivityVote.vote == "upvote"),
+    "vote của user": select(ActivityVote.vote).where(ActivityVote.activity_id == 1, ActivityVote.user_id == 1),
+    "expenses của trip (phân trang)": select(Expense.id)
+        .where(Expense.trip_id == 1)
+        .order_by(Expense.expense_date.desc(), Expense.id.desc())
+        .limit(20),
+    "splits của expense": select(ExpenseSplit.user_id).where(ExpenseSplit.expense_id == 1),
+    "sổ cái của trip": select(TripBalance.balance).where(TripBalance.trip_id == 1),
+    "documents của trip": select(Document.id).where(Document.trip_id == 1),
+    "checklist của trip": select(ChecklistItem.id).where(ChecklistItem.trip_id == 1),
+}
+
+
+@pytest.fixture
+def seeded_db(db):
+    """Đủ dòng để planner có lý do dùng index (nhiều trip, mỗi trip nhiều dòng con)."""
+    conn = db.connection()
+    trip_count, users_per_trip = 40, 5
+    conn.execute(models.user.User.__table__.insert(), [
+        {"id": u, "email": f"seed{u}@example.com", "hashed_password": "x", "name": f"Seed {u}"}
+        for u in range(1, trip_count * users_per_trip + 1)
+    ])
+    conn.execute(models.trip.Trip.__table__.insert(), [
+        {"id": t, "name": f"Trip {t}", "owner_id": (t - 1) * users_per_trip + 1, "base_currency": "VND"}
+        for t in range(1, trip_count + 1)
+    ])
+    conn.execute(TripMember.__table__.insert(), [
+        {"trip_id": t, "user_id": (t - 1) * users_per_trip + i, "role": "member", "status": "joined"}
+        for t in range(1, trip_count + 1) for i in range(1, users_per_trip + 1)
+    ])
+    conn.execute(ItineraryDay.__table__.insert(), [
+        {"id": (t - 1) * 5 + d, "trip_id": t, "day_number": d}
+        for t in range(1, trip_count + 1) for d in range(1, 6)
+    ])
+    day_count = trip_count * 5
+    conn.execute(Activity.__table__.insert(), [
+        {"id": (day - 1) * 4 + a, "day_id": day, "title": "x", "upvote_count": 0, "downvote_count": 0}
+        for day in range(1, day_count + 1) for a in range(1, 5)
+    ])
+    conn.execute(ActivityVote.__table__.insert(), [
+        {"activity_id": activity, "user_id": u, "vote": "upvote" if u % 2 else "downvote"}
+        for activity in range(1, day_count * 4 + 1) for u in range(1, 4)
+    ])
+    conn.execute(Expense.__table__.insert(), [
+        {"id": (t - 1) * 20 + e, "trip_id": t, "payer_id": (t - 1) * users_per_trip + 1,
+         "amount": 1000.0, "amount_minor": 1000, "currency": "VND",
+         "expense_date": datetime(2024, 1, 1) + timedelta(days=e)}
+        for t in range(1, trip_count + 1) for e in range(1, 21)
+    ])
+    conn.execute(ExpenseSplit.__table__.insert(), [
+        {"expense_id": e, "user_id": 1, "amount_owed": 500.0, "amount_owed_minor": 500}
+        for e in range(1, trip_count * 20 + 1) for _ in range(2)
+    ])
+    conn.execute(TripBalance.__table__.insert(), [
+        {"trip_id": t, "user_id": (t - 1) * users_per_trip + i, "currency": "VND", "balance": 0}
+        for t in range(1, trip_count + 1) for i in range(1, users_per_trip + 1)
+    ])
+    conn.execute(Document.__table__.insert(), [
+        {"trip_id": t, "uploader_id": 1, "filename": "a.pdf", "url": "/uploads/a.pdf"}
+        for t in range(1, trip_count + 1) for _ in range(5)
+    ])
+    conn.execute(ChecklistItem.__table__.insert(), [
+        {"trip_id": t, "content": "x"} for t in range(1, trip_count + 1) for _ in range(5)
+    ])
+    db.commit()
+    with engine.begin() as analyze_conn:
+        analyze_conn.execute(text("ANALYZE"))
+    return db
+
+
+def _plan(conn, statement) -> list[str]:
+    sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+    if engine.dialect.name == "sqlite":
+        return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    return [row[0] for row in conn.execute(text(f"EXPLAIN {sql}"))]
+
+
+def _sequential_scans(plan: list[str]) -> list[str]:
+    if engine.dialect.name == "sqlite":
+        return [line for line in plan if line.startswith("SCAN ")]
+    return [line for line in plan if "Seq Scan" in line]
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_index(seeded_db, name):
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("SET enable_seqscan = off"))
+        plan = _plan(conn, HOT_QUERIES[name])
+    assert not _sequential_scans(plan), f"{name}: sequential scan\n" + "\n".join(plan)
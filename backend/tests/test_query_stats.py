@@ -0,0 +1,20 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.core.query_stats import track_queries
+from app.database import engine
+
+
+def test_failed_statement_does_not_leak_start_time(db):
+    with engine.connect() as conn:
+        with track_queries() as stats:
+            with pytest.raises(DBAPIError):
+                conn.execute(text("SELECT * FROM bang_khong_ton_tai"))
+            assert conn.info.get("query_start_time") == []
+
+            conn.execute(text("SELECT 1"))
+        assert conn.info.get("query_start_time") == []
+        # Chỉ câu thành công được đếm
+        assert stats.count == 1
+        assert 0 <= stats.duration < 5
@@ -0,0 +1,58 @@
+import pytest
+
+from app import models
+from app.crud import crud
+from app.schemas.itinerary import ActivityCreate
+from tests.conftest import auth_headers
+
+
+@pytest.fixture
+def outsider(db):
+    user = models.user.User(email="outsider@example.com", hashed_password="x", name="Người ngoài")
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def resources(db, users, trip):
+    day = crud.create_itinerary_day(db, trip.id, 1)
+    activity = crud.create_activity(db, ActivityCreate(day_id=day.id, title="Hồ Xuân Hương"), users[0].id)
+    item = crud.create_checklist_item(db, trip_id=trip.id, content="Mang áo ấm")
+    return {"day_id": day.id, "activity_id": activity.id, "item_id": item.id}
+
+
+def _requests(ids):
+    day_id, activity_id, item_id = ids["day_id"], ids["activity_id"], ids["item_id"]
+    return [
+        ("get", f"/itinerary/days/{day_id}/activities", {}),
+        ("get", f"/itinerary/activities/{activity_id}", {}),
+        ("post", f"/itinerary/activities/{activity_id}/vote", {"vote_type": "upvote"}),
+        ("post", f"/itinerary/activities/{activity_id}/confirm", {}),
+        ("post", f"/checklist/item/{item_id}/toggle", {"is_done": True}),
+        ("get", f"/checklist/item/{item_id}", {}),
+        ("put", f"/checklist/item/{item_id}", {"content": "Mang ô"}),
+        ("delete", f"/checklist/item/{item_id}", {}),
+    ]
+
+
+def test_non_member_gets_403_on_resource_routes(client, outsider, resources):
+    headers = auth_headers(outsider)
+    for method, url, params in _requests(resources):
+        response = getattr(client, method)(url, params=params, headers=headers)
+        assert response.status_code == 403, (method, url)
+
+
+def test_member_can_use_resource_routes(client, users, resources):
+    headers = auth_headers(users[1])
+    for method, url, params in _requests(resources):
+        response = getattr(client, method)(url, params=params, headers=headers)
+        assert response.status_code == 200, (method, url)
+
+
+def test_missing_resource_returns_404(client, users, trip):
+    headers = auth_headers(users[0])
+    missing = {"day_id": 999_999, "activity_id": 999_999, "item_id": 999_999}
+    for method, url, params in _requests(missing):
+        response = getattr(client, method)(url, params=params, headers=headers)
+        assert response.status_code == 404, (method, url)
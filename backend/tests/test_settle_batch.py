@@ -0,0 +1,81 @@
+from app import models
+from app.services.finance_service import verify_trip_ledger
+from tests.conftest import auth_headers
+
+
+def _seed_debts(client, trip, users):
+    """users[0] trả 90k chia 3 người: users[1] và users[2] mỗi người nợ 30k."""
+    client.post(
+        "/expenses",
+        json={"trip_id": trip.id, "amount": 90000, "involved_user_ids": [u.id for u in users]},
+        headers=auth_headers(users[0]),
+    )
+
+
+def test_batch_settle_is_owner_only(client, db, users, trip):
+    _seed_debts(client, trip, users)
+
+    response = client.post("/expenses/settle/batch", json={"trip_id": trip.id}, headers=auth_headers(users[1]))
+
+    assert response.status_code == 403
+    assert db.query(models.expense.Settlement).count() == 0
+    assert client.post("/expenses/settle/batch", json={"trip_id": 9999}, headers=auth_headers(users[0])).status_code == 404
+
+
+def test_batch_settle_defaults_to_current_suggestions(client, db, users, trip):
+    _seed_debts(client, trip, users)
+
+    response = client.post("/expenses/settle/batch", json={"trip_id": trip.id}, headers=auth_headers(users[0]))
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["settled"] == 2
+    # Bảng cân đối trả về đã phản ánh các khoản vừa ghi nhận: mọi người về 0, không còn gợi ý
+    assert {b["user_id"]: b["balance"] for b in data["balances"]} == {u.id: 0.0 for u in users}
+    assert data["settlements"] == []
+    settled = {
+        (s.payer_id, s.receiver_id, s.amount)
+        for s in db.query(models.expense.Settlement).filter_by(trip_id=trip.id)
+    }
+    assert settled == {(users[1].id, users[0].id, 30000.0), (users[2].id, users[0].id, 30000.0)}
+    assert verify_trip_ledger(db, trip.id) == []
+
+
+def test_batch_settle_explicit_items_return_new_balances(client, db, users, trip):
+    _seed_debts(client, trip, users)
+    a, b, c = users
+
+    response = client.post(
+        "/expenses/settle/batch",
+        json={"trip_id": trip.id, "items": [{"payer_id": b.id, "receiver_id": a.id, "amount": 10000}]},
+        headers=auth_headers(a),
+    )
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["settled"] == 1
+    assert {row["user_id"]: row["balance"] for row in data["balances"]} == {a.id: 50000.0, b.id: -20000.0, c.id: -30000.0}
+    assert sorted((s["from_user"]["id"], s["amount"]) for s in data["settlements"]) == sorted(
+        [(b.id, 20000.0), (c.id, 30000.0)]
+    )
+
+
+def test_batch_settle_is_atomic_on_invalid_item(client, db, users, trip):
+    _seed_debts(client, trip, users)
+    a, b, _ = users
+
+    response = client.post(
+        "/expenses/settle/batch",
+        json={
+            "trip_id": trip.id,
+            "items": [
+                {"payer_id": b.id, "receiver_id": a.id, "amount": 10000},
+                {"payer_id": b.id, "receiver_id": 9999, "amount": 10000},
+            ],
+        },
+        headers=auth_headers(a),
+    )
+
+    assert response.status_code == 400
+    assert "9999" in response.json()["detail"]
+    assert db.query(models.expense.Settlement).count() == 0
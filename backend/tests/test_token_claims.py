@@ -0,0 +1,63 @@
+import pytest
+
+from app.core.membership_cache import membership_cache
+from app.core.query_stats import track_queries
+from app.core.user_cache import user_cache
+from app.core.security import decode_access_token
+from app.crud import crud
+from app.schemas.trip import TripCreate
+from tests.conftest import auth_headers
+
+
+@pytest.fixture
+def claims_enabled(monkeypatch):
+    monkeypatch.setattr(crud, "TOKEN_TRIP_CLAIMS", True)
+
+
+def _claims_headers(db, user) -> dict:
+    return {"Authorization": f"Bearer {crud.create_user_access_token(db, user)}"}
+
+
+def test_fresh_claims_skip_membership_lookup(client, db, users, trip, claims_enabled):
+    trip_id, user_id = trip.id, users[1].id
+    url = f"/itinerary/trips/{trip_id}/days/1/activities"
+
+    with track_queries() as plain:
+        assert client.get(url, headers=auth_headers(users[1])).status_code == 200
+    membership_cache.clear()
+    user_cache.clear()
+
+    headers = _claims_headers(db, users[1])
+    with track_queries() as fast:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    # Như token thường nhưng bỏ câu đọc trip_members
+    assert fast.count == plain.count - 1
+    assert "X-Access-Token" not in response.headers
+    assert membership_cache.get(user_id) is None
+
+
+def test_stale_claims_are_rechecked_and_refreshed(client, db, users, trip, claims_enabled):
+    headers = _claims_headers(db, users[1])
+    trip_id = trip.id
+    other = crud.create_trip(db, TripCreate(name="Hội An"), users[0].id)
+    other_id = other.id
+
+    # Tham gia trip khác làm tăng membership_version nên claim trong token cũ bị lỗi thời
+    assert client.post("/trips/join", json={"invite_code": other.invite_code}, headers=headers).status_code == 200
+
+    response = client.get(f"/itinerary/trips/{trip_id}/days/1/activities", headers=headers)
+    assert response.status_code == 200
+    payload = decode_access_token(response.headers["X-Access-Token"])
+    stale = decode_access_token(headers["Authorization"].split()[1])
+    assert payload["trips_v"] > stale["trips_v"]
+    assert {claim[0] for claim in payload["trips"]} == {trip_id, other_id}
+
+
+def test_stale_claims_do_not_grant_deleted_trip(client, db, users, trip, claims_enabled):
+    headers = _claims_headers(db, users[1])
+    trip_id = trip.id
+    crud.delete_trip(db, trip_id)
+
+    response = client.get(f"/expenses/trip/{trip_id}", headers=headers)
+    assert response.status_code == 403
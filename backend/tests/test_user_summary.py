@@ -0,0 +1,32 @@
+from app import models
+from app.crud import crud
+from app.schemas.trip import TripCreate
+from tests.conftest import _clear_caches, auth_headers
+
+
+def test_summary_flags_trip_with_missing_rate_instead_of_failing(client, db, users, trip):
+    headers = auth_headers(users[0])
+    member_ids = [u.id for u in users]
+    client.post("/expenses", json={"trip_id": trip.id, "amount": 90000, "involved_user_ids": member_ids}, headers=headers)
+
+    # Trip thứ hai có sổ cái bằng USD từ dữ liệu cũ nhưng không có tỷ giá USD -> VND
+    broken = crud.create_trip(db, TripCreate(name="Dữ liệu cũ"), users[0].id)
+    crud.join_trip_by_code(db, broken.invite_code, users[1].id)
+    db.add_all([
+        models.expense.TripBalance(trip_id=broken.id, user_id=users[0].id, currency="USD", balance=1000),
+        models.expense.TripBalance(trip_id=broken.id, user_id=users[1].id, currency="USD", balance=-1000),
+    ])
+    db.commit()
+    _clear_caches()
+
+    response = client.get("/users/me/balances", headers=headers)
+
+    assert response.status_code == 200
+    summary = response.json()["data"]
+    by_trip = {t["trip_id"]: t for t in summary["trips"]}
+    assert by_trip[trip.id]["error"] is None
+    assert by_trip[trip.id]["balance"] == 60000.0
+    assert by_trip[broken.id]["balance"] is None
+    assert "USD" in by_trip[broken.id]["error"]
+    assert by_trip[broken.id]["owes"] == [] and by_trip[broken.id]["owed_by"] == []
+    assert summary["totals"] == [{"currency": "VND", "balance": 60000.0}]
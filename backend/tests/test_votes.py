@@ -0,0 +1,58 @@
+from app import models
+from app.crud import crud
+from app.schemas.itinerary import ActivityCreate
+from tests.conftest import auth_headers
+
+
+def _counters(db, activity_id: int) -> tuple:
+    db.expire_all()
+    activity = db.get(models.itinerary.Activity, activity_id)
+    return activity.upvote_count, activity.downvote_count, activity.is_confirmed
+
+
+def test_vote_toggle_keeps_counters_exact(client, db, users, trip):
+    day = crud.create_itinerary_day(db, trip.id, 1)
+    activity_id = crud.create_activity(db, ActivityCreate(day_id=day.id, title="Chợ đêm"), users[0].id).id
+    voter, other = auth_headers(users[1]), auth_headers(users[2])
+    url = f"/itinerary/activities/{activity_id}/vote"
+
+    response = client.post(url, params={"vote_type": "upvote"}, headers=voter)
+    assert response.json()["data"]["type"] == "upvote"
+    assert _counters(db, activity_id) == (1, 0, False)
+
+    # Người khác downvote trước để bộ đếm downvote lên 2 khi voter đổi phiếu
+    client.post(url, params={"vote_type": "downvote"}, headers=other)
+    assert _counters(db, activity_id) == (1, 1, False)
+
+    response = client.post(url, params={"vote_type": "downvote"}, headers=voter)
+    assert response.json()["data"]["type"] == "downvote"
+    assert _counters(db, activity_id) == (0, 2, False)
+
+    response = client.post(url, params={"vote_type": "downvote"}, headers=voter)
+    assert response.json()["data"] == {"vote_id": None, "type": None}
+    assert _counters(db, activity_id) == (0, 1, False)
+
+    client.post(url, params={"vote_type": "downvote"}, headers=other)
+    assert _counters(db, activity_id) == (0, 0, False)
+    assert db.query(models.itinerary.ActivityVote).filter_by(activity_id=activity_id).count() == 0
+
+
+def test_upvote_majority_confirms_activity(client, db, users, trip):
+    day = crud.create_itinerary_day(db, trip.id, 1)
+    activity_id = crud.create_activity(db, ActivityCreate(day_id=day.id, title="Hồ Xuân Hương"), users[0].id).id
+    url = f"/itinerary/activities/{activity_id}/vote"
+
+    client.post(url, params={"vote_type": "upvote"}, headers=auth_headers(users[0]))
+    assert _counters(db, activity_id) == (1, 0, False)
+    # 3 thành viên: 2 upvote là quá nửa
+    client.post(url, params={"vote_type": "upvote"}, headers=auth_headers(users[1]))
+    assert _counters(db, activity_id) == (2, 0, True)
+
+
+def test_invalid_vote_type_is_rejected(client, db, users, trip):
+    day = crud.create_itinerary_day(db, trip.id, 1)
+    activity_id = crud.create_activity(db, ActivityCreate(day_id=day.id, title="x"), users[0].id).id
+    response = client.post(
+        f"/itinerary/activities/{activity_id}/vote", params={"vote_type": "meh"}, headers=auth_headers(users[0])
+    )
+    assert response.status_code == 400